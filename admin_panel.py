@@ -8,10 +8,12 @@ from telegram.ext import (
     ContextTypes, filters
 )
 from telegram.constants import ParseMode
+from telegram.helpers import escape_markdown
 
 from config import Config
 from models import InterviewAnalysis, Position
 from database import Database
+from webhook import run_application
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +49,7 @@ class AdminPanel:
         keyboard = [
             [InlineKeyboardButton("📊 Посмотреть результаты", callback_data="admin_results")],
             [InlineKeyboardButton("👥 Кандидаты по позициям", callback_data="admin_candidates")],
+            [InlineKeyboardButton("🏆 Лучшие резюме", callback_data="admin_top_resumes")],
             [InlineKeyboardButton("📈 Статистика", callback_data="admin_stats")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -69,6 +72,11 @@ class AdminPanel:
             await self.show_candidates_by_position(query, context)
         elif query.data == "admin_stats":
             await self.show_statistics(query, context)
+        elif query.data == "admin_top_resumes":
+            await self.show_top_resumes_positions(query, context)
+        elif query.data.startswith("top_resumes_"):
+            position = query.data.split("_")[2]
+            await self.show_top_resumes(query, context, Position(position))
         elif query.data.startswith("result_"):
             analysis_id = query.data.split("_")[1]
             await self.show_detailed_result(query, context, analysis_id)
@@ -210,6 +218,36 @@ class AdminPanel:
         
         await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
     
+    async def show_top_resumes_positions(self, query, context: ContextTypes.DEFAULT_TYPE):
+        """Ask for a position to rank resumes against"""
+        message = "🏆 **Лучшие резюме для позиции:**\n\n"
+        
+        keyboard = [
+            [InlineKeyboardButton("💼 Продажи", callback_data="top_resumes_sales")],
+            [InlineKeyboardButton("🧪 Тестирование", callback_data="top_resumes_qa")],
+            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_admin")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    
+    async def show_top_resumes(self, query, context: ContextTypes.DEFAULT_TYPE, position: Position):
+        """Show resumes that best match a position profile"""
+        top_resumes = await asyncio.to_thread(self.db.get_top_resumes, position, Config.TOP_RESUMES_COUNT)
+        
+        if not top_resumes:
+            message = "Пока нет загруженных резюме."
+        else:
+            message = f"🏆 **Лучшие резюме для позиции {position.value.upper()}:**\n\n"
+            for i, (candidate, score) in enumerate(top_resumes, 1):
+                candidate_name = escape_markdown(f"{candidate.first_name} {candidate.last_name}", version=1)
+                message += f"{i}. **{candidate_name}** — соответствие {score:.0%}\n"
+        
+        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="admin_top_resumes")]]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    
     async def show_statistics(self, query, context: ContextTypes.DEFAULT_TYPE):
         """Show interview statistics"""
         stats = self.get_statistics()
@@ -279,18 +317,22 @@ class AdminPanel:
         }
         return recommendations.get(recommendation, recommendation)
     
-    def run(self):
-        """Run admin panel"""
-        # Create application
+    def build_application(self) -> Application:
+        """Create the Telegram application with admin handlers"""
         application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
         
         # Add handlers
         application.add_handler(CommandHandler("admin", self.admin_start))
         application.add_handler(CallbackQueryHandler(self.handle_admin_callback))
+        return application
+    
+    def run(self, mode: Optional[str] = None):
+        """Run admin panel with polling or webhook (Config.BOT_MODE by default)"""
+        application = self.build_application()
         
         # Start the bot
-        logger.info("Starting Admin Panel...")
-        application.run_polling()
+        logger.info("Starting Admin Panel (%s)...", mode or Config.BOT_MODE)
+        run_application(application, mode)
 
 if __name__ == "__main__":
     # Add admin users here
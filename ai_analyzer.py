@@ -1,200 +1,767 @@
 import openai
-from typing import List, Dict, Any
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple, Type, Callable
+from pydantic import BaseModel
 from models import Interview, Answer, InterviewAnalysis, Position
 from config import Config
-import json
+from prompt_builder import PromptBuilder, BuiltPrompt
+from structured_output import (
+    ResumeAnalysisResult, InterviewAnalysisResult, AnswerQualityResult,
+    ExperienceShardResult, CommunicationShardResult, SummaryShardResult,
+    parse_json_object, parse_partial_object, validate_partial
+)
+from telemetry import CallTrace, Telemetry
+from batching import MicroBatcher
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceededError, Hedger, RETRYABLE_ERRORS, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+class ModelRoute(BaseModel):
+    """Model tier used by one AIAnalyzer method"""
+    model: str
+    timeout: float  # deadline for the whole call, retries included
+    max_tokens: int
+    temperature: float = 0.3
+    max_retries: int = Config.LLM_MAX_RETRIES
+    hedge: bool = False  # candidate is waiting on this call, worth a backup request
+    input_budget: int = 2000  # tokens of variable content (resume, transcript, answer)
+    json_output: bool = True  # ask the provider for a JSON object response
+
+# Interactive methods go to the fast tier, the heavy model is reserved for the final analysis
+MODEL_ROUTES = {
+    "analyze_resume": ModelRoute(model=Config.FAST_MODEL, timeout=20, max_tokens=600, hedge=True),
+    "analyze_interview": ModelRoute(model=Config.HEAVY_MODEL, timeout=90, max_tokens=1500, input_budget=6000),
+    "analyze_interview_shard": ModelRoute(model=Config.HEAVY_MODEL, timeout=60, max_tokens=600, input_budget=6000),
+    "check_answer_quality": ModelRoute(model=Config.FAST_MODEL, timeout=10, max_tokens=200, hedge=True, input_budget=800),
+    "check_answer_quality_batch": ModelRoute(model=Config.FAST_MODEL, timeout=15, max_tokens=2400, input_budget=6000),
+    "generate_follow_up_question": ModelRoute(model=Config.FAST_MODEL, timeout=10, max_tokens=120, temperature=0.7, hedge=True, input_budget=800, json_output=False),
+}
+
+# Static instructions go first in every prompt so the provider can cache them as a prefix;
+# the variable part (position, resume, answers) always comes last.
+RESUME_INSTRUCTIONS = """Проанализируйте резюме кандидата на указанную позицию и извлеките следующую информацию.
+
+Пожалуйста, предоставьте анализ в формате JSON со следующими полями:
+{
+    "experience_years": "количество лет опыта",
+    "key_skills": ["список ключевых навыков"],
+    "experience_level": "junior/middle/senior",
+    "relevant_experience": "релевантный опыт",
+    "education": "образование",
+    "summary": "краткое резюме профиля"
+}"""
+
+INTERVIEW_INSTRUCTIONS = """Проанализируйте ответы кандидата на указанную позицию и предоставьте детальную оценку.
+
+Пожалуйста, проанализируйте:
+1. Глубину и релевантность ответов
+2. Логику и последовательность мышления
+3. Стиль речи и коммуникативные навыки
+4. Оригинальность ответов (нет ли шаблонных формулировок)
+5. Оценку по компетенциям
+
+Предоставьте результат в формате JSON:
+{
+    "overall_score": 0.85,
+    "competency_scores": {
+        "experience": 0.8,
+        "technical_skills": 0.7,
+        "communication": 0.9,
+        "problem_solving": 0.75
+    },
+    "communication_skills": "описание стиля общения",
+    "experience_level": "junior/middle/senior",
+    "originality_score": 0.9,
+    "recommendations": ["список рекомендаций"],
+    "hr_recommendation": "recommended/needs_clarification/not_recommended",
+    "summary": "краткое резюме интервью"
+}
+
+Оценки должны быть от 0 до 1, где 1 - отлично."""
+
+EXPERIENCE_SHARD_INSTRUCTIONS = """Проанализируйте ответы кандидата на указанную позицию и оцените только опыт и технические навыки.
+
+Предоставьте результат в формате JSON:
+{
+    "competency_scores": {
+        "experience": 0.8,
+        "technical_skills": 0.7
+    },
+    "experience_level": "junior/middle/senior"
+}
+
+Оценки должны быть от 0 до 1, где 1 - отлично."""
+
+COMMUNICATION_SHARD_INSTRUCTIONS = """Проанализируйте ответы кандидата на указанную позицию и оцените только коммуникацию, решение задач и оригинальность.
+
+Обратите внимание на логику и последовательность мышления, стиль речи и шаблонные формулировки.
+
+Предоставьте результат в формате JSON:
+{
+    "competency_scores": {
+        "communication": 0.9,
+        "problem_solving": 0.75
+    },
+    "communication_skills": "описание стиля общения",
+    "originality_score": 0.9
+}
+
+Оценки должны быть от 0 до 1, где 1 - отлично."""
+
+SUMMARY_SHARD_INSTRUCTIONS = """Проанализируйте ответы кандидата на указанную позицию и подготовьте выводы для HR.
+
+Предоставьте результат в формате JSON:
+{
+    "recommendations": ["список рекомендаций"],
+    "summary": "краткое резюме интервью"
+}"""
+
+ANSWER_QUALITY_INSTRUCTIONS = """Оцените качество ответа кандидата на вопрос и определите, нужны ли уточняющие вопросы.
+
+Проанализируйте:
+1. Полнота ответа (0-1)
+2. Конкретность (0-1)
+3. Релевантность (0-1)
+4. Нужны ли уточняющие вопросы (true/false)
+
+Ответ в формате JSON:
+{
+    "completeness": 0.7,
+    "specificity": 0.6,
+    "relevance": 0.8,
+    "needs_follow_up": true,
+    "reason": "причина для уточняющего вопроса"
+}"""
+
+ANSWER_QUALITY_BATCH_INSTRUCTIONS = """Оцените качество каждого ответа кандидата на его вопрос и определите, нужны ли уточняющие вопросы.
+
+Для каждого ответа оцените полноту, конкретность и релевантность (0-1) и нужны ли уточняющие вопросы (true/false).
+Ответы пронумерованы; верните результат для каждого номера.
+
+Ответ в формате JSON:
+{
+    "results": [
+        {"id": 1, "completeness": 0.7, "specificity": 0.6, "relevance": 0.8, "needs_follow_up": true, "reason": "причина"}
+    ]
+}"""
+
+FOLLOW_UP_INSTRUCTIONS = """На основе ответа кандидата сгенерируйте подходящий уточняющий вопрос.
+
+Выберите наиболее подходящий уточняющий вопрос из списка или сгенерируйте новый, если ни один не подходит.
+Верните только текст вопроса."""
+
+# Returned when the provider is unavailable; also fills fields the model never delivered
+RESUME_FALLBACK = {
+    "experience_years": "неизвестно",
+    "key_skills": [],
+    "experience_level": "unknown",
+    "relevant_experience": "не указано",
+    "education": "не указано",
+    "summary": "Ошибка анализа резюме"
+}
+
+INTERVIEW_FALLBACK = {
+    "overall_score": 0.5,
+    "competency_scores": {"experience": 0.5, "technical_skills": 0.5, "communication": 0.5, "problem_solving": 0.5},
+    "communication_skills": "Ошибка анализа",
+    "experience_level": "unknown",
+    "originality_score": 0.5,
+    "recommendations": ["Ошибка анализа интервью"],
+    "hr_recommendation": "needs_clarification",
+    "summary": "Произошла ошибка при анализе интервью"
+}
+
+ANSWER_QUALITY_FALLBACK = {
+    "completeness": 0.5,
+    "specificity": 0.5,
+    "relevance": 0.5,
+    "needs_follow_up": False,
+    "reason": "Ошибка анализа"
+}
+
+class InterviewShard(NamedTuple):
+    """One of the smaller prompts a fanned-out interview analysis is split into"""
+    instructions: str
+    schema: Type[BaseModel]
+    competencies: Tuple[str, ...] = ()
+    
+    def fallback(self) -> Dict[str, Any]:
+        """INTERVIEW_FALLBACK values of the fields this shard is responsible for"""
+        return {field: INTERVIEW_FALLBACK[field] for field in self.schema.model_fields}
+
+# Shards run concurrently; together they cover every InterviewAnalysisResult field except
+# overall_score and hr_recommendation, which are derived from the competencies when merging
+INTERVIEW_SHARDS = {
+    "experience": InterviewShard(EXPERIENCE_SHARD_INSTRUCTIONS, ExperienceShardResult, ("experience", "technical_skills")),
+    "communication": InterviewShard(COMMUNICATION_SHARD_INSTRUCTIONS, CommunicationShardResult, ("communication", "problem_solving")),
+    "summary": InterviewShard(SUMMARY_SHARD_INSTRUCTIONS, SummaryShardResult),
+}
+
+# Lowest overall score for each recommendation, checked in order
+RECOMMENDATION_THRESHOLDS = ((0.7, "recommended"), (0.5, "needs_clarification"))
+
+REASK_TEMPLATE = "В ответе не хватает полей или они некорректны: {fields}. Верните JSON-объект только с этими полями."
+
+class StreamedReply(NamedTuple):
+    """Text and usage collected from a streamed completion"""
+    text: str
+    usage: Optional[Any]
+
+class RouteStats:
+    """Latency and token accounting for one route"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.local_prompt_tokens = 0
+        self.truncated_prompts = 0
+        self.parse_outcomes = {"ok": 0, "repaired": 0, "reasked": 0, "partial": 0, "wasted": 0}
+    
+    def record_parse(self, outcome: str):
+        """Record how a structured reply was turned into a result"""
+        with self._lock:
+            self.parse_outcomes[outcome] += 1
+    
+    def record_prompt(self, tokens: int, truncated: bool):
+        """Record the locally counted size of a prompt about to be sent"""
+        with self._lock:
+            self.local_prompt_tokens += tokens
+            self.truncated_prompts += int(truncated)
+    
+    def record(self, latency: float, usage: Optional[Any] = None, error: bool = False):
+        """Record one completed or failed call"""
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if usage is not None:
+                self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+                self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Snapshot of the counters"""
+        with self._lock:
+            parsed = sum(self.parse_outcomes.values())
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_latency": self.total_latency / self.calls if self.calls else 0.0,
+                "max_latency": self.max_latency,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "local_prompt_tokens": self.local_prompt_tokens,
+                "truncated_prompts": self.truncated_prompts,
+                "parse_outcomes": dict(self.parse_outcomes),
+                # Share of structured replies we paid for but could not use at all
+                "wasted_rate": self.parse_outcomes["wasted"] / parsed if parsed else 0.0
+            }
 
 class AIAnalyzer:
     """AI analyzer for interview responses"""
     
-    def __init__(self):
+    def __init__(self, routes: Optional[Dict[str, ModelRoute]] = None):
         openai.api_key = Config.OPENAI_API_KEY
-        self.client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+        # Retries are handled in _complete, within the route deadline
+        self.client = openai.OpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL, max_retries=0)
+        self.breaker = CircuitBreaker(Config.LLM_BREAKER_FAILURES, Config.LLM_BREAKER_RESET_SECONDS)
+        self.routes = {**MODEL_ROUTES, **(routes or {})}
+        self.route_stats = {method: RouteStats() for method in self.routes}
+        self.prompt_builder = PromptBuilder()
+        self._no_json_mode = set()
+        self.hedging = Config.LLM_HEDGING
+        self.hedgers = {
+            method: Hedger(Config.LLM_HEDGE_PERCENTILE, Config.LLM_HEDGE_BUDGET)
+            for method, route in self.routes.items() if route.hedge
+        }
+        self.executor = ThreadPoolExecutor(max_workers=Config.LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+        self.telemetry = Telemetry()
+        self.fan_out = Config.LLM_INTERVIEW_FAN_OUT
+        # Optional: concurrent quality checks are merged into one multi-answer request
+        self.quality_batcher = None
+        if Config.LLM_BATCH_QUALITY_CHECKS:
+            self.quality_batcher = MicroBatcher(
+                self._check_answer_quality_batch, self.executor,
+                Config.LLM_BATCH_MAX_SIZE, Config.LLM_BATCH_MAX_WAIT_MS / 1000, name="quality-batcher"
+            )
+    
+    def _json_kwargs(self, route: ModelRoute) -> Dict[str, Any]:
+        """Request JSON mode when the route wants it and the model supports it"""
+        if route.json_output and route.model not in self._no_json_mode:
+            return {"response_format": {"type": "json_object"}}
+        return {}
+    
+    def _without_json_mode(self, route: ModelRoute, kwargs: Dict[str, Any], error: openai.BadRequestError) -> bool:
+        """Disable JSON mode for the model if that is what the request was rejected for"""
+        if not kwargs or "response_format" not in str(error):
+            return False
+        # Older models (e.g. gpt-4) have no JSON mode; the tolerant parser copes without it
+        logger.warning("%s does not support JSON mode, disabling it", route.model)
+        self._no_json_mode.add(route.model)
+        return True
+    
+    def _create(self, route: ModelRoute, messages: List[Dict[str, str]], timeout: float):
+        """Single chat completion request"""
+        kwargs = self._json_kwargs(route)
+        try:
+            return self.client.chat.completions.create(
+                model=route.model,
+                messages=messages,
+                temperature=route.temperature,
+                max_tokens=route.max_tokens,
+                timeout=timeout,
+                **kwargs
+            )
+        except openai.BadRequestError as e:
+            if not self._without_json_mode(route, kwargs, e):
+                raise
+            return self._create(route, messages, timeout)
+    
+    def _create_stream(self, route: ModelRoute, messages: List[Dict[str, str]], timeout: float,
+                       on_text: Callable[[str], None]) -> StreamedReply:
+        """Single streamed chat completion request; timeout bounds the whole stream, not each read"""
+        kwargs = self._json_kwargs(route)
+        deadline = time.perf_counter() + timeout
+        try:
+            stream = self.client.chat.completions.create(
+                model=route.model,
+                messages=messages,
+                temperature=route.temperature,
+                max_tokens=route.max_tokens,
+                timeout=timeout,
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+        except openai.BadRequestError as e:
+            if not self._without_json_mode(route, kwargs, e):
+                raise
+            return self._create_stream(route, messages, deadline - time.perf_counter(), on_text)
+        
+        text = ""
+        usage = None
+        try:
+            for chunk in stream:
+                if time.perf_counter() >= deadline:
+                    raise DeadlineExceededError(f"stream from {route.model} exceeded its {timeout:.1f}s deadline")
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text += chunk.choices[0].delta.content
+                    on_text(text)
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        return StreamedReply(text, usage)
+    
+    def _timed_create(self, hedger: Hedger, route: ModelRoute, messages: List[Dict[str, str]], timeout: float):
+        """Request that feeds its latency into the hedger"""
+        started = time.perf_counter()
+        response = self._create(route, messages, timeout)
+        hedger.record_latency(time.perf_counter() - started)
+        return response
+    
+    def _send(self, method: str, route: ModelRoute, messages: List[Dict[str, str]], timeout: float):
+        """Send one attempt, hedged with a backup request if the first one is slow"""
+        hedger = self.hedgers.get(method)
+        if not self.hedging or hedger is None:
+            return self._create(route, messages, timeout)
+        
+        started = time.perf_counter()
+        delay = hedger.hedge_delay()
+        primary = self.executor.submit(self._timed_create, hedger, route, messages, timeout)
+        if delay is None or delay >= timeout:
+            return primary.result()
+        
+        done, _ = wait([primary], timeout=delay)
+        if done or not hedger.try_hedge():
+            return primary.result()
+        
+        logger.debug("%s slower than %.2fs, sending hedge request", method, delay)
+        backup = self.executor.submit(self._timed_create, hedger, route, messages, timeout - (time.perf_counter() - started))
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # Drop the loser: a queued request never starts, one in flight is ignored
+                    for loser in pending:
+                        loser.cancel()
+                    if future is backup:
+                        hedger.record_hedge_win()
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    def _complete(self, method: str, prompt: BuiltPrompt) -> str:
+        """Send prompt through the route configured for method and return the reply text"""
+        route = self.routes[method]
+        response = self._call(method, prompt, lambda remaining: self._send(method, route, prompt.messages, remaining))
+        return response.choices[0].message.content
+    
+    def _call(self, method: str, prompt: BuiltPrompt, send: Callable[[float], Any]) -> Any:
+        """Run send(remaining_seconds) within the route deadline, with retries and the circuit breaker"""
+        route = self.routes[method]
+        trace = self.telemetry.current()
+        if trace is not None and trace.model is None:
+            # Known before any response, so failed calls are filed under their model too
+            trace.model = route.model
+        self.route_stats[method].record_prompt(prompt.tokens, prompt.truncated)
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"LLM circuit is open, skipping {method}")
+        
+        started = time.perf_counter()
+        deadline = started + route.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    raise DeadlineExceededError(f"{method} exceeded its {route.timeout}s deadline")
+                response = send(remaining)
+                break
+            except RETRYABLE_ERRORS as e:
+                delay = backoff_delay(attempt)
+                if attempt >= route.max_retries or time.perf_counter() + delay >= deadline:
+                    self._record_failure(method, started)
+                    if trace is not None:
+                        trace.retries += attempt
+                    raise
+                attempt += 1
+                logger.warning("%s attempt %d failed (%s), retrying in %.2fs", method, attempt, e, delay)
+                time.sleep(delay)
+            except DeadlineExceededError:
+                self._record_failure(method, started)
+                raise
+            except Exception:
+                # The provider answered, so it is reachable; the request itself was bad
+                self.breaker.record_success()
+                self.route_stats[method].record(time.perf_counter() - started, error=True)
+                raise
+        
+        self.breaker.record_success()
+        latency = time.perf_counter() - started
+        self.route_stats[method].record(latency, response.usage)
+        if trace is not None:
+            trace.add_response(route.model, response.usage, attempt)
+        logger.debug(
+            "%s via %s: %.2fs, %d retries, %d local / %s prompt / %s completion tokens%s",
+            method, route.model, latency, attempt, prompt.tokens,
+            getattr(response.usage, "prompt_tokens", None), getattr(response.usage, "completion_tokens", None),
+            " (input truncated)" if prompt.truncated else ""
+        )
+        return response
+    
+    def _complete_structured(self, method: str, prompt: BuiltPrompt, schema: Type[BaseModel], fallback: Dict[str, Any]) -> Dict[str, Any]:
+        """Complete, parse and validate a JSON reply; re-ask only for missing fields, fill the rest from fallback"""
+        reply = self._complete(method, prompt)
+        return self._structured_result(method, prompt, reply, schema, fallback)
+    
+    def _structured_result(self, method: str, prompt: BuiltPrompt, reply: str, schema: Type[BaseModel], fallback: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a JSON reply into a validated result"""
+        stats = self.route_stats[method]
+        data, repaired = parse_json_object(reply)
+        result, missing = validate_partial(schema, data)
+        outcome = "repaired" if repaired else "ok"
+        
+        if missing and result:
+            request = REASK_TEMPLATE.format(fields=", ".join(missing))
+            try:
+                extra, _ = parse_json_object(self._complete(method, self.prompt_builder.extend(prompt, reply, request)))
+                extra_valid, _ = validate_partial(schema, {name: value for name, value in (extra or {}).items() if name in missing})
+                result.update(extra_valid)
+                outcome = "reasked"
+            except Exception as e:
+                logger.warning("Re-asking %s for %s failed: %s", method, missing, e)
+            missing = [name for name in missing if name not in result]
+        
+        if missing:
+            outcome = "partial" if result else "wasted"
+            logger.warning("%s reply missing %s, using fallback values", method, missing)
+            result = {**fallback, **result}
+            self._mark_fallback()
+        
+        stats.record_parse(outcome)
+        defaults = {name: field.default for name, field in schema.model_fields.items() if not field.is_required()}
+        return {**defaults, **result}
+    
+    def _stream(self, method: str, prompt: BuiltPrompt, on_text: Callable[[str], None]) -> str:
+        """Stream a completion, passing the accumulated text to on_text as tokens arrive
+
+        Same deadline, retries and breaker as _complete; a retried stream starts its text over.
+        """
+        route = self.routes[method]
+        return self._call(method, prompt, lambda remaining: self._create_stream(route, prompt.messages, remaining, on_text)).text
+    
+    def _record_failure(self, method: str, started: float):
+        """Count a provider failure for the route and the circuit breaker"""
+        self.breaker.record_failure()
+        self.route_stats[method].record(time.perf_counter() - started, error=True)
+    
+    def _mark_fallback(self, error: Optional[Exception] = None):
+        """Note in the current call's telemetry that fallback values were used, and the error that caused it"""
+        trace = self.telemetry.current()
+        if trace is not None:
+            trace.fallback = True
+            if error is not None:
+                trace.error = type(error).__name__
+    
+    def get_telemetry(self) -> Dict[str, Any]:
+        """Per-call telemetry: latency, token and retry histograms by method and model"""
+        return self.telemetry.snapshot()
+    
+    def get_batching_stats(self) -> Optional[Dict[str, Any]]:
+        """Quality-check batching counters, None when batching is off"""
+        return self.quality_batcher.as_dict() if self.quality_batcher is not None else None
+    
+    def get_breaker_state(self) -> Dict[str, Any]:
+        """Circuit breaker state for monitoring"""
+        return self.breaker.as_dict()
+    
+    def get_route_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-route latency and token counters"""
+        stats = {}
+        for method, route in self.routes.items():
+            stats[method] = dict(self.route_stats[method].as_dict(), model=route.model)
+            if method in self.hedgers:
+                stats[method]["hedging"] = self.hedgers[method].as_dict()
+        return stats
+    
+    def _resume_prompt(self, resume_text: str, position: Position) -> BuiltPrompt:
+        """Prompt for resume analysis"""
+        return self.prompt_builder.build(
+            RESUME_INSTRUCTIONS,
+            f"Позиция: {position.value}\n\nРезюме:\n{resume_text}",
+            self.routes["analyze_resume"].input_budget
+        )
     
     def analyze_resume(self, resume_text: str, position: Position) -> Dict[str, Any]:
         """Analyze candidate's resume"""
-        prompt = f"""
-        Проанализируйте резюме кандидата на позицию {position.value} и извлеките следующую информацию:
-        
-        Резюме:
-        {resume_text}
-        
-        Пожалуйста, предоставьте анализ в формате JSON со следующими полями:
-        {{
-            "experience_years": "количество лет опыта",
-            "key_skills": ["список ключевых навыков"],
-            "experience_level": "junior/middle/senior",
-            "relevant_experience": "релевантный опыт",
-            "education": "образование",
-            "summary": "краткое резюме профиля"
-        }}
-        """
+        prompt = self._resume_prompt(resume_text, position)
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            return result
-        except Exception as e:
-            print(f"Error analyzing resume: {e}")
-            return {
-                "experience_years": "неизвестно",
-                "key_skills": [],
-                "experience_level": "unknown",
-                "relevant_experience": "не указано",
-                "education": "не указано",
-                "summary": "Ошибка анализа резюме"
-            }
+        with self.telemetry.trace("analyze_resume"):
+            try:
+                return self._complete_structured("analyze_resume", prompt, ResumeAnalysisResult, RESUME_FALLBACK)
+            except Exception as e:
+                print(f"Error analyzing resume: {e}")
+                self._mark_fallback(e)
+                return dict(RESUME_FALLBACK)
     
-    def analyze_interview(self, interview: Interview, answers: List[Answer]) -> InterviewAnalysis:
-        """Analyze complete interview"""
+    def analyze_resume_stream(self, resume_text: str, position: Position,
+                              on_update: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Analyze resume while streaming; on_update gets the fields completed so far whenever a new one arrives"""
+        prompt = self._resume_prompt(resume_text, position)
+        seen = set()
+        
+        def on_text(text: str):
+            fields = parse_partial_object(text)
+            if fields.keys() - seen:
+                seen.update(fields.keys())
+                on_update(fields)
         
-        # Prepare answers text for analysis
-        answers_text = ""
+        with self.telemetry.trace("analyze_resume_stream"):
+            try:
+                reply = self._stream("analyze_resume", prompt, on_text)
+                return self._structured_result("analyze_resume", prompt, reply, ResumeAnalysisResult, RESUME_FALLBACK)
+            except Exception as e:
+                print(f"Error streaming resume analysis: {e}")
+                self._mark_fallback(e)
+                return dict(RESUME_FALLBACK)
+    
+    def interview_prompt(self, interview: Interview, answers: List[Answer],
+                         instructions: str = INTERVIEW_INSTRUCTIONS, method: str = "analyze_interview") -> BuiltPrompt:
+        """Prompt for the full interview analysis, or for one of its shards"""
+        # One section per answer, so a long answer cannot crowd the others out of the budget
+        sections = []
         for i, answer in enumerate(answers, 1):
-            answers_text += f"Вопрос {i}: {answer.answer_text}\n"
+            section = f"Вопрос {i}: {answer.answer_text}\n"
             if answer.follow_up_answers:
                 for j, follow_up in enumerate(answer.follow_up_answers, 1):
-                    answers_text += f"  Уточнение {j}: {follow_up}\n"
-            answers_text += "\n"
-        
-        prompt = f"""
-        Проанализируйте ответы кандидата на позицию {interview.position.value} и предоставьте детальную оценку.
-        
-        Ответы кандидата:
-        {answers_text}
-        
-        Пожалуйста, проанализируйте:
-        1. Глубину и релевантность ответов
-        2. Логику и последовательность мышления
-        3. Стиль речи и коммуникативные навыки
-        4. Оригинальность ответов (нет ли шаблонных формулировок)
-        5. Оценку по компетенциям
-        
-        Предоставьте результат в формате JSON:
-        {{
-            "overall_score": 0.85,
-            "competency_scores": {{
-                "experience": 0.8,
-                "technical_skills": 0.7,
-                "communication": 0.9,
-                "problem_solving": 0.75
-            }},
-            "communication_skills": "описание стиля общения",
-            "experience_level": "junior/middle/senior",
-            "originality_score": 0.9,
-            "recommendations": ["список рекомендаций"],
-            "hr_recommendation": "recommended/needs_clarification/not_recommended",
-            "summary": "краткое резюме интервью"
-        }}
-        
-        Оценки должны быть от 0 до 1, где 1 - отлично.
-        """
+                    section += f"  Уточнение {j}: {follow_up}\n"
+            sections.append(section)
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            
-            return InterviewAnalysis(
-                candidate_id=interview.candidate_id,
-                position=interview.position,
-                overall_score=result["overall_score"],
-                competency_scores=result["competency_scores"],
-                communication_skills=result["communication_skills"],
-                experience_level=result["experience_level"],
-                originality_score=result["originality_score"],
-                recommendations=result["recommendations"],
-                hr_recommendation=result["hr_recommendation"],
-                summary=result["summary"]
-            )
-            
-        except Exception as e:
-            print(f"Error analyzing interview: {e}")
-            return InterviewAnalysis(
-                candidate_id=interview.candidate_id,
-                position=interview.position,
-                overall_score=0.5,
-                competency_scores={"experience": 0.5, "technical_skills": 0.5, "communication": 0.5, "problem_solving": 0.5},
-                communication_skills="Ошибка анализа",
-                experience_level="unknown",
-                originality_score=0.5,
-                recommendations=["Ошибка анализа интервью"],
-                hr_recommendation="needs_clarification",
-                summary="Произошла ошибка при анализе интервью"
+        return self.prompt_builder.build_sections(
+            instructions,
+            f"Позиция: {interview.position.value}\n\nОтветы кандидата:",
+            sections,
+            self.routes[method].input_budget
+        )
+    
+    def interview_request_body(self, interview: Interview, answers: List[Answer]) -> Dict[str, Any]:
+        """Chat completion request body for the interview analysis, e.g. for a provider batch file"""
+        route = self.routes["analyze_interview"]
+        body = {
+            "model": route.model,
+            "messages": self.interview_prompt(interview, answers).messages,
+            "temperature": route.temperature,
+            "max_tokens": route.max_tokens
+        }
+        if route.json_output and route.model not in self._no_json_mode:
+            body["response_format"] = {"type": "json_object"}
+        return body
+    
+    def interview_analysis_from_reply(self, interview: Interview, reply: str) -> InterviewAnalysis:
+        """Build InterviewAnalysis from a raw model reply obtained elsewhere (e.g. batch results)"""
+        data, _ = parse_json_object(reply)
+        result, missing = validate_partial(InterviewAnalysisResult, data)
+        if missing:
+            self.route_stats["analyze_interview"].record_parse("partial" if result else "wasted")
+            result = {**INTERVIEW_FALLBACK, **result}
+        else:
+            self.route_stats["analyze_interview"].record_parse("ok")
+        return InterviewAnalysis(candidate_id=interview.candidate_id, position=interview.position, **result)
+    
+    def analyze_interview(self, interview: Interview, answers: List[Answer], raise_errors: bool = False) -> InterviewAnalysis:
+        """Analyze complete interview; with raise_errors, API failures raise instead of giving the fallback"""
+        with self.telemetry.trace("analyze_interview"):
+            if self.fan_out:
+                result = self._analyze_interview_fan_out(interview, answers, raise_errors)
+            else:
+                prompt = self.interview_prompt(interview, answers)
+                try:
+                    result = self._complete_structured("analyze_interview", prompt, InterviewAnalysisResult, INTERVIEW_FALLBACK)
+                except Exception as e:
+                    if raise_errors:
+                        raise
+                    print(f"Error analyzing interview: {e}")
+                    self._mark_fallback(e)
+                    result = INTERVIEW_FALLBACK
+        
+        return InterviewAnalysis(
+            candidate_id=interview.candidate_id,
+            position=interview.position,
+            **result
+        )
+    
+    def _analyze_interview_shard(self, name: str, prompt: BuiltPrompt, trace: Optional[CallTrace]) -> Dict[str, Any]:
+        """Run one shard in an executor thread, accounted to the calling analyze_interview"""
+        shard = INTERVIEW_SHARDS[name]
+        with self.telemetry.attach(trace):
+            return self._complete_structured("analyze_interview_shard", prompt, shard.schema, shard.fallback())
+    
+    def _analyze_interview_fan_out(self, interview: Interview, answers: List[Answer], raise_errors: bool) -> Dict[str, Any]:
+        """Analyze the interview as concurrent per-competency shards, so it takes as long as the slowest one"""
+        trace = self.telemetry.current()
+        futures = {
+            name: self.executor.submit(
+                self._analyze_interview_shard, name,
+                self.interview_prompt(interview, answers, shard.instructions, "analyze_interview_shard"), trace
             )
+            for name, shard in INTERVIEW_SHARDS.items()
+        }
+        parts = {}
+        for name, future in futures.items():
+            try:
+                parts[name] = future.result()
+            except Exception as e:
+                if raise_errors:
+                    raise
+                print(f"Error analyzing interview shard {name}: {e}")
+                self._mark_fallback(e)
+                parts[name] = INTERVIEW_SHARDS[name].fallback()
+        return self.merge_interview_shards(parts)
+    
+    def merge_interview_shards(self, parts: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge shard results into one analysis; overall score and recommendation follow from the competencies"""
+        result = {}
+        competency_scores = {}
+        for name, shard in INTERVIEW_SHARDS.items():
+            part = dict(parts[name])
+            scores = part.pop("competency_scores", {})
+            for competency in shard.competencies:
+                if competency not in scores:
+                    self._mark_fallback()
+                competency_scores[competency] = scores.get(competency, INTERVIEW_FALLBACK["competency_scores"][competency])
+            result.update(part)
+        
+        # Deterministic: mean of the competencies, then the first threshold it reaches
+        overall_score = round(sum(competency_scores.values()) / len(competency_scores), 2)
+        hr_recommendation = next(
+            (label for threshold, label in RECOMMENDATION_THRESHOLDS if overall_score >= threshold),
+            "not_recommended"
+        )
+        return dict(result, competency_scores=competency_scores, overall_score=overall_score,
+                    hr_recommendation=hr_recommendation)
     
     def check_answer_quality(self, answer: str, question: str) -> Dict[str, Any]:
         """Check if answer needs follow-up questions"""
-        prompt = f"""
-        Оцените качество ответа кандидата на вопрос и определите, нужны ли уточняющие вопросы.
-        
-        Вопрос: {question}
-        Ответ: {answer}
-        
-        Проанализируйте:
-        1. Полнота ответа (0-1)
-        2. Конкретность (0-1)
-        3. Релевантность (0-1)
-        4. Нужны ли уточняющие вопросы (true/false)
-        
-        Ответ в формате JSON:
-        {{
-            "completeness": 0.7,
-            "specificity": 0.6,
-            "relevance": 0.8,
-            "needs_follow_up": true,
-            "reason": "причина для уточняющего вопроса"
-        }}
-        """
+        prompt = self.prompt_builder.build(
+            ANSWER_QUALITY_INSTRUCTIONS,
+            f"Вопрос: {question}\nОтвет: {answer}",
+            self.routes["check_answer_quality"].input_budget
+        )
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
+        with self.telemetry.trace("check_answer_quality"):
+            try:
+                if self.quality_batcher is not None:
+                    timeout = self.routes["check_answer_quality_batch"].timeout + Config.LLM_BATCH_MAX_WAIT_MS / 1000
+                    result = self.quality_batcher.submit((answer, question)).result(timeout=timeout)
+                    if result is not None:
+                        return result
+                return self._complete_structured("check_answer_quality", prompt, AnswerQualityResult, ANSWER_QUALITY_FALLBACK)
+            except Exception as e:
+                print(f"Error checking answer quality: {e}")
+                self._mark_fallback(e)
+                return dict(ANSWER_QUALITY_FALLBACK)
+    
+    def _check_answer_quality_batch(self, items: List[tuple]) -> List[Optional[Dict[str, Any]]]:
+        """Check several (answer, question) pairs in one request; None where the batch gave no valid result"""
+        if len(items) == 1:
+            # A batch of one is just the single call, which the waiter makes itself
+            return [None]
+        
+        sections = [f"Ответ {i}:\nВопрос: {question}\nОтвет: {answer}" for i, (answer, question) in enumerate(items, 1)]
+        with self.telemetry.trace("check_answer_quality_batch"):
+            prompt = self.prompt_builder.build_sections(
+                ANSWER_QUALITY_BATCH_INSTRUCTIONS,
+                f"Всего ответов: {len(items)}",
+                sections,
+                self.routes["check_answer_quality_batch"].input_budget
             )
-            
-            return json.loads(response.choices[0].message.content)
-        except Exception as e:
-            print(f"Error checking answer quality: {e}")
-            return {
-                "completeness": 0.5,
-                "specificity": 0.5,
-                "relevance": 0.5,
-                "needs_follow_up": False,
-                "reason": "Ошибка анализа"
-            }
+            reply = self._complete("check_answer_quality_batch", prompt)
+        
+        data, repaired = parse_json_object(reply)
+        entries = (data or {}).get("results")
+        defaults = {name: field.default for name, field in AnswerQualityResult.model_fields.items() if not field.is_required()}
+        results = [None] * len(items)
+        for entry in entries if isinstance(entries, list) else []:
+            index = entry.get("id") if isinstance(entry, dict) else None
+            if not isinstance(index, int) or not 1 <= index <= len(items):
+                continue
+            valid, missing = validate_partial(AnswerQualityResult, entry)
+            if not missing:
+                results[index - 1] = {**defaults, **valid}
+        
+        # Items without a valid result are retried one by one by their waiters
+        delivered = sum(result is not None for result in results)
+        outcome = "wasted" if not delivered else "partial" if delivered < len(items) else "repaired" if repaired else "ok"
+        self.route_stats["check_answer_quality_batch"].record_parse(outcome)
+        return results
     
     def generate_follow_up_question(self, original_question: str, answer: str, available_follow_ups: List[str]) -> str:
         """Generate appropriate follow-up question"""
-        prompt = f"""
-        На основе ответа кандидата сгенерируйте подходящий уточняющий вопрос.
+        prompt = self.prompt_builder.build(
+            FOLLOW_UP_INSTRUCTIONS,
+            f"Оригинальный вопрос: {original_question}\n"
+            f"Ответ кандидата: {answer}\n"
+            f"Доступные уточняющие вопросы: {available_follow_ups}",
+            self.routes["generate_follow_up_question"].input_budget
+        )
         
-        Оригинальный вопрос: {original_question}
-        Ответ кандидата: {answer}
-        Доступные уточняющие вопросы: {available_follow_ups}
-        
-        Выберите наиболее подходящий уточняющий вопрос из списка или сгенерируйте новый, если ни один не подходит.
-        Верните только текст вопроса.
-        """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating follow-up question: {e}")
-            return available_follow_ups[0] if available_follow_ups else "Можете рассказать подробнее?" 
\ No newline at end of file
+        with self.telemetry.trace("generate_follow_up_question"):
+            try:
+                return self._complete("generate_follow_up_question", prompt).strip()
+            except Exception as e:
+                print(f"Error generating follow-up question: {e}")
+                self._mark_fallback(e)
+                return available_follow_ups[0] if available_follow_ups else "Можете рассказать подробнее?" 
\ No newline at end of file
@@ -0,0 +1,141 @@
+import re
+from typing import Dict, Any, List, Set
+from models import Question
+from config import Config
+
+# Words that carry no meaning for relevance matching
+STOP_WORDS = {
+    "и", "в", "во", "не", "что", "он", "на", "я", "с", "со", "как", "а", "то", "все", "она",
+    "так", "его", "но", "да", "ты", "к", "у", "же", "вы", "за", "бы", "по", "только", "ее",
+    "мне", "было", "вот", "от", "меня", "еще", "нет", "о", "из", "ему", "теперь", "когда",
+    "даже", "ну", "ли", "если", "уже", "или", "ни", "быть", "был", "него", "до", "вас",
+    "нибудь", "опять", "уж", "вам", "ведь", "там", "потом", "себя", "ничего", "ей", "может",
+    "они", "тут", "где", "есть", "надо", "ней", "для", "мы", "тебя", "их", "чем", "была",
+    "сам", "чтоб", "без", "будто", "чего", "раз", "тоже", "себе", "под", "будет", "ж",
+    "тогда", "кто", "этот", "того", "потому", "этого", "какой", "совсем", "ним", "здесь",
+    "этом", "один", "почти", "мой", "тем", "чтобы", "нее", "были", "куда", "зачем", "всех",
+    "можно", "при", "об", "другой", "хоть", "после", "над", "больше", "тот", "через", "эти",
+    "нас", "про", "всего", "них", "какая", "много", "разве", "три", "эту", "моя", "свою",
+    "этой", "перед", "иногда", "лучше", "чуть", "том", "нельзя", "такой", "им", "более",
+    "всегда", "конечно", "всю", "между", "это", "ваш", "ваши", "вашем", "какие", "каких",
+}
+
+# Phrases that mark a vague, non-committal answer
+VAGUE_MARKERS = [
+    "не знаю", "не помню", "сложно сказать", "затрудняюсь", "как-то так", "всякое",
+    "по-разному", "не уверен", "не уверена", "ничего особенного", "обычно как все",
+]
+
+# Phrases that mark a concrete example or measurable result
+EVIDENCE_MARKERS = [
+    "например", "в частности", "однажды", "когда я", "в проекте", "на проекте", "в компании",
+    "результат", "удалось", "увеличил", "увеличила", "сократил", "сократила", "нашел", "нашла",
+    "внедрил", "внедрила", "отвечал", "отвечала", "лет", "года", "месяц",
+]
+
+# Domain vocabulary per question category, used as extra relevance evidence
+CATEGORY_TERMS = {
+    "Общая мотивация и опыт": ["опыт", "работ", "проект", "компан", "лет", "год", "интерес", "нрав", "мотив", "професс"],
+    "Навыки работы с клиентами": ["клиент", "довер", "слуша", "потребн", "конфликт", "ситуац", "решени", "отношен"],
+    "Процесс продаж": ["воронк", "лид", "crm", "сделк", "звонк", "встреч", "квалиф", "этап", "amocrm", "битрикс", "salesforce"],
+    "Результаты": ["план", "результ", "процент", "выручк", "кейс", "отказ", "возраж", "рост", "увелич"],
+    "Технические навыки": ["тест", "функцион", "регресс", "нагруз", "кейс", "баг", "дефект", "api", "ui", "смоук"],
+    "Инструменты": ["jira", "postman", "selenium", "testrail", "git", "sql", "charles", "devtools", "qase", "swagger"],
+    "Процессы и взаимодействие": ["команд", "разработ", "баг", "приоритет", "спринт", "agile", "scrum", "коммуник", "аналит"],
+}
+
+TOKEN_RE = re.compile(r"[a-zа-яё0-9]+", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\d+([.,]\d+)?\s*(%|процент|лет|год|месяц|млн|тыс|к\b)?", re.IGNORECASE)
+LATIN_TERM_RE = re.compile(r"\b[A-Za-z][A-Za-z0-9+#.\-]{1,}\b")
+
+STEM_LENGTH = 5
+
+
+def _stem(token: str) -> str:
+    """Cheap prefix stemming, good enough for Russian inflections"""
+    return token[:STEM_LENGTH]
+
+
+def content_stems(text: str) -> List[str]:
+    """Lowercase content-word stems of text; shared by the position matcher and the follow-up pool"""
+    return [_stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS and len(t) > 2]
+
+
+class AnswerScorer:
+    """Local heuristic answer-quality scorer (no network calls)"""
+
+    def __init__(self, low_threshold: float = None, high_threshold: float = None):
+        self.low_threshold = Config.ANSWER_SCORE_LOW if low_threshold is None else low_threshold
+        self.high_threshold = Config.ANSWER_SCORE_HIGH if high_threshold is None else high_threshold
+        self._question_stems: Dict[str, Set[str]] = {}
+
+    def _stems_for_question(self, question: Question) -> Set[str]:
+        """Reference vocabulary for a question, cached by question id"""
+        stems = self._question_stems.get(question.id)
+        if stems is None:
+            reference = " ".join([question.text] + list(question.follow_up_questions))
+            stems = set(content_stems(reference))
+            stems.update(CATEGORY_TERMS.get(question.category, []))
+            self._question_stems[question.id] = stems
+        return stems
+
+    def score(self, answer: str, question: Question) -> Dict[str, Any]:
+        """Estimate answer quality in the same shape as AIAnalyzer.check_answer_quality"""
+        text = answer.strip()
+        text_lower = text.lower()
+        tokens = TOKEN_RE.findall(text_lower)
+        stems = [_stem(t) for t in tokens if t not in STOP_WORDS and len(t) > 2]
+        word_count = len(tokens)
+        sentence_count = max(1, len([s for s in re.split(r"[.!?\n]+", text) if s.strip()]))
+
+        # Completeness: length saturates around a paragraph, several sentences help
+        completeness = min(1.0, word_count / 40) * 0.8 + min(1.0, sentence_count / 3) * 0.2
+
+        # Specificity: numbers, named tools, concrete examples, lexical variety
+        numbers = len(NUMBER_RE.findall(text))
+        latin_terms = len(LATIN_TERM_RE.findall(text))
+        evidence = sum(1 for marker in EVIDENCE_MARKERS if marker in text_lower)
+        variety = len(set(stems)) / len(stems) if stems else 0.0
+        specificity = (
+            min(1.0, numbers / 2) * 0.3 +
+            min(1.0, latin_terms / 2) * 0.2 +
+            min(1.0, evidence / 2) * 0.3 +
+            variety * 0.2
+        )
+
+        # Relevance: overlap with the question, its follow-ups and category vocabulary
+        reference = self._stems_for_question(question)
+        if stems:
+            hits = sum(1 for s in set(stems) if any(s.startswith(r) or r.startswith(s) for r in reference))
+            relevance = min(1.0, hits / 4)
+        else:
+            relevance = 0.0
+
+        vague = any(marker in text_lower for marker in VAGUE_MARKERS)
+        if vague:
+            specificity *= 0.5
+
+        overall = completeness * 0.4 + specificity * 0.35 + relevance * 0.25
+        needs_follow_up = overall < self.high_threshold
+        borderline = self.low_threshold <= overall < self.high_threshold
+
+        if word_count < 8:
+            reason = "Ответ слишком короткий"
+        elif vague:
+            reason = "Ответ неконкретный"
+        elif specificity < 0.3:
+            reason = "Не хватает конкретных примеров"
+        elif relevance < 0.3:
+            reason = "Ответ слабо связан с вопросом"
+        else:
+            reason = ""
+
+        return {
+            "completeness": round(completeness, 3),
+            "specificity": round(specificity, 3),
+            "relevance": round(relevance, 3),
+            "overall": round(overall, 3),
+            "needs_follow_up": needs_follow_up,
+            "borderline": borderline,
+            "reason": reason
+        }
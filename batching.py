@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Sequence
+
+class MicroBatcher:
+    """Collects items submitted from many threads and processes them in batches
+
+    The first item of a batch opens a window of max_wait seconds; the batch is sent when the
+    window closes or max_batch items are waiting, whichever comes first. Batches run on the
+    given executor, so the next batch can fill up while the previous one is in flight.
+    """
+
+    def __init__(self, process: Callable[[List[Any]], Sequence[Any]], executor: Executor,
+                 max_batch: int = 16, max_wait: float = 0.01, name: str = "batcher"):
+        self.process = process
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._pending: List[tuple] = []
+        self._deadline = 0.0
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._started = False
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item; the future resolves to its result from the batch"""
+        future = Future()
+        with self._cond:
+            if not self._started:
+                self._worker.start()
+                self._started = True
+            if not self._pending:
+                self._deadline = time.monotonic() + self.max_wait
+            self._pending.append((item, future))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                while len(self._pending) < self.max_batch:
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                if self._pending:
+                    self._deadline = time.monotonic() + self.max_wait
+                self.batches += 1
+                self.items += len(batch)
+            self.executor.submit(self._process, batch)
+
+    def _process(self, batch: List[tuple]):
+        """Run one batch and scatter its results (or its error) to the waiters"""
+        try:
+            results = self.process([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for i, (_, future) in enumerate(batch):
+            future.set_result(results[i] if i < len(results) else None)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Batch counters for monitoring"""
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "pending": len(self._pending)
+            }
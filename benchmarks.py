@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки HR-бота
+Использование:
+    python benchmarks.py answer-scorer verdicts.jsonl
+    python benchmarks.py record-verdicts answers.jsonl verdicts.jsonl
+    python benchmarks.py near-duplicates --size 10000
+    python benchmarks.py position-matcher --size 10000
+    python benchmarks.py follow-ups answers.jsonl [--llm]
+    python benchmarks.py load-test --requests 500 --concurrency 32 --latency lognormal:800,0.6 --rate-limit-rate 0.05
+    python benchmarks.py interview-fan-out --interviews 20 --latency fixed:300 --token-delay-ms 5
+    python benchmarks.py timeout-sweep --sizes 1000,10000,100000 --stale 100
+    python benchmarks.py session-memory --sizes 1000,10000,100000 --answers 6
+    python benchmarks.py cluster --workers 1,2,4 --updates 4000 --work-ms 2
+    python benchmarks.py logging --calls 20000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any
+
+from answer_scorer import AnswerScorer
+from near_duplicates import NearDuplicateIndex
+from position_matcher import PositionMatcher, position_profile
+from models import Position, Interview, InterviewSession, InterviewStatus, Answer
+from questions import get_question_by_id, get_all_questions
+from follow_ups import FollowUpPool
+from database import Database
+
+
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Read records from a JSONL file"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def answer_scorer_agreement(records: List[Dict[str, Any]], scorer: AnswerScorer = None) -> Dict[str, Any]:
+    """Compare local scorer decisions with recorded LLM verdicts"""
+    scorer = scorer or AnswerScorer()
+    latencies_us = []
+    local = agree = escalated = skipped = 0
+    confusion = {"tp": 0, "fp": 0, "tn": 0, "fn": 0}
+
+    for record in records:
+        question = get_question_by_id(record["question_id"])
+        if question is None:
+            skipped += 1
+            continue
+
+        started = time.perf_counter()
+        result = scorer.score(record["answer"], question)
+        latencies_us.append((time.perf_counter() - started) * 1_000_000)
+
+        if result["borderline"]:
+            escalated += 1
+            continue
+
+        local += 1
+        expected = bool(record["needs_follow_up"])
+        predicted = result["needs_follow_up"]
+        agree += predicted == expected
+        key = ("t" if predicted == expected else "f") + ("p" if predicted else "n")
+        confusion[key] += 1
+
+    total = local + escalated
+    return {
+        "total": total,
+        "skipped": skipped,
+        "decided_locally": local,
+        "escalated": escalated,
+        "escalation_rate": escalated / total if total else 0.0,
+        "local_agreement": agree / local if local else 0.0,
+        # Escalated answers get the LLM verdict, so they agree by construction
+        "effective_agreement": (agree + escalated) / total if total else 0.0,
+        "confusion": confusion,
+        "latency_us_p50": percentile(latencies_us, 50),
+        "latency_us_p99": percentile(latencies_us, 99),
+    }
+
+
+def record_verdicts(answers_path: str, output_path: str):
+    """Record LLM verdicts for answers, to be used by the agreement benchmark"""
+    from ai_analyzer import AIAnalyzer
+
+    analyzer = AIAnalyzer()
+    with open(output_path, "a", encoding="utf-8") as out:
+        for record in load_jsonl(answers_path):
+            question = get_question_by_id(record["question_id"])
+            if question is None:
+                continue
+            verdict = analyzer.check_answer_quality(record["answer"], question.text)
+            record = dict(record, needs_follow_up=bool(verdict.get("needs_follow_up", False)), verdict=verdict)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def near_duplicate_benchmark(size: int, queries: int = 200, seed: int = 7) -> Dict[str, Any]:
+    """Index synthetic answers, then query lightly edited copies: recall and latency"""
+    rng = random.Random(seed)
+    vocabulary = [f"слово{i}" for i in range(5000)]
+    texts = [" ".join(rng.choices(vocabulary, k=40)) for _ in range(size)]
+    index = NearDuplicateIndex()
+
+    started = time.perf_counter()
+    for key, text in enumerate(texts):
+        index.add("q", key, text)
+    add_us = (time.perf_counter() - started) * 1_000_000 / max(1, size)
+
+    latencies_us = []
+    found = 0
+    for key in rng.sample(range(size), min(queries, size)):
+        words = texts[key].split()
+        words[rng.randrange(len(words))] = rng.choice(vocabulary)
+        started = time.perf_counter()
+        nearest = index.query("q", " ".join(words), k=1)
+        latencies_us.append((time.perf_counter() - started) * 1_000_000)
+        found += bool(nearest) and nearest[0][0] == key
+
+    return {
+        "size": size,
+        "add_us_avg": add_us,
+        "recall_at_1": found / len(latencies_us) if latencies_us else 0.0,
+        "query_us_p50": percentile(latencies_us, 50),
+        "query_us_p99": percentile(latencies_us, 99),
+    }
+
+
+def position_matcher_benchmark(size: int, seed: int = 7) -> Dict[str, Any]:
+    """Index synthetic resumes built from profile vocabulary, then time matching and top-K ranking"""
+    rng = random.Random(seed)
+    vocabulary = {position: position_profile(position).split() for position in Position}
+    matcher = PositionMatcher()
+    resumes = [" ".join(rng.choices(vocabulary[rng.choice(list(Position))], k=120)) for _ in range(size)]
+
+    started = time.perf_counter()
+    for key, text in enumerate(resumes):
+        matcher.add_resume(key, text)
+    add_us = (time.perf_counter() - started) * 1_000_000 / max(1, size)
+
+    match_us = []
+    for text in resumes[:200]:
+        started = time.perf_counter()
+        matcher.match(text)
+        match_us.append((time.perf_counter() - started) * 1_000_000)
+
+    top_k_ms = []
+    for position in Position:
+        started = time.perf_counter()
+        matcher.top_k(position, 10)
+        top_k_ms.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "size": size,
+        "add_us_avg": add_us,
+        "match_us_p50": percentile(match_us, 50),
+        "match_us_p99": percentile(match_us, 99),
+        "top_k_ms_max": max(top_k_ms),
+    }
+
+
+def follow_up_latency(records: List[Dict[str, Any]], analyzer=None) -> Dict[str, Any]:
+    """Follow-up latency from the precomputed pool, and from the LLM round trip when an analyzer is given"""
+    pool = FollowUpPool(get_all_questions())
+    pool_us, llm_ms = [], []
+    for record in records:
+        question = get_question_by_id(record["question_id"])
+        if question is None:
+            continue
+        started = time.perf_counter()
+        pool.select(question, record["answer"])
+        pool_us.append((time.perf_counter() - started) * 1_000_000)
+        if analyzer is not None:
+            started = time.perf_counter()
+            analyzer.generate_follow_up_question(question.text, record["answer"], question.follow_up_questions)
+            llm_ms.append((time.perf_counter() - started) * 1000)
+
+    report = {"total": len(pool_us), "pool_us_p50": percentile(pool_us, 50), "pool_us_p99": percentile(pool_us, 99)}
+    if analyzer is not None:
+        report.update(llm_ms_p50=percentile(llm_ms, 50), llm_ms_p99=percentile(llm_ms, 99))
+    return report
+
+
+def analyzer_load_test(requests: int, concurrency: int, settings, batch: bool = False) -> Dict[str, Any]:
+    """Drive AIAnalyzer against the local fake server with a mix of interactive and heavy calls"""
+    from ai_analyzer import AIAnalyzer
+    from config import Config
+    from fake_openai import start_fake_server
+
+    server, base_url = start_fake_server(settings=settings)
+    Config.OPENAI_BASE_URL = base_url
+    Config.OPENAI_API_KEY = Config.OPENAI_API_KEY or "fake"
+    Config.LLM_BATCH_QUALITY_CHECKS = batch
+    analyzer = AIAnalyzer()
+
+    interview = Interview(candidate_id=1, position=Position.QA)
+    answers = [Answer(question_id="qa_1", answer_text="Тестирую веб-приложения три года, пишу тест-кейсы в TestRail")]
+    workload = [
+        lambda: analyzer.check_answer_quality("Пишу тест-кейсы и веду баги в Jira", "Как вы тестируете?"),
+        lambda: analyzer.check_answer_quality("Не знаю", "Чем отличается регресс от смоука?"),
+        lambda: analyzer.generate_follow_up_question("Как вы тестируете?", "Вручную", ["Какие инструменты?"]),
+        lambda: analyzer.analyze_resume("QA инженер, 3 года, Postman, SQL, Jira", Position.QA),
+        lambda: analyzer.analyze_interview(interview, answers),
+    ]
+
+    def timed_call(i: int) -> float:
+        started = time.perf_counter()
+        workload[i % len(workload)]()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies_ms = list(executor.map(timed_call, range(requests)))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    server.server_close()
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "latency_model": settings.latency.spec,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "latency_ms_p50": percentile(latencies_ms, 50),
+        "latency_ms_p99": percentile(latencies_ms, 99),
+        "server": dict(settings.stats),
+        "batching": analyzer.get_batching_stats(),
+        "breaker": analyzer.get_breaker_state(),
+        "routes": analyzer.get_route_stats(),
+        "telemetry": analyzer.get_telemetry(),
+    }
+
+
+def interview_fan_out_benchmark(interviews: int, settings) -> Dict[str, Any]:
+    """Wall-clock time of analyze_interview as one prompt and as concurrent per-competency shards"""
+    from ai_analyzer import AIAnalyzer
+    from config import Config
+    from fake_openai import start_fake_server
+
+    server, base_url = start_fake_server(settings=settings)
+    Config.OPENAI_BASE_URL = base_url
+    Config.OPENAI_API_KEY = Config.OPENAI_API_KEY or "fake"
+    analyzer = AIAnalyzer()
+
+    answers = [Answer(question_id=question.id, answer_text=f"Ответ на вопрос: {question.text}")
+               for question in get_all_questions()[:8]]
+    report = {"interviews": interviews, "latency_model": settings.latency.spec, "token_delay_ms": settings.token_delay * 1000}
+    for mode, fan_out in (("single", False), ("fan_out", True)):
+        analyzer.fan_out = fan_out
+        latencies_ms = []
+        for i in range(interviews):
+            started = time.perf_counter()
+            analyzer.analyze_interview(Interview(candidate_id=i, position=Position.QA), answers)
+            latencies_ms.append((time.perf_counter() - started) * 1000)
+        report[f"{mode}_ms_p50"] = percentile(latencies_ms, 50)
+        report[f"{mode}_ms_p99"] = percentile(latencies_ms, 99)
+    server.shutdown()
+    server.server_close()
+
+    report["routes"] = {method: stats for method, stats in analyzer.get_route_stats().items()
+                        if method.startswith("analyze_interview")}
+    return report
+
+
+def timeout_sweep_benchmark(sizes: List[int], stale: int = 100) -> Dict[str, Any]:
+    """Time one timeout sweep over growing numbers of open interviews with a fixed number of stale ones"""
+    now = datetime.now()
+    fresh_at = now.isoformat()
+    stale_at = (now - timedelta(hours=2)).isoformat()
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            db = Database(os.path.join(directory, "sweep.db"))
+            rows = [(i, Position.QA.value, "in_progress", fresh_at, stale_at if i < stale else fresh_at)
+                    for i in range(size)]
+            with sqlite3.connect(db.db_path) as conn:
+                conn.executemany(
+                    "INSERT INTO interviews (candidate_id, position, status, started_at, last_activity_at) "
+                    "VALUES (?, ?, ?, ?, ?)", rows
+                )
+            started = time.perf_counter()
+            timed_out = db.timeout_stale_interviews(now - timedelta(minutes=30))
+            results[size] = {"timed_out": len(timed_out), "sweep_ms": (time.perf_counter() - started) * 1000}
+    return {"stale": stale, "sizes": results}
+
+
+def session_memory_benchmark(sizes: List[int], answers: int = 6) -> Dict[str, Any]:
+    """Bytes per open session: full Interview with its transcript versus the slotted InterviewSession
+
+    Each session is mid-interview with `answers` stored answers and one answer waiting for its follow-up.
+    """
+    def full(i: int):
+        interview = Interview(candidate_id=i, position=Position.QA, status=InterviewStatus.IN_PROGRESS)
+        for n in range(answers):
+            interview.add_answer(Answer(question_id=f"qa_{n}", answer_text=f"Ответ {i} на вопрос {n}. " * 10))
+        pending = Answer(question_id=f"qa_{answers}", answer_text=f"Ответ {i} без уточнения. " * 10)
+        return (i, interview), {"waiting_for_follow_up": True, "current_answer": pending}
+
+    def compact(i: int):
+        session = InterviewSession(i, i, Position.QA, InterviewStatus.IN_PROGRESS, answers)
+        return session, {"waiting_for_follow_up": True, "current_answer_text": f"Ответ {i} без уточнения. " * 10}
+
+    results = {}
+    for size in sizes:
+        results[size] = {}
+        for name, build in (("before", full), ("after", compact)):
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            sessions = {}
+            user_data = {}
+            for i in range(size):
+                sessions[i], user_data[i] = build(i)
+            used = tracemalloc.get_traced_memory()[0] - baseline
+            tracemalloc.stop()
+            del sessions, user_data
+            results[size][f"{name}_bytes_per_session"] = round(used / size)
+        results[size]["ratio"] = round(results[size]["before_bytes_per_session"] / results[size]["after_bytes_per_session"], 1)
+    return {"answers_per_session": answers, "sizes": results}
+
+
+def _cluster_worker(ports, processed, secret: str, work_ms: float):
+    """Benchmark worker process: the worker webhook server and a handler burning work_ms of CPU per update"""
+    from webhook import WebhookServer
+
+    async def serve():
+        application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        server = WebhookServer(application, secret, "127.0.0.1", 0)
+        ports.put(await server.start())
+        while True:
+            await application.update_queue.get()
+            deadline = time.perf_counter() + work_ms / 1000
+            while time.perf_counter() < deadline:
+                pass
+            with processed.get_lock():
+                processed.value += 1
+
+    asyncio.run(serve())
+
+
+def cluster_benchmark(worker_counts: List[int], updates: int, work_ms: float, users: int = 1000,
+                      connections: int = 8) -> Dict[str, Any]:
+    """Updates per second through the supervisor ingress for different numbers of worker processes"""
+    from cluster import RoutingWebhookServer, WorkerLink
+    from webhook import SECRET_HEADER
+
+    secret = "benchmark"
+    context = multiprocessing.get_context("spawn")
+    bodies = [json.dumps({"update_id": i, "message": {
+        "message_id": i, "date": 0, "text": "ответ", "chat": {"id": i % users + 1, "type": "private"},
+        "from": {"id": i % users + 1, "is_bot": False, "first_name": "Иван"}}}).encode() for i in range(updates)]
+
+    async def post_all(port: int):
+        async def client(part: List[bytes]):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            for body in part:
+                writer.write(f"POST /telegram HTTP/1.1\r\n{SECRET_HEADER}: {secret}\r\n"
+                             f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+            writer.close()
+        await asyncio.gather(*(client(bodies[i::connections]) for i in range(connections)))
+
+    async def run(workers: int) -> float:
+        ports, processed = context.Queue(), context.Value("i", 0)
+        processes = [context.Process(target=_cluster_worker, args=(ports, processed, secret, work_ms), daemon=True)
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        links = [WorkerLink("127.0.0.1", await asyncio.to_thread(ports.get), "/telegram", secret)
+                 for _ in range(workers)]
+        for link in links:
+            link.start()
+        ingress = RoutingWebhookServer(links, secret, "127.0.0.1", 0)
+        port = await ingress.start()
+        try:
+            started = time.perf_counter()
+            await post_all(port)
+            while processed.value < updates:
+                await asyncio.sleep(0.01)
+            return time.perf_counter() - started
+        finally:
+            await ingress.stop()
+            for link in links:
+                await link.stop()
+            for process in processes:
+                process.terminate()
+
+    results = {}
+    for workers in worker_counts:
+        elapsed = asyncio.run(run(workers))
+        results[workers] = {"seconds": elapsed, "updates_per_second": updates / elapsed}
+    baseline = results[worker_counts[0]]["updates_per_second"]
+    for result in results.values():
+        result["speedup"] = result["updates_per_second"] / baseline
+    return {"updates": updates, "work_ms": work_ms, "cpu_count": os.cpu_count(), "workers": results}
+
+
+def logging_benchmark(calls: int) -> Dict[str, Any]:
+    """Cost of one bot-style INFO line on the calling thread: off, synchronous file handler, queue pipeline
+
+    Wall time includes the listener thread competing for the GIL (and, on one core, for the CPU);
+    thread CPU time is what the calling thread itself spends.
+    """
+    from log_pipeline import setup_logging, stop_logging, LOG_FORMAT
+
+    logger = logging.getLogger("bot")
+    root = logging.getLogger()
+    quality = {"needs_follow_up": False, "score": 0.72, "borderline": False}
+    results = {}
+
+    def measure(eager: bool) -> Dict[str, float]:
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        for i in range(calls):
+            if eager:
+                logger.info(f"Answer quality for qa_{i % 20} (user {i}): {quality}")
+            else:
+                logger.info("Answer quality for %s (user %s): %s", f"qa_{i % 20}", i, quality)
+        return {"wall_us": (time.perf_counter() - started) * 1_000_000 / calls,
+                "thread_cpu_us": (time.thread_time() - cpu_started) * 1_000_000 / calls}
+
+    saved_handlers, saved_level = root.handlers[:], root.level
+    with tempfile.TemporaryDirectory() as directory:
+        root.handlers = []
+        root.setLevel(logging.WARNING)
+        results["off"] = measure(eager=False)
+        results["off_eager_f_string"] = measure(eager=True)
+
+        handler = logging.FileHandler(os.path.join(directory, "sync.log"), encoding="utf-8")
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.handlers = [handler]
+        root.setLevel(logging.INFO)
+        results["sync_file_f_string"] = measure(eager=True)
+        handler.close()
+        root.handlers = []
+
+        for name, rates in (("queue", None), ("queue_sampled_1_in_10", {"bot": 10})):
+            setup_logging("INFO", os.path.join(directory, f"{name}.log"), 10 * 1024 * 1024, 2,
+                          sample_rates=rates, console=False)
+            results[name] = measure(eager=False)
+            started = time.perf_counter()
+            stop_logging()
+            results[name]["drain_ms"] = (time.perf_counter() - started) * 1000
+            root.handlers = []
+    root.handlers, root.level = saved_handlers, saved_level
+    return {"calls": calls, **results}
+
+
+def print_report(report: Dict[str, Any]):
+    """Print benchmark report as JSON"""
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Бенчмарки HR-бота")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scorer_parser = subparsers.add_parser("answer-scorer", help="согласие локальной оценки ответов с LLM")
+    scorer_parser.add_argument("verdicts", help="JSONL с полями question_id, answer, needs_follow_up")
+
+    record_parser = subparsers.add_parser("record-verdicts", help="записать вердикты LLM для ответов")
+    record_parser.add_argument("answers", help="JSONL с полями question_id, answer")
+    record_parser.add_argument("output", help="куда дописать вердикты")
+
+    duplicates_parser = subparsers.add_parser("near-duplicates", help="полнота и задержка индекса дубликатов")
+    duplicates_parser.add_argument("--size", type=int, default=10000, help="число ответов в индексе")
+
+    matcher_parser = subparsers.add_parser("position-matcher", help="скорость локального сопоставления резюме")
+    matcher_parser.add_argument("--size", type=int, default=10000, help="число резюме в индексе")
+
+    follow_ups_parser = subparsers.add_parser("follow-ups", help="задержка уточняющих вопросов: пул против LLM")
+    follow_ups_parser.add_argument("answers", help="JSONL с полями question_id, answer")
+    follow_ups_parser.add_argument("--llm", action="store_true", help="также измерить генерацию через LLM")
+
+    load_parser = subparsers.add_parser("load-test", help="нагрузочный тест AIAnalyzer на локальном сервере")
+    load_parser.add_argument("--requests", type=int, default=200)
+    load_parser.add_argument("--concurrency", type=int, default=16)
+    load_parser.add_argument("--latency", default="lognormal:300,0.5", help="распределение задержки, мс")
+    load_parser.add_argument("--error-rate", type=float, default=0.0)
+    load_parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    load_parser.add_argument("--seed", type=int, default=1)
+    load_parser.add_argument("--batch", action="store_true", help="объединять проверки качества ответов")
+
+    fan_out_parser = subparsers.add_parser("interview-fan-out", help="анализ интервью одним запросом против параллельных")
+    fan_out_parser.add_argument("--interviews", type=int, default=20)
+    fan_out_parser.add_argument("--latency", default="fixed:300", help="задержка до начала ответа, мс")
+    fan_out_parser.add_argument("--token-delay-ms", type=float, default=5.0, help="время генерации одного токена, мс")
+
+    sweep_parser = subparsers.add_parser("timeout-sweep", help="время проверки таймаутов при росте числа собеседований")
+    sweep_parser.add_argument("--sizes", default="1000,10000,100000", help="числа открытых собеседований через запятую")
+    sweep_parser.add_argument("--stale", type=int, default=100, help="сколько из них просрочено")
+
+    memory_parser = subparsers.add_parser("session-memory", help="память на одну открытую сессию до и после компактных записей")
+    memory_parser.add_argument("--sizes", default="1000,10000,100000", help="числа сессий через запятую")
+    memory_parser.add_argument("--answers", type=int, default=6, help="сохраненных ответов в каждой сессии")
+
+    cluster_parser = subparsers.add_parser("cluster", help="пропускная способность супервизора при разном числе процессов")
+    cluster_parser.add_argument("--workers", default="1,2,4", help="числа процессов-обработчиков через запятую")
+    cluster_parser.add_argument("--updates", type=int, default=4000)
+    cluster_parser.add_argument("--work-ms", type=float, default=2.0, help="процессорное время обработки одного обновления, мс")
+
+    logging_parser = subparsers.add_parser("logging", help="накладные расходы журналирования на вызывающем потоке")
+    logging_parser.add_argument("--calls", type=int, default=20000)
+
+    args = parser.parse_args()
+
+    if args.command == "answer-scorer":
+        print_report(answer_scorer_agreement(load_jsonl(args.verdicts)))
+    elif args.command == "record-verdicts":
+        record_verdicts(args.answers, args.output)
+    elif args.command == "near-duplicates":
+        print_report(near_duplicate_benchmark(args.size))
+    elif args.command == "position-matcher":
+        print_report(position_matcher_benchmark(args.size))
+    elif args.command == "follow-ups":
+        analyzer = None
+        if args.llm:
+            from ai_analyzer import AIAnalyzer
+            analyzer = AIAnalyzer()
+        print_report(follow_up_latency(load_jsonl(args.answers), analyzer))
+    elif args.command == "load-test":
+        from fake_openai import FakeSettings
+        settings = FakeSettings(args.latency, args.error_rate, args.rate_limit_rate, seed=args.seed)
+        print_report(analyzer_load_test(args.requests, args.concurrency, settings, args.batch))
+    elif args.command == "interview-fan-out":
+        from fake_openai import FakeSettings
+        settings = FakeSettings(args.latency, token_delay=args.token_delay_ms / 1000)
+        print_report(interview_fan_out_benchmark(args.interviews, settings))
+    elif args.command == "timeout-sweep":
+        print_report(timeout_sweep_benchmark([int(size) for size in args.sizes.split(",")], args.stale))
+    elif args.command == "session-memory":
+        print_report(session_memory_benchmark([int(size) for size in args.sizes.split(",")], args.answers))
+    elif args.command == "cluster":
+        print_report(cluster_benchmark([int(count) for count in args.workers.split(",")], args.updates, args.work_ms))
+    elif args.command == "logging":
+        print_report(logging_benchmark(args.calls))
+
+
+if __name__ == "__main__":
+    main()
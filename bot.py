@@ -1,30 +1,43 @@
 import asyncio
 import logging
-from datetime import datetime
-from typing import Dict, Optional, Tuple
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, Union
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, CallbackQueryHandler,
     ContextTypes, filters
 )
 from telegram.constants import ParseMode
+from telegram.helpers import escape_markdown
 
 from config import Config
-from models import Candidate, Interview, Answer, Position, InterviewStatus, InterviewAnalysis
+from models import Candidate, Interview, InterviewSession, Answer, Position, InterviewStatus, InterviewAnalysis
 from database import Database
-from questions import get_questions_for_position, Question, get_contact_questions_for_position, get_professional_questions_for_position
+from questions import get_questions_for_position, Question, get_contact_questions_for_position, get_professional_questions_for_position, get_all_questions
 from ai_analyzer import AIAnalyzer
+from answer_scorer import AnswerScorer
+from follow_ups import FollowUpPool, DEFAULT_FOLLOW_UP
+from webhook import run_application
+from dispatcher import PerUserUpdateProcessor
+from session_store import SessionPersistence
+from outbound import PrioritizedRateLimiter
+from digests import HRDigest, DigestEntry, RESULT_CALLBACK_PREFIX
+from log_pipeline import setup_logging_from_config
 
-# Configure logging with more detailed format
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-    level=getattr(logging, Config.LOG_LEVEL),
-    handlers=[
-        logging.FileHandler('hrbot.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+# Named explicitly: supervisor workers run this file as __main__, and LOG_SAMPLE_RATES matches on "bot"
+logger = logging.getLogger("bot")
+
+# HR-facing recommendation labels; the raw values contain "_", which breaks Markdown
+HR_RECOMMENDATION_LABELS = {
+    'recommended': 'рекомендован',
+    'needs_clarification': 'требует рассмотрения',
+    'not_recommended': 'не рекомендован'
+}
+
+def md(value: Any) -> str:
+    """Text from candidate data or the model, escaped for ParseMode.MARKDOWN"""
+    return escape_markdown(str(value), version=1)
 
 class HRBot:
     """Main HR Bot class"""
@@ -32,7 +45,28 @@ class HRBot:
     def __init__(self):
         self.db = Database()
         self.ai_analyzer = AIAnalyzer()
-        self.active_interviews: Dict[int, Tuple[int, Interview]] = {}  # user_id -> (interview_id, interview)
+        self.answer_scorer = AnswerScorer()
+        self.follow_up_pool = FollowUpPool.load(Config.FOLLOW_UP_POOL_PATH, get_all_questions())
+        self.active_interviews: Dict[int, InterviewSession] = {}  # user_id -> open interview
+        self.users_without_interview: Set[int] = set()  # checked in the database, nothing open
+        # Different candidates are served in parallel, each candidate's updates in order
+        self.update_processor = PerUserUpdateProcessor(Config.UPDATE_CONCURRENCY)
+        # Outgoing messages stay under Telegram's flood limits; candidate replies go before HR notifications
+        self.rate_limiter = PrioritizedRateLimiter(
+            Config.OUTBOUND_GLOBAL_PER_SECOND, Config.OUTBOUND_CHAT_PER_SECOND,
+            group_rate=Config.OUTBOUND_GROUP_PER_MINUTE / 60, max_retries=Config.OUTBOUND_MAX_RETRIES,
+            notification_chats={Config.RESULTS_RECIPIENT}
+        )
+        # Without HR_DIGEST every result is sent on its own
+        self.hr_digest = HRDigest(
+            self.send_to_hr, Config.HR_DIGEST_MAX_DELAY_SECONDS,
+            Config.HR_DIGEST_BURST if Config.HR_DIGEST else float("inf"),
+            Config.HR_DIGEST_WINDOW_SECONDS, Config.HR_DIGEST_MAX_ITEMS
+        )
+        self.application: Optional[Application] = None
+        self.sweep_stats = {"runs": 0, "evicted": 0, "last_evicted": 0, "last_duration": 0.0}
+        self._sweeper: Optional[asyncio.Task] = None
+        self._hr_outbox_poller: Optional[asyncio.Task] = None
         
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -92,6 +126,8 @@ class HRBot:
             await self.start_interview(query, context, context.user_data.get('selected_position'))
         elif query.data == "start_interview_after_resume":
             await self.start_interview(query, context, context.user_data.get('selected_position'))
+        elif query.data.startswith(RESULT_CALLBACK_PREFIX):
+            await self.show_hr_result(query, int(query.data[len(RESULT_CALLBACK_PREFIX):]))
     
     async def ask_for_resume(self, query, context: ContextTypes.DEFAULT_TYPE, position: Position):
         """Ask if candidate wants to upload resume after position selection"""
@@ -118,7 +154,7 @@ class HRBot:
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-        logger.info(f"User {query.from_user.id} selected position {position.value}, asking for resume")
+        logger.info("User %s selected position %s, asking for resume", query.from_user.id, position.value)
     
     async def ask_for_resume_upload(self, query, context: ContextTypes.DEFAULT_TYPE):
         """Ask to upload resume"""
@@ -155,8 +191,8 @@ class HRBot:
         
         await query.edit_message_text(message, reply_markup=reply_markup)
     
-    async def start_interview(self, query, context: ContextTypes.DEFAULT_TYPE, position: Position):
-        """Start interview for selected position"""
+    async def start_interview(self, query, context: ContextTypes.DEFAULT_TYPE, position: Position, delay: float = 0):
+        """Start interview for selected position; with delay the first question is sent after that pause"""
         # Handle both Update and CallbackQuery objects
         if hasattr(query, 'from_user'):
             user_id = query.from_user.id
@@ -180,7 +216,8 @@ class HRBot:
         )
         
         interview_id = self.db.save_interview(interview)
-        self.active_interviews[user_id] = (interview_id, interview)
+        self.active_interviews[user_id] = InterviewSession.from_interview(interview_id, interview)
+        self.users_without_interview.discard(user_id)
         
         # Get all questions (contact + professional)
         questions = get_questions_for_position(position)
@@ -194,16 +231,14 @@ class HRBot:
             
             # Handle different types of query objects
             if hasattr(query, 'edit_message_text'):
-                await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN)
+                send = lambda: query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN)
             elif hasattr(query, 'message'):
-                await query.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+                send = lambda: query.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
             else:
                 logger.error("Cannot send message - unknown query type")
                 return
             
-            # Set state to wait for answer
-            context.user_data['waiting_for_answer'] = True
-            context.user_data['current_question_id'] = first_question.id
+            await self.send_question(context, send, first_question.id, delay)
         else:
             error_message = "Ошибка: вопросы для данной позиции не найдены."
             if hasattr(query, 'edit_message_text'):
@@ -249,7 +284,7 @@ class HRBot:
             await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
             
         except Exception as e:
-            logger.error(f"Error showing resume analysis: {e}")
+            logger.error("Error showing resume analysis: %s", e)
             # Fallback to simple start
             await update.message.reply_text(
                 "✅ **Резюме сохранено!**\n\n"
@@ -257,9 +292,24 @@ class HRBot:
                 "🚀 **Удачи!** Мы верим в ваш успех! 💪",
                 parse_mode=ParseMode.MARKDOWN
             )
-            # Start interview after a short delay
-            await asyncio.sleep(2)
-            await self.start_interview(update, context, position)
+            # Start interview now; only its first question waits for the pause
+            await self.start_interview(update, context, position, delay=Config.MESSAGE_PAUSE_SECONDS)
+    
+    async def get_interview_session(self, user_id: int) -> Optional[InterviewSession]:
+        """Active interview of a user; after a restart it is reloaded from the database on first use"""
+        session = self.active_interviews.get(user_id)
+        if session is None and user_id not in self.users_without_interview:
+            stored = await asyncio.to_thread(self.db.get_active_interview, user_id)
+            if stored is not None:
+                session = self.active_interviews[user_id] = InterviewSession.from_interview(*stored)
+                logger.info("Interview %s of user %s restored at question %s", session.interview_id, user_id, session.current_question_index)
+            else:
+                # Only start_interview opens an interview (in this process, which owns the user),
+                # so the database need not be asked again until then
+                if len(self.users_without_interview) >= 100000:
+                    self.users_without_interview.clear()
+                self.users_without_interview.add(user_id)
+        return session
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle text messages"""
@@ -278,9 +328,22 @@ class HRBot:
         
         # Check if waiting for answer
         if context.user_data.get('waiting_for_answer'):
+            if time.time() < context.user_data.get('question_visible_at', 0):
+                await update.message.reply_text("⏳ Секунду, следующий вопрос уже в пути.")
+                return
             await self.handle_answer(update, context, text)
             return
         
+        # The interview is still open but its session state is gone (e.g. restart without persistence)
+        session = await self.get_interview_session(user_id)
+        if session is not None:
+            questions = get_questions_for_position(session.position)
+            if session.current_question_index < len(questions):
+                context.user_data['waiting_for_answer'] = True
+                context.user_data['current_question_id'] = questions[session.current_question_index].id
+                await self.handle_answer(update, context, text)
+                return
+        
         # Default response
         await update.message.reply_text(
             "Используйте /start для начала собеседования или /help для справки."
@@ -291,7 +354,7 @@ class HRBot:
         user_id = update.effective_user.id
         position = context.user_data.get('selected_position')
         
-        logger.info(f"User {user_id} uploaded resume: {len(text)} characters for position {position}")
+        logger.info("User %s uploaded resume: %s characters for position %s", user_id, len(text), position)
         
         # Check if resume looks valid (not just random text)
         if len(text) < 50:
@@ -335,26 +398,35 @@ class HRBot:
             candidate.resume_text = text
             candidate.position = position
             self.db.save_candidate(candidate)
-            logger.info(f"Resume saved for user {user_id}")
+            logger.info("Resume saved for user %s", user_id)
+            
+            # Instant local match against every position profile, available before the LLM analysis
+            resume_match = await asyncio.to_thread(lambda: self.db.get_position_matcher().match(text))
+            context.user_data['resume_match'] = {p.value: score for p, score in resume_match.items()}
+            logger.info("Resume match for user %s: %s", user_id, context.user_data['resume_match'])
             
             # Analyze resume for selected position
             if position:
                 try:
-                    logger.info(f"Analyzing resume for position {position}")
-                    analysis = self.ai_analyzer.analyze_resume(text, position)
+                    logger.info("Analyzing resume for position %s", position)
+                    # A stream cannot be hedged, so with hedging on the hedged request path is used
+                    if Config.STREAM_RESUME_ANALYSIS and not self.ai_analyzer.hedging:
+                        analysis = await self.stream_resume_analysis(update, text, position)
+                    else:
+                        analysis = await asyncio.to_thread(self.ai_analyzer.analyze_resume, text, position)
                     candidate.experience_level = analysis.get('experience_level', 'unknown')
                     self.db.save_candidate(candidate)
                     
                     # Store analysis for interview adaptation
                     context.user_data['resume_analysis'] = analysis
                     
-                    logger.info(f"Resume analysis completed for user {user_id}: {analysis.get('experience_level', 'unknown')}")
+                    logger.info("Resume analysis completed for user %s: %s", user_id, analysis.get('experience_level', 'unknown'))
                     
                     # Show resume analysis to user
                     await self.show_resume_analysis(update, context, analysis, position)
                     
                 except Exception as e:
-                    logger.error(f"Error analyzing resume for user {user_id}: {e}")
+                    logger.error("Error analyzing resume for user %s: %s", user_id, e)
                     # Continue with interview even if analysis fails
                     await update.message.reply_text(
                         "✅ **Резюме сохранено!**\n\n"
@@ -373,44 +445,127 @@ class HRBot:
         # Clear resume waiting state
         context.user_data.pop('waiting_for_resume', None)
     
+    def format_resume_progress(self, fields: dict, done: bool = False) -> str:
+        """Format partially analyzed resume fields"""
+        lines = ["✅ Резюме проанализировано!" if done else "⏳ Анализирую резюме..."]
+        if fields.get('experience_level'):
+            lines.append(f"📊 Уровень опыта: {fields['experience_level']}")
+        if fields.get('experience_years'):
+            lines.append(f"📅 Опыт: {fields['experience_years']}")
+        if fields.get('key_skills'):
+            lines.append(f"🛠 Ключевые навыки: {', '.join(fields['key_skills'][:8])}")
+        if fields.get('relevant_experience'):
+            lines.append(f"💼 Релевантный опыт: {fields['relevant_experience']}")
+        if fields.get('summary'):
+            lines.append(f"📝 {fields['summary']}")
+        return "\n".join(lines)
+    
+    async def stream_resume_analysis(self, update: Update, text: str, position: Position) -> dict:
+        """Analyze resume with streaming, editing one message as fields arrive"""
+        message = await update.message.reply_text(self.format_resume_progress({}))
+        loop = asyncio.get_running_loop()
+        updates: asyncio.Queue = asyncio.Queue()
+        
+        def on_update(fields: dict):
+            # Called from the analyzer thread
+            loop.call_soon_threadsafe(updates.put_nowait, fields)
+        
+        task = asyncio.ensure_future(asyncio.to_thread(self.ai_analyzer.analyze_resume_stream, text, position, on_update))
+        shown = self.format_resume_progress({})
+        last_edit = 0.0
+        latest = None
+        
+        while not task.done():
+            wait_for = max(0.05, Config.STREAM_EDIT_INTERVAL_SECONDS - (loop.time() - last_edit))
+            getter = asyncio.ensure_future(updates.get())
+            done, _ = await asyncio.wait({task, getter}, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                latest = getter.result()
+            else:
+                getter.cancel()
+            
+            # Telegram limits message edits, so push at most one edit per interval
+            if latest is not None and loop.time() - last_edit >= Config.STREAM_EDIT_INTERVAL_SECONDS:
+                progress = self.format_resume_progress(latest)
+                if progress != shown:
+                    try:
+                        await message.edit_text(progress)
+                        shown = progress
+                    except Exception as e:
+                        logger.warning("Could not update resume progress: %s", e)
+                last_edit = loop.time()
+                latest = None
+        
+        analysis = task.result()
+        final = self.format_resume_progress(analysis, done=True)
+        if final != shown:
+            try:
+                await message.edit_text(final)
+            except Exception as e:
+                logger.warning("Could not update resume progress: %s", e)
+        return analysis
+    
     async def handle_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
         """Handle interview answer"""
         user_id = update.effective_user.id
-        logger.info(f"User {user_id} provided answer: {len(text)} characters")
+        logger.info("User %s provided answer: %s characters", user_id, len(text))
         
-        if user_id not in self.active_interviews:
-            logger.warning(f"User {user_id} tried to answer without active interview")
+        if await self.get_interview_session(user_id) is None:
+            logger.warning("User %s tried to answer without active interview", user_id)
             await update.message.reply_text("Собеседование не найдено. Используйте /start для начала.")
             return
         
-        interview_id, interview = self.active_interviews[user_id]
+        interview = self.active_interviews[user_id]
+        interview_id = interview.interview_id
         questions = get_questions_for_position(interview.position)
         
         if interview.current_question_index >= len(questions):
-            logger.info(f"Interview completed for user {user_id}")
+            logger.info("Interview completed for user %s", user_id)
             await self.complete_interview(update, context, user_id, interview)
             return
         
         current_question = questions[interview.current_question_index]
-        logger.info(f"Processing answer for question {current_question.id} (user {user_id})")
+        logger.info("Processing answer for question %s (user %s)", current_question.id, user_id)
         
         # Handle contact questions specifically (no follow-up questions)
         if current_question.category == "contact" or current_question.category == "introduction":
             await self.handle_contact_answer(update, context, text, current_question, user_id, interview_id, interview)
             return
         
+        # Start an LLM follow-up in the background; it races the precomputed pool. Without a grace
+        # period its result could never be used for this answer, so it is not started at all.
+        started = time.perf_counter()
+        speculative = None
+        if (Config.SPECULATIVE_FOLLOW_UPS and Config.FOLLOW_UP_LLM_GRACE_SECONDS > 0
+                and interview.follow_up_count < Config.MAX_FOLLOW_UP_QUESTIONS):
+            speculative = asyncio.create_task(asyncio.to_thread(
+                self.ai_analyzer.generate_follow_up_question,
+                current_question.text, text, self.follow_up_pool.get(current_question.id)
+            ))
+        
         # Save answer for regular questions
         answer = Answer(
             question_id=current_question.id,
             answer_text=text
         )
         
-        # Check if answer needs follow-up (simplified logic to avoid delays)
-        needs_follow_up = len(text) < 50 or interview.follow_up_count < 1
+        # The first follow-up is always asked and none past the limit, so the answer is scored only
+        # in between; locally, with only borderline answers going to the LLM
+        if interview.follow_up_count >= Config.MAX_FOLLOW_UP_QUESTIONS:
+            needs_follow_up = False
+        elif interview.follow_up_count < 1:
+            needs_follow_up = True
+        else:
+            quality = self.answer_scorer.score(text, current_question)
+            if quality["borderline"] and Config.ESCALATE_BORDERLINE_ANSWERS:
+                quality = await asyncio.to_thread(self.ai_analyzer.check_answer_quality, text, current_question.text)
+            logger.info("Answer quality for %s (user %s): %s", current_question.id, user_id, quality)
+            needs_follow_up = quality.get("needs_follow_up", False)
         
-        if needs_follow_up and interview.follow_up_count < Config.MAX_FOLLOW_UP_QUESTIONS:
+        if needs_follow_up:
             # Ask follow-up question
-            follow_up_question = current_question.follow_up_questions[0] if current_question.follow_up_questions else "Можете рассказать подробнее?"
+            follow_up_question, source = await self.choose_follow_up(current_question, text, speculative)
+            logger.info("Follow-up for %s from %s in %.0f ms", current_question.id, source, (time.perf_counter() - started) * 1000)
             
             message = f"""
 **Уточняющий вопрос:**
@@ -422,25 +577,52 @@ class HRBot:
             
             # Set state to wait for follow-up answer
             context.user_data['waiting_for_follow_up'] = True
-            context.user_data['current_answer'] = answer
+            # Only the text: the answer is stored in the database once the follow-up arrives
+            context.user_data['current_answer_text'] = text
             context.user_data['follow_up_question'] = follow_up_question
             
-            logger.info(f"Follow-up question sent to user {user_id}")
+            logger.info("Follow-up question sent to user %s", user_id)
             
         else:
+            if speculative is not None:
+                # The request keeps running in its thread; only its result is dropped
+                self.discard_follow_up(speculative)
+            
             # Save answer and move to next question
             self.db.save_answer(interview_id, answer)
-            interview.add_answer(answer)
+            interview.advance()
             self.db.update_interview(interview, interview_id)
             
-            logger.info(f"Answer saved and moving to next question for user {user_id}")
+            logger.info("Answer saved and moving to next question for user %s", user_id)
             await self.ask_next_question(update, context, interview, questions)
     
-    async def handle_contact_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, question: Question, user_id: int, interview_id: int, interview: Interview):
+    async def choose_follow_up(self, question: Question, answer: str, speculative: Optional[asyncio.Task]) -> Tuple[str, str]:
+        """Pick the follow-up that is ready first: the speculative LLM one or the pooled one"""
+        if speculative is not None and not speculative.done() and Config.FOLLOW_UP_LLM_GRACE_SECONDS > 0:
+            await asyncio.wait({speculative}, timeout=Config.FOLLOW_UP_LLM_GRACE_SECONDS)
+        
+        if speculative is not None and speculative.done() and not speculative.cancelled() and not speculative.exception():
+            follow_up, source = speculative.result(), "llm"
+        else:
+            follow_up, source = self.follow_up_pool.select(question, answer), "pool"
+            if speculative is not None:
+                # Written for this candidate's answer, so a late one is not added to the shared pool
+                self.discard_follow_up(speculative)
+        
+        if not follow_up:
+            follow_up, source = DEFAULT_FOLLOW_UP, "default"
+        self.follow_up_pool.record_served(source)
+        return follow_up, source
+    
+    def discard_follow_up(self, speculative: asyncio.Future):
+        """Drop a speculative follow-up that was not used, retrieving its error so it is not reported"""
+        speculative.add_done_callback(lambda task: task.cancelled() or task.exception())
+    
+    async def handle_contact_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, question: Question, user_id: int, interview_id: int, interview: InterviewSession):
         """Handle contact information answers"""
         candidate = self.db.get_candidate(user_id)
         if not candidate:
-            logger.error(f"Candidate not found for user {user_id}")
+            logger.error("Candidate not found for user %s", user_id)
             await update.message.reply_text("Ошибка: кандидат не найден. Пожалуйста, начните заново.")
             return
         
@@ -497,51 +679,98 @@ class HRBot:
             answer_text=text
         )
         self.db.save_answer(interview_id, answer)
-        interview.add_answer(answer)
+        interview.advance()
         self.db.update_interview(interview, interview_id)
         
-        logger.info(f"Contact answer saved for user {user_id}, moving to next question")
+        logger.info("Contact answer saved for user %s, moving to next question", user_id)
         await self.ask_next_question(update, context, interview, get_questions_for_position(interview.position))
     
     async def handle_follow_up_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
         """Handle follow-up answer"""
         user_id = update.effective_user.id
-        logger.info(f"User {user_id} provided follow-up answer: {len(text)} characters")
+        logger.info("User %s provided follow-up answer: %s characters", user_id, len(text))
         
-        if user_id not in self.active_interviews:
-            logger.warning(f"User {user_id} tried to provide follow-up without active interview")
+        if await self.get_interview_session(user_id) is None:
+            logger.warning("User %s tried to provide follow-up without active interview", user_id)
             await update.message.reply_text("Собеседование не найдено.")
             return
         
-        interview_id, interview = self.active_interviews[user_id]
-        current_answer = context.user_data.get('current_answer')
+        interview = self.active_interviews[user_id]
+        interview_id = interview.interview_id
+        answer_text = context.user_data.get('current_answer_text')
+        if answer_text is None and isinstance(context.user_data.get('current_answer'), Answer):
+            # Session saved before answers were kept as plain text
+            answer_text = context.user_data['current_answer'].answer_text
+        question_id = context.user_data.get('current_question_id')
+        questions = get_questions_for_position(interview.position)
         
-        if current_answer:
-            current_answer.follow_up_answers.append(text)
+        # Persisted flags are flushed only every SESSION_FLUSH_SECONDS and can lag behind the
+        # interview in the database; then the current question is asked again
+        if interview.current_question_index >= len(questions) or \
+                question_id != questions[interview.current_question_index].id:
+            logger.warning("Stale follow-up state for user %s (question %s), asking the current question again",
+                           user_id, question_id)
+            await self.ask_next_question(update, context, interview, questions)
+        elif answer_text is not None:
+            answer = Answer(question_id=question_id, answer_text=answer_text, follow_up_answers=[text])
             interview.follow_up_count += 1
             
             # Save answer and move to next question
-            self.db.save_answer(interview_id, current_answer)
-            interview.add_answer(current_answer)
+            self.db.save_answer(interview_id, answer)
+            interview.advance()
             self.db.update_interview(interview, interview_id)
             
-            logger.info(f"Follow-up answer saved for user {user_id}, moving to next question")
+            logger.info("Follow-up answer saved for user %s, moving to next question", user_id)
             
-            questions = get_questions_for_position(interview.position)
             await self.ask_next_question(update, context, interview, questions)
         else:
-            logger.error(f"No current answer found for user {user_id} follow-up")
+            logger.error("No current answer found for user %s follow-up", user_id)
             await update.message.reply_text("Ошибка обработки ответа. Пожалуйста, начните собеседование заново.")
         
         # Clear follow-up state
         context.user_data.pop('waiting_for_follow_up', None)
+        context.user_data.pop('current_answer_text', None)
         context.user_data.pop('current_answer', None)
         context.user_data.pop('follow_up_question', None)
     
-    async def ask_next_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, interview: Interview, questions: list):
+    def schedule(self, context: ContextTypes.DEFAULT_TYPE, delay: float,
+                 callback: Callable[[], Awaitable[Any]], name: str):
+        """Run callback after delay seconds without keeping the handler (and its worker slot) busy"""
+        async def run(_job_context=None):
+            try:
+                await callback()
+            except Exception as e:
+                logger.error("Error in scheduled %s: %s", name, e)
+        
+        if context.job_queue is not None:
+            context.job_queue.run_once(run, delay, name=name)
+        else:
+            # Without the job-queue extra a background task does the same
+            async def delayed():
+                await asyncio.sleep(delay)
+                await run()
+            context.application.create_task(delayed(), name=name)
+    
+    async def send_question(self, context: ContextTypes.DEFAULT_TYPE, send: Callable[[], Awaitable[Any]],
+                            question_id: str, delay: float = 0):
+        """Send a question now or after delay and wait for its answer
+
+        The state changes here, inside the handler (and its per-user lock); a timer only sends the text.
+        Until a delayed question is visible, messages are not taken as its answer.
+        """
+        if delay > 0:
+            self.schedule(context, delay, send, "ask_question")
+            context.user_data['question_visible_at'] = time.time() + delay
+        else:
+            await send()
+            context.user_data.pop('question_visible_at', None)
+        context.user_data['waiting_for_answer'] = True
+        context.user_data['current_question_id'] = question_id
+    
+    async def ask_next_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, interview: InterviewSession, questions: list):
         """Ask next question in interview"""
         if interview.current_question_index >= len(questions):
-            logger.info(f"All questions completed for user {interview.candidate_id}")
+            logger.info("All questions completed for user %s", interview.candidate_id)
             await self.complete_interview(update, context, interview.candidate_id, interview)
             return
         
@@ -552,9 +781,9 @@ class HRBot:
         professional_questions = get_professional_questions_for_position(interview.position)
         
         # If we're transitioning from contact to professional questions
-        if (interview.current_question_index == len(contact_questions) and 
-            next_question.id == professional_questions[0].id if professional_questions else None):
-            
+        transition = (interview.current_question_index == len(contact_questions) and 
+            next_question.id == professional_questions[0].id if professional_questions else None)
+        if transition:
             # Show transition message
             transition_message = f"""
 🎯 **Отлично! Контактные данные собраны.**
@@ -569,9 +798,6 @@ class HRBot:
             """
             
             await update.message.reply_text(transition_message, parse_mode=ParseMode.MARKDOWN)
-            
-            # Wait a moment before asking the first professional question
-            await asyncio.sleep(2)
         
         # Format message based on question category
         if next_question.category == "introduction":
@@ -587,102 +813,147 @@ class HRBot:
 💡 Отвечайте подробно и по существу. Это поможет мне лучше понять ваш опыт и навыки.
             """
         
-        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
-        
-        # Set state to wait for answer
-        context.user_data['waiting_for_answer'] = True
-        context.user_data['current_question_id'] = next_question.id
+        # The first professional question follows the transition message after a pause
+        await self.send_question(context, lambda: update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN),
+                                 next_question.id, Config.MESSAGE_PAUSE_SECONDS if transition else 0)
         
-        logger.info(f"Question {next_question.id} sent to user {interview.candidate_id}")
+        logger.info("Question %s sent to user %s", next_question.id, interview.candidate_id)
     
-    async def send_interview_results_to_hr(self, candidate: Candidate, interview: Interview, analysis: dict):
-        """Send interview results to HR specialist"""
-        try:
-            # Get all answers for the interview
-            interview_id, _ = self.active_interviews.get(candidate.user_id, (None, None))
-            if not interview_id:
-                logger.error(f"Interview ID not found for user {candidate.user_id}")
-                return
-            
-            answers = self.db.get_interview_answers(interview_id)
-            
-            # Format results message
-            message = f"""
+    async def resume_score(self, candidate: Candidate, position: Position) -> Optional[float]:
+        """Local match of the candidate's resume to a position, no LLM call needed; None without a resume"""
+        if not candidate.resume_text:
+            return None
+        # Bringing the matcher up to date reads the database, so it runs off the event loop
+        match = await asyncio.to_thread(lambda: self.db.get_position_matcher().match(candidate.resume_text, position))
+        return match[position]
+    
+    def format_hr_result(self, candidate: Candidate, interview: Union[Interview, InterviewSession],
+                         analysis: InterviewAnalysis, resume_score: Optional[float] = None) -> str:
+        """Full interview result message for HR"""
+        resume_match = f"{resume_score:.0%}" if resume_score is not None else "нет резюме"
+        
+        return f"""
 📊 **Новые результаты собеседования**
 
-👤 **Кандидат:** {candidate.first_name} {candidate.last_name}
-📱 **Телефон:** {candidate.phone or 'не указан'}
-📧 **Email:** {candidate.email or 'не указан'}
-💼 **Портфолио:** {candidate.portfolio or 'не указан'}
+👤 **Кандидат:** {md(candidate.first_name)} {md(candidate.last_name)}
+📱 **Телефон:** {md(candidate.phone or 'не указан')}
+📧 **Email:** {md(candidate.email or 'не указан')}
+💼 **Портфолио:** {md(candidate.portfolio or 'не указан')}
 🎯 **Позиция:** {interview.position.value.upper()}
 📅 **Дата:** {interview.started_at.strftime('%d.%m.%Y %H:%M')}
 
 📈 **Результаты анализа:**
-• Общий балл: {analysis.get('overall_score', 'N/A')}/10
-• Рекомендация: {analysis.get('hr_recommendation', 'N/A')}
-• Уровень опыта: {analysis.get('experience_level', 'N/A')}
+• Общий балл: {analysis.overall_score * 10:.1f}/10
+• Рекомендация: {HR_RECOMMENDATION_LABELS.get(analysis.hr_recommendation, md(analysis.hr_recommendation))}
+• Уровень опыта: {md(analysis.experience_level)}
+• Соответствие резюме профилю: {resume_match}
 
 💡 **Краткое резюме:**
-{analysis.get('summary', 'Недоступно')}
+{md(analysis.summary)}
 
 🔗 **Действия:** Связаться с кандидатом для дальнейших шагов
             """
+    
+    def format_hr_summary(self, candidate: Candidate, interview: Union[Interview, InterviewSession],
+                          analysis: InterviewAnalysis) -> str:
+        """One digest line for HR"""
+        recommendation = HR_RECOMMENDATION_LABELS.get(analysis.hr_recommendation, md(analysis.hr_recommendation))
+        return (f"{md(candidate.first_name)} {md(candidate.last_name)} — {interview.position.value.upper()} — "
+                f"{analysis.overall_score * 10:.1f}/10 — {recommendation}")
+    
+    async def send_to_hr(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+        await self.application.bot.send_message(
+            chat_id=Config.RESULTS_RECIPIENT,
+            text=text,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=reply_markup
+        )
+    
+    async def send_interview_results_to_hr(self, candidate: Candidate, interview: InterviewSession, analysis: InterviewAnalysis):
+        """Send interview results to HR specialist, on its own or in the next digest"""
+        try:
+            session = self.active_interviews.get(candidate.user_id)
+            interview_id = session.interview_id if session else None
+            if not interview_id:
+                logger.error("Interview ID not found for user %s", candidate.user_id)
+                return
             
-            # Send to HR specialist
-            await self.application.bot.send_message(
-                chat_id=Config.RESULTS_RECIPIENT,
-                text=message,
-                parse_mode=ParseMode.MARKDOWN
-            )
+            summary = self.format_hr_summary(candidate, interview, analysis)
+            text = self.format_hr_result(candidate, interview, analysis,
+                                         await self.resume_score(candidate, interview.position))
+            if not self.sends_to_hr():
+                # The HR chat's limits and digest live in worker 0, which picks the result up from the database
+                if not await asyncio.to_thread(self.db.enqueue_hr_result, interview_id, summary, text):
+                    return
+            else:
+                await self.hr_digest.submit(DigestEntry(interview_id, summary, text))
             
-            logger.info(f"Interview results sent to HR for user {candidate.user_id}")
+            logger.info("Interview results for user %s passed to HR", candidate.user_id)
             
         except Exception as e:
-            logger.error(f"Error sending interview results to HR: {e}")
+            logger.error("Error sending interview results to HR: %s", e)
+    
+    @staticmethod
+    def sends_to_hr() -> bool:
+        """Behind the supervisor only worker 0 writes to the HR chat"""
+        return Config.WORKER_COUNT <= 1 or Config.WORKER_INDEX == 0
+    
+    async def drain_hr_outbox(self) -> int:
+        """Pass results queued by the other workers to the HR digest; returns how many were taken"""
+        taken = 0
+        while True:
+            results = await asyncio.to_thread(self.db.take_hr_results)
+            for interview_id, summary, text in results:
+                await self.hr_digest.submit(DigestEntry(interview_id, summary, text))
+            taken += len(results)
+            if not results:
+                return taken
+    
+    async def show_hr_result(self, query, interview_id: int):
+        """Digest button: the full result of one interview"""
+        if not self.is_admin(query.from_user):
+            return
+        interview = self.db.get_interview(interview_id)
+        analysis = self.db.get_interview_analysis(interview_id)
+        candidate = self.db.get_candidate(interview.candidate_id) if interview else None
+        if not (interview and analysis and candidate):
+            await query.message.reply_text("Результаты собеседования не найдены.")
+            return
+        text = self.format_hr_result(candidate, interview, analysis, await self.resume_score(candidate, interview.position))
+        await query.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
     
-    async def complete_interview(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, interview: Interview):
+    async def complete_interview(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, interview: InterviewSession):
         """Complete interview and provide analysis"""
         # Get interview_id from active_interviews
-        if user_id not in self.active_interviews:
+        if await self.get_interview_session(user_id) is None:
             await update.message.reply_text("Ошибка: собеседование не найдено.")
             return
             
-        interview_id, _ = self.active_interviews[user_id]
+        interview_id = self.active_interviews[user_id].interview_id
         
         # Mark interview as completed
         interview.status = InterviewStatus.COMPLETED
         interview.completed_at = datetime.now()
         self.db.update_interview(interview, interview_id)
         
-        # Get all answers
+        # The transcript is only kept in the database; load it for the analysis
         answers = self.db.get_interview_answers(interview_id)
         
         if not answers:
             await update.message.reply_text("Ошибка: ответы не найдены.")
             return
         
-        # Prepare answers for analysis
-        answers_text = "\n\n".join([f"Вопрос: {answer.question_id}\nОтвет: {answer.answer_text}" for answer in answers])
-        
         try:
             # Analyze interview
-            analysis = self.ai_analyzer.analyze_interview(answers_text, interview.position)
+            analysis = await asyncio.to_thread(self.ai_analyzer.analyze_interview, interview, answers)
             
-            # Save analysis
-            interview_analysis = InterviewAnalysis(
-                candidate_id=user_id,
-                position=interview.position,
-                overall_score=analysis.get('overall_score', 0.0),
-                competency_scores=analysis.get('competency_scores', {}),
-                communication_skills=analysis.get('communication_skills', 'unknown'),
-                experience_level=analysis.get('experience_level', 'unknown'),
-                originality_score=analysis.get('originality_score', 0.0),
-                recommendations=analysis.get('recommendations', []),
-                hr_recommendation=analysis.get('hr_recommendation', 'needs_clarification'),
-                summary=analysis.get('summary', 'Анализ недоступен')
-            )
+            # Originality against every stored answer, not just what the model sees in this transcript
+            local_originality = await asyncio.to_thread(self.db.get_answers_originality, interview_id)
+            if local_originality is not None:
+                analysis.originality_score = local_originality
             
-            self.db.save_analysis(interview_analysis)
+            # Save analysis
+            self.db.save_analysis(analysis, interview_id)
             
             # Send results to HR
             candidate = self.db.get_candidate(user_id)
@@ -690,19 +961,16 @@ class HRBot:
                 await self.send_interview_results_to_hr(candidate, interview, analysis)
             
             # Show results to candidate
-            overall_score = analysis.get('overall_score', 0.0)
-            hr_recommendation = analysis.get('hr_recommendation', 'needs_clarification')
-            
             recommendation_text = {
                 'recommended': '✅ **Рекомендуем к найму**',
                 'needs_clarification': '🤔 **Требует дополнительного рассмотрения**',
                 'not_recommended': '❌ **Не рекомендуется к найму**'
-            }.get(hr_recommendation, '🤔 **Требует дополнительного рассмотрения**')
+            }.get(analysis.hr_recommendation, '🤔 **Требует дополнительного рассмотрения**')
             
             message = f"""
 🎉 **Собеседование завершено!**
 
-📊 **Ваш результат:** {overall_score:.1f}/10
+📊 **Ваш результат:** {analysis.overall_score * 10:.1f}/10
 {recommendation_text}
 
 💡 **Что дальше:**
@@ -716,7 +984,7 @@ class HRBot:
             await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
             
         except Exception as e:
-            logger.error(f"Error analyzing interview: {e}")
+            logger.error("Error analyzing interview: %s", e)
             await update.message.reply_text(
                 "✅ **Собеседование завершено!**\n\n"
                 "Мы свяжемся с вами в ближайшее время.\n\n"
@@ -747,25 +1015,166 @@ class HRBot:
         
         await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
     
-    def run(self):
-        """Run the bot"""
-        # Validate configuration
-        Config.validate()
+    def is_admin(self, user) -> bool:
+        """Whether a Telegram user may run service commands"""
+        return user.id in Config.ADMIN_USER_IDS or (user.username and f"@{user.username}" == Config.RESULTS_RECIPIENT)
+    
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /stats: LLM telemetry summary, or the full JSON dump with /stats json"""
+        if not self.is_admin(update.effective_user):
+            await update.message.reply_text("У вас нет доступа к этой команде.")
+            return
+        
+        if context.args and context.args[0].lower() == "json":
+            await asyncio.to_thread(self.ai_analyzer.telemetry.dump, Config.TELEMETRY_DUMP_PATH)
+            with open(Config.TELEMETRY_DUMP_PATH, "rb") as f:
+                await update.message.reply_document(f, filename="llm_telemetry.json")
+            return
         
-        # Create application
-        application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        breaker = self.ai_analyzer.get_breaker_state()
+        updates = self.update_processor.as_dict()
+        outbound = self.rate_limiter.as_dict()
+        digest = self.hr_digest.as_dict()
+        message = "📈 Телеметрия LLM\n\n"
+        if Config.WORKER_COUNT > 1:
+            # Every worker keeps its own counters; HR results are sent by worker 0 only
+            outbox = await asyncio.to_thread(self.db.count_hr_results)
+            message = (f"📈 Телеметрия LLM (процесс {Config.WORKER_INDEX} из {Config.WORKER_COUNT}, "
+                       f"результатов HR ждут отправки процессом 0: {outbox})\n\n")
+        message += (
+            f"{self.ai_analyzer.telemetry.format_report()}\n\n"
+            f"Circuit breaker: {breaker['state']}, отклонено вызовов: {breaker['rejected_calls']}\n"
+            f"Уточняющие вопросы: {self.follow_up_pool.as_dict()}\n"
+            f"Обновления: {updates['running']}/{updates['max_concurrent_updates']} в работе, "
+            f"{updates['updates_pending']} ожидают от {updates['users_pending']} пользователей, "
+            f"макс. очередь пользователя {updates['max_user_depth']}, ожидание p99 {updates['wait_time']['p99']:.2f}с\n"
+            f"Исходящие: {outbound['sent']} отправлено, в очереди {outbound['queued']['candidate']} ответов "
+            f"и {outbound['queued']['notification']} уведомлений, RetryAfter {outbound['retry_after']}, "
+            f"задержка p99 {outbound['send_latency']['p99']:.2f}с\n"
+            f"Результаты HR: {digest['single']} отдельно, {digest['digested']} в {digest['digests']} сводках, "
+            f"ожидают {digest['pending']}\n"
+            f"Таймауты: {self.sweep_stats['evicted']} собеседований за {self.sweep_stats['runs']} проверок, "
+            f"последняя: {self.sweep_stats['last_evicted']} за {self.sweep_stats['last_duration'] * 1000:.1f} мс"
+        )
+        await update.message.reply_text(message)
+    
+    async def sweep_timeouts(self) -> int:
+        """Mark interviews idle longer than INTERVIEW_TIMEOUT_MINUTES as timed out and drop their session state
+        
+        The database selects only the stale rows through an index, so a run costs the
+        number of evictions, not the number of open interviews. Returns that number.
+        """
+        started = time.perf_counter()
+        cutoff = datetime.now() - timedelta(minutes=Config.INTERVIEW_TIMEOUT_MINUTES)
+        # Behind the supervisor each worker sweeps only the candidates it serves
+        timed_out = await asyncio.to_thread(self.db.timeout_stale_interviews, cutoff,
+                                            Config.WORKER_INDEX, Config.WORKER_COUNT)
+        for interview_id, user_id in timed_out:
+            session = self.active_interviews.get(user_id)
+            # A newer interview of the same user is left alone
+            if session is not None and session.interview_id != interview_id:
+                continue
+            self.active_interviews.pop(user_id, None)
+            if self.application is not None:
+                self.application.drop_user_data(user_id)
+        
+        duration = time.perf_counter() - started
+        self.sweep_stats["runs"] += 1
+        self.sweep_stats["evicted"] += len(timed_out)
+        self.sweep_stats["last_evicted"] = len(timed_out)
+        self.sweep_stats["last_duration"] = duration
+        if timed_out:
+            logger.info("Timeout sweep: %s interviews timed out in %.1f ms", len(timed_out), duration * 1000)
+        return len(timed_out)
+    
+    async def start_timeout_sweeper(self, application: Application):
+        """post_init hook: run sweep_timeouts every TIMEOUT_SWEEP_INTERVAL_SECONDS
+        
+        Worker 0 of several also drains the HR outbox every HR_OUTBOX_POLL_SECONDS.
+        """
+        if Config.WORKER_COUNT > 1 and self.sends_to_hr():
+            self.start_hr_outbox_poller(application)
+        interval = Config.TIMEOUT_SWEEP_INTERVAL_SECONDS
+        if application.job_queue is not None:
+            async def job(_job_context):
+                await self.sweep_timeouts()
+            application.job_queue.run_repeating(job, interval, first=interval, name="timeout_sweeper")
+            return
+        
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.sweep_timeouts()
+                except Exception as e:
+                    logger.error("Timeout sweep failed: %s", e)
+        self._sweeper = asyncio.create_task(loop())
+    
+    def start_hr_outbox_poller(self, application: Application):
+        """Run drain_hr_outbox every HR_OUTBOX_POLL_SECONDS"""
+        interval = Config.HR_OUTBOX_POLL_SECONDS
+        if application.job_queue is not None:
+            async def job(_job_context):
+                await self.drain_hr_outbox()
+            application.job_queue.run_repeating(job, interval, first=interval, name="hr_outbox")
+            return
+        
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.drain_hr_outbox()
+                except Exception as e:
+                    logger.error("Draining the HR outbox failed: %s", e)
+        self._hr_outbox_poller = asyncio.create_task(loop())
+    
+    async def stop_timeout_sweeper(self, application: Application):
+        """post_stop hook: cancel the fallback background tasks and send the pending HR digest"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self._hr_outbox_poller is not None:
+            self._hr_outbox_poller.cancel()
+            self._hr_outbox_poller = None
+        try:
+            await self.hr_digest.flush()
+        except Exception as e:
+            logger.error("Error sending pending HR digest: %s", e)
+    
+    def build_application(self) -> Application:
+        """Create the Telegram application with all bot handlers"""
+        builder = (Application.builder().token(Config.TELEGRAM_BOT_TOKEN)
+                   .concurrent_updates(self.update_processor)
+                   .post_init(self.start_timeout_sweeper)
+                   .post_stop(self.stop_timeout_sweeper))
+        if Config.PERSIST_SESSIONS:
+            # user_data survives restarts; active interviews are reloaded lazily from the interviews table
+            builder = builder.persistence(SessionPersistence(self.db, Config.SESSION_FLUSH_SECONDS))
+        if Config.OUTBOUND_RATE_LIMIT:
+            builder = builder.rate_limiter(self.rate_limiter)
+        application = builder.build()
         self.application = application # Assign application to self
         
         # Add handlers
         application.add_handler(CommandHandler("start", self.start))
         application.add_handler(CommandHandler("help", self.help_command))
+        application.add_handler(CommandHandler("stats", self.stats_command))
         application.add_handler(CallbackQueryHandler(self.handle_callback))
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        return application
+    
+    def run(self, mode: Optional[str] = None):
+        """Run the bot with polling or webhook (Config.BOT_MODE by default)"""
+        # Validate configuration
+        Config.validate()
+        
+        application = self.build_application()
         
         # Start the bot
-        logger.info("Starting HR Bot...")
-        application.run_polling()
+        logger.info("Starting HR Bot (%s)...", mode or Config.BOT_MODE)
+        run_application(application, mode)
 
 if __name__ == "__main__":
+    setup_logging_from_config()
     bot = HRBot()
     bot.run() 
\ No newline at end of file
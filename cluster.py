@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from telegram import Bot, Update
+
+from config import Config
+from webhook import WebhookServer, SECRET_HEADER, webhook_limits, webhook_settings
+
+logger = logging.getLogger(__name__)
+
+BOT_SCRIPT = Path(__file__).with_name("bot.py")
+
+def raw_update_user_key(data: Dict[str, Any]) -> Optional[int]:
+    """Owner of an update in its JSON form: the sender, else the chat (as dispatcher.update_user_key)"""
+    for name, payload in data.items():
+        if name == "update_id" or not isinstance(payload, dict):
+            continue
+        user = payload.get("from") or payload.get("user")
+        if user:
+            return user["id"]
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return None
+
+def worker_for(key: Optional[int], workers: int) -> int:
+    """Worker that owns a user; updates of nobody in particular go to worker 0"""
+    return abs(key) % workers if key is not None else 0
+
+class WorkerLink:
+    """Ordered forwarding of updates to one worker over a single keep-alive connection
+
+    An update is removed from the queue only after the worker acknowledged it, so updates
+    survive a worker restart and each worker sees its users' updates in arrival order.
+    """
+
+    def __init__(self, host: str, port: int, path: str, secret_token: str):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.forwarded = 0
+        self.rejected = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        reader = writer = None
+        body = None
+        while True:
+            if body is None:
+                body = await self.queue.get()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.write(
+                    f"POST {self.path} HTTP/1.1\r\nHost: {self.host}\r\n{SECRET_HEADER}: {self.secret_token}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+                status = int((await reader.readline()).split()[1])
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+            except (OSError, IndexError, ValueError, asyncio.IncompleteReadError):
+                # Worker (re)starting: keep the update and try again
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                await asyncio.sleep(0.2)
+                continue
+            if status == 200:
+                self.forwarded += 1
+            else:
+                self.rejected += 1
+                logger.warning("Worker on port %d rejected an update with %d", self.port, status)
+            body = None
+
+class RoutingWebhookServer(WebhookServer):
+    """Webhook ingress of the supervisor: routes each update to the worker owning its user"""
+
+    def __init__(self, links: List[WorkerLink], secret_token: str, host: str = "0.0.0.0",
+                 port: int = 8443, path: str = "/telegram", max_body: int = 1 << 20, **limits):
+        super().__init__(None, secret_token, host, port, path, max_body, **limits)
+        self.links = links
+
+    async def deliver(self, body: bytes):
+        try:
+            data = json.loads(body)
+            key = raw_update_user_key(data)
+        except Exception as e:
+            raise ValueError(e) from e
+        self.links[worker_for(key, len(self.links))].queue.put_nowait(body)
+
+class Supervisor:
+    """Runs N bot workers as processes behind one webhook ingress
+
+    Worker i serves the users with abs(user_id) % N == i, listens on 127.0.0.1 at
+    base_port + i and shares the database with the others. Dead workers are restarted.
+    """
+
+    def __init__(self, workers: int, base_port: int, command: Optional[List[str]] = None):
+        self.workers = workers
+        self.base_port = base_port
+        self.command = command or [sys.executable, str(BOT_SCRIPT)]
+        self.links = [WorkerLink("127.0.0.1", base_port + index, Config.WEBHOOK_PATH, Config.WEBHOOK_SECRET_TOKEN)
+                      for index in range(workers)]
+        self.processes: List[Optional[subprocess.Popen]] = [None] * workers
+        self.restarts = 0
+
+    def worker_env(self, index: int) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update({
+            "BOT_MODE": "worker",
+            "WORKER_INDEX": str(index),
+            "WORKER_COUNT": str(self.workers),
+            "WEBHOOK_LISTEN": "127.0.0.1",
+            "WEBHOOK_PORT": str(self.base_port + index),
+            # One log file per process: rotation is not safe with several writers
+            "LOG_FILE": str(Path(Config.LOG_FILE).with_suffix(f".worker{index}.log")) if Config.LOG_FILE else "",
+            # Telegram's global limit is per bot, so the workers split it
+            "OUTBOUND_GLOBAL_PER_SECOND": str(Config.OUTBOUND_GLOBAL_PER_SECOND / self.workers)
+        })
+        return env
+
+    def start_worker(self, index: int):
+        self.processes[index] = subprocess.Popen(self.command, env=self.worker_env(index))
+        logger.info("Worker %d started (pid %d, port %d)", index, self.processes[index].pid, self.base_port + index)
+
+    async def watch(self, interval: float = 1.0):
+        """Restart workers that exited"""
+        while True:
+            for index, process in enumerate(self.processes):
+                if process is None or process.poll() is not None:
+                    if process is not None:
+                        logger.error("Worker %d exited with %s, restarting", index, process.returncode)
+                        self.restarts += 1
+                    self.start_worker(index)
+            await asyncio.sleep(interval)
+
+    def stop_workers(self, timeout: float = 10):
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                try:
+                    process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "restarts": self.restarts,
+            "queued": [link.queue.qsize() for link in self.links],
+            "forwarded": [link.forwarded for link in self.links]
+        }
+
+async def serve_supervisor(workers: Optional[int] = None):
+    """Register the webhook, start the workers and route updates to them until cancelled"""
+    url, secret_token, host, port, path = webhook_settings()
+    supervisor = Supervisor(workers or Config.WORKERS, Config.WORKER_BASE_PORT)
+    server = RoutingWebhookServer(supervisor.links, secret_token, host, port, path, **webhook_limits())
+    watcher = asyncio.create_task(supervisor.watch())
+    for link in supervisor.links:
+        link.start()
+    try:
+        async with Bot(Config.TELEGRAM_BOT_TOKEN) as bot:
+            await bot.set_webhook(url=url, secret_token=secret_token, allowed_updates=Update.ALL_TYPES)
+        await server.start()
+        logger.info("Supervisor routing updates to %d workers", supervisor.workers)
+        await asyncio.Event().wait()
+    finally:
+        watcher.cancel()
+        await server.stop()
+        for link in supervisor.links:
+            await link.stop()
+        supervisor.stop_workers()
+
+def run_supervisor(workers: Optional[int] = None):
+    asyncio.run(serve_supervisor(workers))
@@ -9,15 +9,93 @@ class Config:
     
     # Telegram settings
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+    # How updates arrive: "polling" (getUpdates), "webhook" (embedded HTTP server) or "supervisor"
+    # (webhook ingress routing each user's updates to one of WORKERS processes; they run in "worker" mode)
+    BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+    # Public HTTPS base URL Telegram posts to; WEBHOOK_PATH is appended to it
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+    WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+    # A request must arrive in full within WEBHOOK_REQUEST_TIMEOUT_SECONDS, keep-alive connections idle
+    # longer than WEBHOOK_IDLE_TIMEOUT_SECONDS are closed, and at most WEBHOOK_MAX_CONNECTIONS are open
+    WEBHOOK_REQUEST_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_REQUEST_TIMEOUT_SECONDS", "10"))
+    WEBHOOK_IDLE_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_IDLE_TIMEOUT_SECONDS", "75"))
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "100"))
+    WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+    # Worker i listens on 127.0.0.1:WORKER_BASE_PORT + i
+    WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "9100"))
+    # Set by the supervisor for its workers: this worker's index and the number of workers
+    WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+    WORKER_COUNT = int(os.getenv("WORKER_COUNT", "1"))
+    # Updates processed at once; each user's updates still run one at a time, in order
+    UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+    # Keep session state (user_data) in the database; changes are written at most every FLUSH seconds
+    PERSIST_SESSIONS = os.getenv("PERSIST_SESSIONS", "true").lower() == "true"
+    SESSION_FLUSH_SECONDS = float(os.getenv("SESSION_FLUSH_SECONDS", "5"))
+    # Outgoing messages: global and per-chat limits (groups and channels have their own), retries after RetryAfter
+    OUTBOUND_RATE_LIMIT = os.getenv("OUTBOUND_RATE_LIMIT", "true").lower() == "true"
+    OUTBOUND_GLOBAL_PER_SECOND = float(os.getenv("OUTBOUND_GLOBAL_PER_SECOND", "30"))
+    OUTBOUND_CHAT_PER_SECOND = float(os.getenv("OUTBOUND_CHAT_PER_SECOND", "1"))
+    OUTBOUND_GROUP_PER_MINUTE = float(os.getenv("OUTBOUND_GROUP_PER_MINUTE", "20"))
+    OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
     
     # OpenAI settings
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    # OpenAI-compatible endpoint, e.g. the local fake server (python fake_openai.py)
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+    
+    # Model tiers: fast for interactive calls, heavy for the final interview analysis
+    FAST_MODEL = os.getenv("FAST_MODEL", "gpt-4o-mini")
+    HEAVY_MODEL = os.getenv("HEAVY_MODEL", "gpt-4")
+    
+    # LLM resilience: retries per call and circuit breaker thresholds
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    
+    # Hedged requests for user-facing LLM calls: a backup request is sent when the
+    # first one is slower than the given latency percentile, for at most BUDGET of calls
+    LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    
+    # Micro-batching of answer-quality checks: requests arriving within MAX_WAIT_MS
+    # of each other are sent as one multi-answer prompt (up to MAX_SIZE answers)
+    LLM_BATCH_QUALITY_CHECKS = os.getenv("LLM_BATCH_QUALITY_CHECKS", "false").lower() == "true"
+    LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "16"))
+    LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "10"))
+    
+    # Split the final interview analysis into concurrent per-competency prompts
+    LLM_INTERVIEW_FAN_OUT = os.getenv("LLM_INTERVIEW_FAN_OUT", "false").lower() == "true"
+    
+    # Stream resume analysis into a progressively edited message
+    STREAM_RESUME_ANALYSIS = os.getenv("STREAM_RESUME_ANALYSIS", "true").lower() == "true"
+    STREAM_EDIT_INTERVAL_SECONDS = float(os.getenv("STREAM_EDIT_INTERVAL_SECONDS", "1.0"))
+    
+    # Local resume-to-position matching shown to HR
+    TOP_RESUMES_COUNT = int(os.getenv("TOP_RESUMES_COUNT", "10"))
+    
+    # Follow-ups: served from a precomputed pool, with a speculative LLM generation in the background
+    FOLLOW_UP_POOL_PATH = os.getenv("FOLLOW_UP_POOL_PATH", "follow_up_pool.json")
+    SPECULATIVE_FOLLOW_UPS = os.getenv("SPECULATIVE_FOLLOW_UPS", "true").lower() == "true"
+    # How long to wait for the LLM follow-up when the pool already has one (0 = pool only, no LLM call)
+    FOLLOW_UP_LLM_GRACE_SECONDS = float(os.getenv("FOLLOW_UP_LLM_GRACE_SECONDS", "0"))
     
     # Database settings
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///hrbot.db")
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # Written by a background thread; rotated at LOG_MAX_BYTES and every LOG_ROTATE_SECONDS (0 turns either off)
+    LOG_FILE = os.getenv("LOG_FILE", "hrbot.log")
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    LOG_ROTATE_SECONDS = float(os.getenv("LOG_ROTATE_SECONDS", "86400"))
+    # Keep only every N-th INFO line of each message of a logger, e.g. "bot=10"
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
     
     # Company info
     COMPANY_NAME = "Маджента"
@@ -30,10 +108,36 @@ class Config:
     
     # Results notification
     RESULTS_RECIPIENT = "@iriska_rya"
+    # Up to HR_DIGEST_BURST results per HR_DIGEST_WINDOW_SECONDS are sent one by one; beyond that they are
+    # collected into digests sent at most HR_DIGEST_MAX_DELAY_SECONDS later (or once HR_DIGEST_MAX_ITEMS wait)
+    HR_DIGEST = os.getenv("HR_DIGEST", "true").lower() == "true"
+    HR_DIGEST_BURST = int(os.getenv("HR_DIGEST_BURST", "3"))
+    HR_DIGEST_WINDOW_SECONDS = float(os.getenv("HR_DIGEST_WINDOW_SECONDS", "600"))
+    HR_DIGEST_MAX_DELAY_SECONDS = float(os.getenv("HR_DIGEST_MAX_DELAY_SECONDS", "300"))
+    HR_DIGEST_MAX_ITEMS = int(os.getenv("HR_DIGEST_MAX_ITEMS", "20"))
+    # Behind the supervisor only worker 0 sends to HR; the others leave results in the database,
+    # which worker 0 checks every HR_OUTBOX_POLL_SECONDS
+    HR_OUTBOX_POLL_SECONDS = float(os.getenv("HR_OUTBOX_POLL_SECONDS", "5"))
+    
+    # Users allowed to run service commands such as /stats (besides RESULTS_RECIPIENT)
+    ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+    # Where /stats json writes the LLM telemetry dump
+    TELEMETRY_DUMP_PATH = os.getenv("TELEMETRY_DUMP_PATH", "llm_telemetry.json")
     
     # Interview settings
     MAX_FOLLOW_UP_QUESTIONS = 2
-    INTERVIEW_TIMEOUT_MINUTES = 30
+    # Pause before a message that follows another one (e.g. after the transition to professional questions)
+    MESSAGE_PAUSE_SECONDS = float(os.getenv("MESSAGE_PAUSE_SECONDS", "2"))
+    # Open interviews without an answer for this long are marked as timed out and evicted from memory
+    INTERVIEW_TIMEOUT_MINUTES = int(os.getenv("INTERVIEW_TIMEOUT_MINUTES", "30"))
+    # How often the timeout sweeper runs
+    TIMEOUT_SWEEP_INTERVAL_SECONDS = float(os.getenv("TIMEOUT_SWEEP_INTERVAL_SECONDS", "60"))
+    
+    # Local answer scoring: below LOW a follow-up is asked right away,
+    # between LOW and HIGH the answer is escalated to the LLM check
+    ANSWER_SCORE_LOW = float(os.getenv("ANSWER_SCORE_LOW", "0.35"))
+    ANSWER_SCORE_HIGH = float(os.getenv("ANSWER_SCORE_HIGH", "0.55"))
+    ESCALATE_BORDERLINE_ANSWERS = os.getenv("ESCALATE_BORDERLINE_ANSWERS", "true").lower() == "true"
     
     @classmethod
     def validate(cls):
@@ -41,4 +145,12 @@ class Config:
         if not cls.TELEGRAM_BOT_TOKEN:
             raise ValueError("TELEGRAM_BOT_TOKEN is required")
         if not cls.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY is required") 
\ No newline at end of file
+            raise ValueError("OPENAI_API_KEY is required")
+        if cls.BOT_MODE not in ("polling", "webhook", "supervisor", "worker"):
+            raise ValueError(f"Unknown BOT_MODE: {cls.BOT_MODE}")
+        if cls.BOT_MODE in ("webhook", "supervisor") and not (cls.WEBHOOK_URL and cls.WEBHOOK_SECRET_TOKEN):
+            raise ValueError(f"WEBHOOK_URL and WEBHOOK_SECRET_TOKEN are required in {cls.BOT_MODE} mode")
+        if cls.BOT_MODE == "worker" and not cls.WEBHOOK_SECRET_TOKEN:
+            raise ValueError("WEBHOOK_SECRET_TOKEN is required in worker mode")
+        if cls.BOT_MODE == "supervisor" and cls.WORKERS < 1:
+            raise ValueError("WORKERS must be at least 1") 
\ No newline at end of file
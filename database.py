@@ -1,15 +1,25 @@
 import sqlite3
 import json
+import threading
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from models import Candidate, Interview, Answer, InterviewAnalysis, Position, InterviewStatus
+from typing import List, Optional, Dict, Any, Iterator, Set, Union
+from models import Candidate, Interview, InterviewSession, Answer, InterviewAnalysis, Position, InterviewStatus
 from config import Config
+from near_duplicates import NearDuplicateIndex
+from position_matcher import PositionMatcher
 
 class Database:
     """Database manager for HR Bot"""
     
     def __init__(self, db_path: str = "hrbot.db"):
         self.db_path = db_path
+        # Derived in-memory indexes; other processes write to the same file, so they are
+        # brought up to date from the database (by answer id / candidate change sequence) on use
+        self._duplicate_index: Optional[NearDuplicateIndex] = None
+        self._duplicate_index_last_id = 0
+        self._position_matcher: Optional[PositionMatcher] = None
+        self._position_matcher_last_seq = 0
+        self._index_lock = threading.Lock()
         self.init_database()
     
     def init_database(self):
@@ -17,9 +27,9 @@ class Database:
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             
-            # Check if contact fields exist, if not add them
-            cursor.execute("PRAGMA table_info(candidates)")
-            columns = [column[1] for column in cursor.fetchall()]
+            # Several worker processes share the file: WAL lets readers go on while one of them writes
+            if Config.WORKER_COUNT > 1:
+                cursor.execute('PRAGMA journal_mode=WAL')
             
             # Candidates table
             cursor.execute('''
@@ -38,6 +48,10 @@ class Database:
                 )
             ''')
             
+            # Check if contact fields exist, if not add them
+            cursor.execute("PRAGMA table_info(candidates)")
+            columns = [column[1] for column in cursor.fetchall()]
+            
             # Add contact fields if they don't exist
             if 'phone' not in columns:
                 cursor.execute('ALTER TABLE candidates ADD COLUMN phone TEXT')
@@ -46,6 +60,12 @@ class Database:
             if 'portfolio' not in columns:
                 cursor.execute('ALTER TABLE candidates ADD COLUMN portfolio TEXT')
             
+            # Change sequence, so the resume matcher can pick up rows saved by other processes
+            if 'updated_seq' not in columns:
+                cursor.execute('ALTER TABLE candidates ADD COLUMN updated_seq INTEGER')
+                cursor.execute('UPDATE candidates SET updated_seq = rowid')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_candidates_updated_seq ON candidates (updated_seq)')
+            
             # Interviews table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS interviews (
@@ -61,6 +81,17 @@ class Database:
                 )
             ''')
             
+            # Last activity, for the timeout sweeper; the index keeps a sweep proportional to the stale rows
+            cursor.execute("PRAGMA table_info(interviews)")
+            columns = [column[1] for column in cursor.fetchall()]
+            if 'last_activity_at' not in columns:
+                cursor.execute('ALTER TABLE interviews ADD COLUMN last_activity_at TIMESTAMP')
+                cursor.execute('UPDATE interviews SET last_activity_at = started_at')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_interviews_status_activity
+                ON interviews (status, last_activity_at)
+            ''')
+            
             # Answers table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS answers (
@@ -89,10 +120,44 @@ class Database:
                     hr_recommendation TEXT,
                     summary TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    interview_id INTEGER,
+                    analysis_version TEXT,
                     FOREIGN KEY (candidate_id) REFERENCES candidates (user_id)
                 )
             ''')
             
+            # Add re-scoring fields if they don't exist
+            cursor.execute("PRAGMA table_info(analysis)")
+            columns = [column[1] for column in cursor.fetchall()]
+            if 'interview_id' not in columns:
+                cursor.execute('ALTER TABLE analysis ADD COLUMN interview_id INTEGER')
+            if 'analysis_version' not in columns:
+                cursor.execute('ALTER TABLE analysis ADD COLUMN analysis_version TEXT')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_analysis_interview_version
+                ON analysis (interview_id, analysis_version)
+            ''')
+            
+            # Bot session state (user_data), so interviews survive a restart
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    user_id INTEGER PRIMARY KEY,
+                    data TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # HR results handed from the supervisor's workers to worker 0, the only one that sends to HR
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS hr_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    interview_id INTEGER,
+                    summary TEXT,
+                    text TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
             conn.commit()
     
     def save_candidate(self, candidate: Candidate) -> bool:
@@ -103,8 +168,12 @@ class Database:
                 cursor.execute('''
                     INSERT OR REPLACE INTO candidates 
                     (user_id, username, first_name, last_name, position, resume_text, experience_level, 
-                     phone, email, portfolio, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     phone, email, portfolio, created_at, updated_seq)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(
+                        -- the resume indexes re-read a candidate only when the resume text changed
+                        (SELECT updated_seq FROM candidates WHERE user_id = ? AND resume_text IS ?),
+                        (SELECT COALESCE(MAX(updated_seq), 0) + 1 FROM candidates)
+                    ))
                 ''', (
                     candidate.user_id,
                     candidate.username,
@@ -116,7 +185,9 @@ class Database:
                     candidate.phone,
                     candidate.email,
                     candidate.portfolio,
-                    candidate.created_at.isoformat()
+                    candidate.created_at.isoformat(),
+                    candidate.user_id,
+                    candidate.resume_text
                 ))
                 conn.commit()
                 return True
@@ -124,6 +195,34 @@ class Database:
             print(f"Error saving candidate: {e}")
             return False
     
+    def get_position_matcher(self) -> PositionMatcher:
+        """Resume-to-position matcher over all stored resumes, built on first use and then
+        brought up to date with resumes saved since, by this or any other process"""
+        with self._index_lock:
+            if self._position_matcher is None:
+                self._position_matcher = PositionMatcher()
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    for user_id, resume_text, seq in conn.execute(
+                        "SELECT user_id, resume_text, updated_seq FROM candidates WHERE updated_seq > ? ORDER BY updated_seq",
+                        (self._position_matcher_last_seq,)
+                    ):
+                        if resume_text:
+                            self._position_matcher.add_resume(user_id, resume_text)
+                        self._position_matcher_last_seq = seq
+            except Exception as e:
+                print(f"Error updating position matcher: {e}")
+            return self._position_matcher
+    
+    def get_top_resumes(self, position: Position, k: int = 10) -> List[tuple[Candidate, float]]:
+        """Candidates whose resumes best match a position profile, with match scores"""
+        results = []
+        for user_id, score in self.get_position_matcher().top_k(position, k):
+            candidate = self.get_candidate(user_id)
+            if candidate:
+                results.append((candidate, score))
+        return results
+    
     def get_candidate(self, user_id: int) -> Optional[Candidate]:
         """Get candidate by user_id"""
         try:
@@ -162,8 +261,9 @@ class Database:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO interviews 
-                    (candidate_id, position, status, current_question_index, follow_up_count, started_at, completed_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    (candidate_id, position, status, current_question_index, follow_up_count, started_at, completed_at,
+                     last_activity_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     interview.candidate_id,
                     interview.position.value,
@@ -171,7 +271,8 @@ class Database:
                     interview.current_question_index,
                     interview.follow_up_count,
                     interview.started_at.isoformat(),
-                    interview.completed_at.isoformat() if interview.completed_at else None
+                    interview.completed_at.isoformat() if interview.completed_at else None,
+                    datetime.now().isoformat()
                 ))
                 interview_id = cursor.lastrowid
                 conn.commit()
@@ -180,24 +281,29 @@ class Database:
             print(f"Error saving interview: {e}")
             return 0
     
-    def update_interview(self, interview: Interview, interview_id: int) -> bool:
-        """Update existing interview"""
+    def update_interview(self, interview: Union[Interview, InterviewSession], interview_id: int) -> bool:
+        """Update existing interview; False if it was closed meanwhile
+        
+        Only completing may change a closed interview: the timeout sweeper does not hold the
+        user's lock, so a handler still running must not reopen an interview it timed out.
+        """
+        closed_guard = "" if interview.status == InterviewStatus.COMPLETED else " AND status NOT IN ('timeout', 'completed')"
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE interviews 
-                    SET status = ?, current_question_index = ?, follow_up_count = ?, completed_at = ?
-                    WHERE id = ?
-                ''', (
+                    SET status = ?, current_question_index = ?, follow_up_count = ?, completed_at = ?, last_activity_at = ?
+                    WHERE id = ?''' + closed_guard, (
                     interview.status.value,
                     interview.current_question_index,
                     interview.follow_up_count,
                     interview.completed_at.isoformat() if interview.completed_at else None,
+                    datetime.now().isoformat(),
                     interview_id
                 ))
                 conn.commit()
-                return True
+                return cursor.rowcount > 0
         except Exception as e:
             print(f"Error updating interview: {e}")
             return False
@@ -228,6 +334,69 @@ class Database:
             print(f"Error getting interview: {e}")
             return None
     
+    def save_sessions(self, sessions: Dict[int, str]) -> bool:
+        """Write serialized session states in one transaction"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                now = datetime.now().isoformat()
+                conn.executemany('''
+                    INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)
+                ''', [(user_id, data, now) for user_id, data in sessions.items()])
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error saving sessions: {e}")
+            return False
+    
+    def get_session(self, user_id: int) -> Optional[str]:
+        """Serialized session state of a user, if any"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute('SELECT data FROM sessions WHERE user_id = ?', (user_id,)).fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            print(f"Error getting session: {e}")
+            return None
+    
+    def delete_session(self, user_id: int) -> bool:
+        """Forget a user's session state"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error deleting session: {e}")
+            return False
+    
+    def timeout_stale_interviews(self, cutoff: datetime, worker: int = 0, workers: int = 1) -> List[tuple[int, int]]:
+        """Mark open interviews without activity since cutoff as timed out; returns their (interview_id, candidate_id)
+        
+        With several workers only the candidates with abs(candidate_id) % workers == worker are swept.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute('''
+                    SELECT id, candidate_id FROM interviews
+                    WHERE status IN ('started', 'in_progress') AND last_activity_at < ?
+                      AND abs(candidate_id) % ? = ?
+                ''', (cutoff.isoformat(), workers, worker)).fetchall()
+                # A handler may have answered or completed an interview since the SELECT;
+                # only the rows that are still stale are timed out and returned
+                timed_out = []
+                for interview_id, candidate_id in rows:
+                    cursor = conn.execute('''
+                        UPDATE interviews SET status = ?, completed_at = ?
+                        WHERE id = ? AND status IN ('started', 'in_progress') AND last_activity_at < ?
+                    ''', (InterviewStatus.TIMEOUT.value, datetime.now().isoformat(), interview_id, cutoff.isoformat()))
+                    if cursor.rowcount > 0:
+                        timed_out.append((interview_id, candidate_id))
+                conn.commit()
+                return timed_out
+        except Exception as e:
+            print(f"Error timing out interviews: {e}")
+            return []
+    
     def get_active_interview(self, candidate_id: int) -> Optional[tuple[int, Interview]]:
         """Get active interview for candidate"""
         try:
@@ -257,6 +426,57 @@ class Database:
             print(f"Error getting active interview: {e}")
             return None
     
+    def iter_interviews(self, statuses: tuple = (InterviewStatus.COMPLETED.value,), after_id: int = 0,
+                        position: Optional[Position] = None, batch_size: int = 500) -> Iterator[tuple[int, Interview]]:
+        """Stream interviews in id order, one page at a time"""
+        placeholders = ", ".join("?" for _ in statuses)
+        query = f'''
+            SELECT id, candidate_id, position, status, current_question_index, follow_up_count, started_at, completed_at
+            FROM interviews
+            WHERE id > ? AND status IN ({placeholders})
+        '''
+        params_tail = list(statuses)
+        if position is not None:
+            query += " AND position = ?"
+            params_tail.append(position.value)
+        query += " ORDER BY id LIMIT ?"
+        
+        last_id = after_id
+        while True:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    rows = conn.execute(query, [last_id, *params_tail, batch_size]).fetchall()
+            except Exception as e:
+                print(f"Error iterating interviews: {e}")
+                return
+            
+            for row in rows:
+                yield row[0], Interview(
+                    candidate_id=row[1],
+                    position=Position(row[2]),
+                    status=InterviewStatus(row[3]),
+                    current_question_index=row[4],
+                    follow_up_count=row[5],
+                    started_at=datetime.fromisoformat(row[6]),
+                    completed_at=datetime.fromisoformat(row[7]) if row[7] else None
+                )
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+    
+    def get_analyzed_interview_ids(self, version: str) -> Set[int]:
+        """Ids of interviews that already have an analysis with this version tag"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute(
+                    "SELECT DISTINCT interview_id FROM analysis WHERE analysis_version = ? AND interview_id IS NOT NULL",
+                    (version,)
+                ).fetchall()
+                return {row[0] for row in rows}
+        except Exception as e:
+            print(f"Error getting analyzed interviews: {e}")
+            return set()
+    
     def save_answer(self, interview_id: int, answer: Answer) -> bool:
         """Save answer to database"""
         try:
@@ -279,6 +499,64 @@ class Database:
             print(f"Error saving answer: {e}")
             return False
     
+    def get_answers_for_question(self, question_id: str, limit: int = 50) -> List[str]:
+        """Most recent stored answer texts for a question"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute(
+                    "SELECT answer_text FROM answers WHERE question_id = ? ORDER BY id DESC LIMIT ?",
+                    (question_id, limit)
+                ).fetchall()
+                return [row[0] for row in rows]
+        except Exception as e:
+            print(f"Error getting answers for question: {e}")
+            return []
+    
+    def get_duplicate_index(self) -> NearDuplicateIndex:
+        """Near-duplicate index over all stored answers, built on first use and then brought
+        up to date with answers saved since, by this or any other process"""
+        with self._index_lock:
+            if self._duplicate_index is None:
+                self._duplicate_index = NearDuplicateIndex()
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    for answer_id, interview_id, question_id, answer_text in conn.execute(
+                        "SELECT id, interview_id, question_id, answer_text FROM answers WHERE id > ? ORDER BY id",
+                        (self._duplicate_index_last_id,)
+                    ):
+                        self._duplicate_index.add(question_id, answer_id, answer_text, group=interview_id)
+                        self._duplicate_index_last_id = answer_id
+            except Exception as e:
+                print(f"Error updating duplicate index: {e}")
+            return self._duplicate_index
+    
+    def find_similar_answers(self, question_id: str, text: str, k: int = 5, threshold: float = 0.5,
+                             exclude_interview_id: Optional[int] = None) -> List[tuple[int, float]]:
+        """Stored answers to the same question that nearly duplicate text, as (answer id, similarity)"""
+        return self.get_duplicate_index().query(question_id, text, k, threshold, exclude_group=exclude_interview_id)
+    
+    def get_answers_originality(self, interview_id: int) -> Optional[float]:
+        """Mean originality of an interview's answers against earlier answers from other interviews
+
+        Only answers stored before each one count, so the score of an original answer does not
+        drop when later candidates copy it.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute(
+                    "SELECT id, question_id, answer_text FROM answers WHERE interview_id = ? ORDER BY id",
+                    (interview_id,)
+                ).fetchall()
+        except Exception as e:
+            print(f"Error getting answers for originality: {e}")
+            return None
+        if not rows:
+            return None
+        index = self.get_duplicate_index()
+        scores = [index.originality(question_id, answer_text, exclude_group=interview_id, before=answer_id)
+                  for answer_id, question_id, answer_text in rows]
+        return sum(scores) / len(scores)
+    
     def get_interview_answers(self, interview_id: int) -> List[Answer]:
         """Get all answers for interview"""
         try:
@@ -302,16 +580,18 @@ class Database:
             print(f"Error getting interview answers: {e}")
             return []
     
-    def save_analysis(self, analysis: InterviewAnalysis) -> bool:
-        """Save interview analysis"""
+    def save_analysis(self, analysis: InterviewAnalysis, interview_id: Optional[int] = None,
+                      version: Optional[str] = None) -> bool:
+        """Save interview analysis, optionally tagged with the interview and analysis version"""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO analysis 
                     (candidate_id, position, overall_score, competency_scores, communication_skills, 
-                     experience_level, originality_score, recommendations, hr_recommendation, summary, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     experience_level, originality_score, recommendations, hr_recommendation, summary, created_at,
+                     interview_id, analysis_version)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     analysis.candidate_id,
                     analysis.position.value,
@@ -323,7 +603,9 @@ class Database:
                     json.dumps(analysis.recommendations),
                     analysis.hr_recommendation,
                     analysis.summary,
-                    analysis.created_at.isoformat()
+                    analysis.created_at.isoformat(),
+                    interview_id,
+                    version
                 ))
                 conn.commit()
                 return True
@@ -331,6 +613,73 @@ class Database:
             print(f"Error saving analysis: {e}")
             return False
     
+    def get_interview_analysis(self, interview_id: int) -> Optional[InterviewAnalysis]:
+        """Get latest analysis of an interview"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute('''
+                    SELECT candidate_id, position, overall_score, competency_scores, communication_skills,
+                           experience_level, originality_score, recommendations, hr_recommendation, summary, created_at
+                    FROM analysis 
+                    WHERE interview_id = ? 
+                    ORDER BY created_at DESC LIMIT 1
+                ''', (interview_id,)).fetchone()
+                if row:
+                    return InterviewAnalysis(
+                        candidate_id=row[0],
+                        position=Position(row[1]),
+                        overall_score=row[2],
+                        competency_scores=json.loads(row[3]),
+                        communication_skills=row[4],
+                        experience_level=row[5],
+                        originality_score=row[6],
+                        recommendations=json.loads(row[7]),
+                        hr_recommendation=row[8],
+                        summary=row[9],
+                        created_at=datetime.fromisoformat(row[10])
+                    )
+                return None
+        except Exception as e:
+            print(f"Error getting interview analysis: {e}")
+            return None
+    
+    def enqueue_hr_result(self, interview_id: int, summary: str, text: str) -> bool:
+        """Leave an HR result for the worker that sends HR notifications"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    "INSERT INTO hr_outbox (interview_id, summary, text, created_at) VALUES (?, ?, ?, ?)",
+                    (interview_id, summary, text, datetime.now().isoformat())
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error queueing HR result: {e}")
+            return False
+    
+    def take_hr_results(self, limit: int = 100) -> List[tuple[int, str, str]]:
+        """Remove and return the oldest queued HR results as (interview_id, summary, text)"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute(
+                    "SELECT id, interview_id, summary, text FROM hr_outbox ORDER BY id LIMIT ?", (limit,)
+                ).fetchall()
+                conn.executemany("DELETE FROM hr_outbox WHERE id = ?", [(row[0],) for row in rows])
+                conn.commit()
+                return [(row[1], row[2], row[3]) for row in rows]
+        except Exception as e:
+            print(f"Error taking HR results: {e}")
+            return []
+    
+    def count_hr_results(self) -> int:
+        """HR results waiting in the outbox"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                return conn.execute("SELECT COUNT(*) FROM hr_outbox").fetchone()[0]
+        except Exception as e:
+            print(f"Error counting HR results: {e}")
+            return 0
+    
     def get_candidate_analysis(self, candidate_id: int) -> Optional[InterviewAnalysis]:
         """Get latest analysis for candidate"""
         try:
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+RESULT_CALLBACK_PREFIX = "hr_result_"
+
+class DigestEntry(NamedTuple):
+    """One interview result: the digest line and the full message sent when volume is low"""
+    interview_id: int
+    summary: str
+    text: str
+
+class HRDigest:
+    """Sends interview results to HR one by one while they are rare and as digests when they are not
+
+    Up to `burst` results per `window` seconds go out individually. Beyond that results are
+    buffered and sent together, at most `max_delay` seconds after the first one was buffered
+    or as soon as `max_items` are waiting. Each digest line has a button that opens the full result.
+    """
+
+    def __init__(self, send: Callable[[str, Optional[InlineKeyboardMarkup]], Awaitable[Any]],
+                 max_delay: float = 300, burst: int = 3, window: float = 600, max_items: int = 20):
+        self.send = send
+        self.max_delay = max_delay
+        self.burst = burst
+        self.window = window
+        self.max_items = max_items
+        self._arrivals: Deque[float] = deque()
+        self._pending: List[DigestEntry] = []
+        self._timer: Optional[asyncio.Task] = None
+        self.stats = Counter()
+
+    async def submit(self, entry: DigestEntry):
+        now = time.monotonic()
+        self._arrivals.append(now)
+        while self._arrivals and self._arrivals[0] <= now - self.window:
+            self._arrivals.popleft()
+
+        if not self._pending and len(self._arrivals) <= self.burst:
+            try:
+                await self.send(entry.text, None)
+                self.stats["single"] += 1
+                return
+            except Exception as e:
+                # Buffered like the rest, so the result goes out with the next attempt
+                logger.error("Error sending HR result, keeping it for the digest: %s", e)
+                self.stats["failed_sends"] += 1
+
+        self._pending.append(entry)
+        if len(self._pending) >= self.max_items:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Error sending HR digest, retrying in %.0f s: %s", self.max_delay, e)
+        if self._pending and self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Error sending HR digest, retrying in %.0f s: %s", self.max_delay, e)
+            if self._pending and self._timer is None:
+                self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        """Send everything buffered as one digest; if sending fails the entries stay buffered"""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        entries, self._pending = self._pending, []
+        if not entries:
+            return
+        try:
+            await self._send_entries(entries)
+        except Exception:
+            # Results that arrived while sending go after the ones that failed
+            self._pending = entries + self._pending
+            self.stats["failed_sends"] += 1
+            raise
+
+    async def _send_entries(self, entries: List[DigestEntry]):
+        if len(entries) == 1:
+            await self.send(entries[0].text, None)
+            self.stats["single"] += 1
+            return
+
+        lines = [f"📊 **Результаты собеседований: {len(entries)}**", ""]
+        buttons = []
+        for number, entry in enumerate(entries, 1):
+            lines.append(f"{number}. {entry.summary}")
+            buttons.append([InlineKeyboardButton(f"{number}. Подробнее",
+                                                 callback_data=f"{RESULT_CALLBACK_PREFIX}{entry.interview_id}")])
+        await self.send("\n".join(lines), InlineKeyboardMarkup(buttons))
+        self.stats["digests"] += 1
+        self.stats["digested"] += len(entries)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "single": self.stats["single"],
+            "digests": self.stats["digests"],
+            "digested": self.stats["digested"],
+            "failed_sends": self.stats["failed_sends"],
+            "pending": len(self._pending)
+        }
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from telemetry import Histogram, LATENCY_BUCKETS
+
+def update_user_key(update: Any) -> Optional[int]:
+    """Who an update belongs to: the user, else the chat; None for updates of nobody in particular"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+class _UserQueue:
+    """FIFO lock of one user plus the number of that user's updates waiting or running"""
+
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Runs updates of different users concurrently and each user's updates one at a time, in order
+
+    An update first waits for its user's lock (asyncio.Lock wakes waiters in FIFO order, and
+    the Application starts update tasks in arrival order), then for one of the global worker
+    slots. Waiting on the user first keeps a chatty user from occupying slots that other
+    users could run in.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._users: Dict[int, _UserQueue] = {}
+        self.processed = 0
+        self.max_user_depth = 0
+        self.wait_time = Histogram(LATENCY_BUCKETS)
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_user_key(update)
+        queued = time.perf_counter()
+        if key is None:
+            async with self._semaphore:
+                self.wait_time.observe(time.perf_counter() - queued)
+                await self.do_process_update(update, coroutine)
+            self.processed += 1
+            return
+
+        user = self._users.get(key)
+        if user is None:
+            user = self._users[key] = _UserQueue()
+        user.depth += 1
+        self.max_user_depth = max(self.max_user_depth, user.depth)
+        try:
+            async with user.lock:
+                async with self._semaphore:
+                    self.wait_time.observe(time.perf_counter() - queued)
+                    await self.do_process_update(update, coroutine)
+        finally:
+            user.depth -= 1
+            if not user.depth:
+                del self._users[key]
+            self.processed += 1
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Queue depth and concurrency counters for monitoring"""
+        depths = [user.depth for user in self._users.values()]
+        return {
+            "max_concurrent_updates": self.max_concurrent_updates,
+            "running": self.current_concurrent_updates,
+            "users_pending": len(depths),
+            "updates_pending": sum(depths),
+            "max_user_depth": self.max_user_depth,
+            "processed": self.processed,
+            "wait_time": self.wait_time.as_dict()
+        }
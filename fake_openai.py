@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Локальный OpenAI-совместимый сервер для офлайн-тестов и нагрузочного тестирования
+Использование:
+    python fake_openai.py --port 8089
+    python fake_openai.py --latency lognormal:800,0.6 --error-rate 0.02 --rate-limit-rate 0.05 --seed 1
+Затем: OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+Задержка: fixed:MS | uniform:MIN-MAX | lognormal:MEDIAN,SIGMA | exponential:MEAN (в миллисекундах)
+--token-delay-ms добавляет время генерации, пропорциональное длине ответа
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+INTERVIEW_REPLY = {
+    "overall_score": 0.72,
+    "competency_scores": {"experience": 0.7, "technical_skills": 0.7, "communication": 0.8, "problem_solving": 0.7},
+    "communication_skills": "Четко и структурированно излагает мысли",
+    "experience_level": "middle",
+    "originality_score": 0.8,
+    "recommendations": ["Уточнить опыт работы с инструментами"],
+    "hr_recommendation": "recommended",
+    "summary": "Кандидат уверенно отвечает на вопросы"
+}
+
+RESUME_REPLY = {
+    "experience_years": "3",
+    "key_skills": ["Коммуникация", "CRM", "Jira"],
+    "experience_level": "middle",
+    "relevant_experience": "3 года в профильной роли",
+    "education": "Высшее",
+    "summary": "Кандидат с релевантным опытом"
+}
+
+ANSWER_QUALITY_REPLY = {
+    "completeness": 0.6,
+    "specificity": 0.5,
+    "relevance": 0.8,
+    "needs_follow_up": True,
+    "reason": "Не хватает конкретных примеров"
+}
+
+FOLLOW_UP_REPLY = "Приведите, пожалуйста, конкретный пример из вашего опыта."
+
+EXPERIENCE_LEVELS = ["junior", "middle", "senior"]
+HR_RECOMMENDATIONS = ["not_recommended", "needs_clarification", "recommended"]
+STREAM_CHUNK_CHARS = 12
+BATCH_ITEM_RE = re.compile(r"^Ответ (\d+):", re.MULTILINE)
+
+
+class LatencyModel:
+    """Response latency distribution, parsed from a spec such as 'lognormal:800,0.6' (milliseconds)"""
+
+    KINDS = ("fixed", "uniform", "lognormal", "exponential")
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown latency distribution: {kind}")
+        values = [float(v) for v in params.replace("-", ",").split(",") if v] or [0.0]
+        self.kind = kind
+        self.params = values
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        """One latency in seconds"""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.params[0], self.params[-1])
+        elif self.kind == "lognormal":
+            sigma = self.params[1] if len(self.params) > 1 else 0.5
+            ms = self.params[0] * math.exp(rng.gauss(0, sigma))
+        else:
+            ms = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(0.0, ms) / 1000
+
+
+class FakeSettings:
+    """Behaviour of the fake server: latency, injected failures and streaming pace"""
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 stream_chunk_delay: float = 0.0, seed: Optional[int] = None, token_delay: float = 0.0):
+        self.latency = LatencyModel(latency)
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_chunk_delay = stream_chunk_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def draw(self) -> Tuple[float, Optional[int]]:
+        """Latency for the next request and the error status to inject, if any"""
+        with self._lock:
+            latency = self.latency.sample(self._rng)
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return latency, 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return latency, 500
+        return latency, None
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] += 1
+
+
+def _prompt_fraction(messages: List[Dict[str, str]], salt: str) -> float:
+    """Stable pseudo-random number in [0, 1) derived from the prompt, so replies are reproducible"""
+    content = salt + "".join(m.get("content", "") for m in messages)
+    return int(hashlib.sha256(content.encode("utf-8")).hexdigest()[:8], 16) / 0x100000000
+
+
+def fake_reply(messages: List[Dict[str, str]]) -> str:
+    """Schema-valid reply for the prompt, recognized by its instructions"""
+    instructions = (messages[0]["content"] if messages else "").lower()
+    if "каждого ответа" in instructions:
+        ids = [int(i) for i in BATCH_ITEM_RE.findall(messages[-1]["content"])]
+        results = []
+        for item_id in ids:
+            completeness = round(_prompt_fraction(messages, f"completeness{item_id}"), 2)
+            results.append(dict(ANSWER_QUALITY_REPLY, id=item_id, completeness=completeness,
+                                needs_follow_up=completeness < 0.5))
+        return json.dumps({"results": results}, ensure_ascii=False)
+    if "ответы кандидата" in instructions:
+        score = round(0.3 + 0.65 * _prompt_fraction(messages, "score"), 2)
+        reply = dict(INTERVIEW_REPLY, overall_score=score,
+                     experience_level=EXPERIENCE_LEVELS[min(2, int(score * 3))],
+                     hr_recommendation=HR_RECOMMENDATIONS[min(2, int(score * 3))])
+        # Shard prompts list only some of the fields; answer with just those
+        reply = {name: value for name, value in reply.items() if f'"{name}"' in instructions}
+        if "competency_scores" in reply:
+            reply["competency_scores"] = {name: score for name, score in reply["competency_scores"].items()
+                                          if f'"{name}"' in instructions}
+        return json.dumps(reply, ensure_ascii=False)
+    if "резюме кандидата" in instructions:
+        level = EXPERIENCE_LEVELS[int(_prompt_fraction(messages, "level") * 3)]
+        return json.dumps(dict(RESUME_REPLY, experience_level=level), ensure_ascii=False)
+    if "качество ответа" in instructions:
+        completeness = round(_prompt_fraction(messages, "completeness"), 2)
+        reply = dict(ANSWER_QUALITY_REPLY, completeness=completeness, needs_follow_up=completeness < 0.5)
+        return json.dumps(reply, ensure_ascii=False)
+    return FOLLOW_UP_REPLY
+
+
+def _usage(messages: List[Dict[str, str]], content: str) -> Dict[str, int]:
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Chat completion response object for a request body"""
+    messages = body.get("messages", [])
+    content = fake_reply(messages)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": _usage(messages, content)
+    }
+
+
+def completion_chunks(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Streamed chat completion chunks for a request body, with a usage chunk when asked for"""
+    messages = body.get("messages", [])
+    content = fake_reply(messages)
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": body.get("model", "fake")}
+    chunks = [dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])]
+    for i in range(0, len(content), STREAM_CHUNK_CHARS):
+        piece = content[i:i + STREAM_CHUNK_CHARS]
+        chunks.append(dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+    chunks.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+    if (body.get("stream_options") or {}).get("include_usage"):
+        chunks.append(dict(base, choices=[], usage=_usage(messages, content)))
+    return chunks
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Handles POST /v1/chat/completions"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        body = json.loads(raw or b"{}")
+        settings: FakeSettings = self.server.settings
+
+        latency, error = settings.draw()
+        time.sleep(latency)
+        if error == 429:
+            settings.count("rate_limited")
+            self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                           {"Retry-After": "1"})
+            return
+        if error:
+            settings.count("errors")
+            self.send_json(error, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        settings.count("streamed" if body.get("stream") else "completed")
+        if body.get("stream"):
+            self.send_stream(completion_chunks(body), settings.stream_chunk_delay)
+        else:
+            response = completion(body)
+            # Generation time grows with the reply, like a real model's decoding
+            time.sleep(settings.token_delay * response["usage"]["completion_tokens"])
+            self.send_json(200, response)
+
+    def send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self, chunks: List[Dict[str, Any]], chunk_delay: float):
+        """Server-sent events, one chunk per event, then [DONE]"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if chunk_delay:
+                time.sleep(chunk_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, settings: Optional[FakeSettings] = None) -> ThreadingHTTPServer:
+    """Fake server bound to host:port (0 picks a free port)"""
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.settings = settings or FakeSettings()
+    return server
+
+
+def start_fake_server(host: str = "127.0.0.1", port: int = 0,
+                      settings: Optional[FakeSettings] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the server in a background thread; returns it and its base URL"""
+    server = make_server(host, port, settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Локальный OpenAI-совместимый сервер")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0", help="распределение задержки ответа, мс")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.0, help="пауза между чанками потока, с")
+    parser.add_argument("--seed", type=int, help="зерно для воспроизводимых задержек и ошибок")
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="время генерации одного токена ответа, мс")
+    args = parser.parse_args()
+
+    settings = FakeSettings(args.latency, args.error_rate, args.rate_limit_rate, args.stream_chunk_delay, args.seed,
+                            args.token_delay_ms / 1000)
+    server = make_server(args.host, args.port, settings)
+    print(f"🧪 Fake OpenAI: http://{args.host}:{args.port}/v1 (задержка {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n👋 Сервер остановлен: {dict(settings.stats)}")
+
+
+if __name__ == "__main__":
+    main()
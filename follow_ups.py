@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Iterable
+
+from answer_scorer import content_stems
+from models import Question
+from questions import get_all_questions
+
+DEFAULT_FOLLOW_UP = "Можете рассказать подробнее?"
+
+class FollowUpPool:
+    """Precomputed follow-up questions per question, picked locally for a given answer
+
+    The pool starts from Question.follow_up_questions and can be extended offline with
+    follow-ups the LLM generated for past answers (see derive_pool).
+    """
+
+    def __init__(self, questions: Iterable[Question] = (), derived: Optional[Dict[str, List[str]]] = None,
+                 max_per_question: int = 20):
+        self.max_per_question = max_per_question
+        self._lock = threading.Lock()
+        self._pool: Dict[str, List[str]] = {}
+        self._stems: Dict[str, Set[str]] = {}
+        self.served = Counter()
+        for question in questions:
+            for follow_up in question.follow_up_questions:
+                self.add(question.id, follow_up)
+        for question_id, follow_ups in (derived or {}).items():
+            for follow_up in follow_ups:
+                self.add(question_id, follow_up)
+
+    @classmethod
+    def load(cls, path: str, questions: Iterable[Question] = ()) -> "FollowUpPool":
+        """Pool from the question bank plus derived follow-ups saved at path, if the file exists"""
+        derived = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    derived = json.load(f)
+            except Exception as e:
+                print(f"Error loading follow-up pool: {e}")
+        return cls(questions, derived)
+
+    def save(self, path: str):
+        """Write the pool as JSON: question id -> follow-ups"""
+        with self._lock:
+            data = {question_id: list(follow_ups) for question_id, follow_ups in self._pool.items()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def add(self, question_id: str, follow_up: str) -> bool:
+        """Add a follow-up unless it is a duplicate or the question's pool is full"""
+        follow_up = (follow_up or "").strip()
+        if not follow_up:
+            return False
+        with self._lock:
+            follow_ups = self._pool.setdefault(question_id, [])
+            if len(follow_ups) >= self.max_per_question or any(f.lower() == follow_up.lower() for f in follow_ups):
+                return False
+            follow_ups.append(follow_up)
+            self._stems[follow_up] = set(content_stems(follow_up))
+            return True
+
+    def get(self, question_id: str) -> List[str]:
+        """All pooled follow-ups for a question"""
+        with self._lock:
+            return list(self._pool.get(question_id, []))
+
+    def select(self, question: Question, answer: str, exclude: Iterable[str] = ()) -> Optional[str]:
+        """The pooled follow-up that asks most about what the answer does not cover yet"""
+        answer_stems = set(content_stems(answer or ""))
+        excluded = {text.lower() for text in exclude}
+        best, best_coverage = None, None
+        with self._lock:
+            for follow_up in self._pool.get(question.id, []):
+                if follow_up.lower() in excluded:
+                    continue
+                stems = self._stems[follow_up]
+                coverage = len(stems & answer_stems) / len(stems) if stems else 1.0
+                if best_coverage is None or coverage < best_coverage:
+                    best, best_coverage = follow_up, coverage
+        return best
+
+    def record_served(self, source: str):
+        """Count where a served follow-up came from (pool, llm, default)"""
+        with self._lock:
+            self.served[source] += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        """Pool size and served follow-ups by source, for monitoring"""
+        with self._lock:
+            return {"questions": len(self._pool), "follow_ups": sum(map(len, self._pool.values())), **self.served}
+
+def derive_pool(db, analyzer, questions: Iterable[Question], answers_per_question: int = 50,
+                max_per_question: int = 20) -> FollowUpPool:
+    """Extend the question bank's follow-ups with LLM follow-ups generated for stored answers"""
+    questions = list(questions)
+    pool = FollowUpPool(questions, max_per_question=max_per_question)
+    for question in questions:
+        if question.category in ("contact", "introduction"):
+            continue
+        for answer in db.get_answers_for_question(question.id, answers_per_question):
+            if len(pool.get(question.id)) >= max_per_question:
+                break
+            pool.add(question.id, analyzer.generate_follow_up_question(question.text, answer, question.follow_up_questions))
+    return pool
+
+def main():
+    """Построение пула уточняющих вопросов по прошлым ответам"""
+    from ai_analyzer import AIAnalyzer
+    from config import Config
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Построение пула уточняющих вопросов")
+    parser.add_argument("--db", default="hrbot.db", help="путь к базе данных")
+    parser.add_argument("--output", default=Config.FOLLOW_UP_POOL_PATH, help="куда сохранить пул")
+    parser.add_argument("--answers-per-question", type=int, default=50)
+    args = parser.parse_args()
+
+    pool = derive_pool(Database(args.db), AIAnalyzer(), get_all_questions(), args.answers_per_question)
+    pool.save(args.output)
+    print(f"✅ Пул сохранен: {pool.as_dict()['follow_ups']} вопросов -> {args.output}")
+
+if __name__ == "__main__":
+    main()
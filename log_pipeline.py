@@ -0,0 +1,129 @@
+import atexit
+import logging
+import queue
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+from config import Config
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+
+_listener: Optional[QueueListener] = None
+
+def parse_sample_rates(spec: str) -> Dict[str, int]:
+    """"bot=10,ai_analyzer=5" -> {"bot": 10, "ai_analyzer": 5}"""
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = max(1, int(rate))
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """Keeps the first and then every N-th INFO/DEBUG record of each message template of a logger
+
+    Warnings and errors always pass. Counting per template (the unformatted message) keeps
+    rare lines of a sampled logger visible while thinning out the per-message ones.
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self.seen: Counter = Counter()
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.name)
+        if rate is None or rate == 1 or record.levelno >= logging.WARNING:
+            return True
+        key: Tuple[str, str] = (record.name, str(record.msg))
+        count = self.seen[key]
+        self.seen[key] = count + 1
+        if count % rate == 0:
+            return True
+        self.dropped += 1
+        return False
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler that leaves timestamps and layout to the listener thread
+
+    Only the %-arguments are merged on the caller's side, so later changes to mutable
+    arguments cannot alter the line.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class RotatingLogFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that also rolls over every `interval` seconds (0 disables it)"""
+
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0, interval: float = 0,
+                 encoding: Optional[str] = "utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval else None
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+def setup_logging(level: str = "INFO", path: Optional[str] = "hrbot.log", max_bytes: int = 0,
+                  backup_count: int = 0, interval: float = 0, sample_rates: Optional[Dict[str, int]] = None,
+                  console: bool = True) -> QueueListener:
+    """Route all logging through a queue to a background thread that writes the file and the console
+
+    Log calls on the event loop only put a record on the queue. Calling it again replaces
+    the previous pipeline.
+    """
+    global _listener
+    stop_logging()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if path:
+        handlers.append(RotatingLogFileHandler(path, max_bytes, backup_count, interval))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in [handler for handler in root.handlers if isinstance(handler, QueueHandler)]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Write out everything still queued and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(stop_logging)
+
+def setup_logging_from_config() -> QueueListener:
+    """setup_logging with the LOG_* settings"""
+    return setup_logging(Config.LOG_LEVEL, Config.LOG_FILE, Config.LOG_MAX_BYTES, Config.LOG_BACKUP_COUNT,
+                         Config.LOG_ROTATE_SECONDS, parse_sample_rates(Config.LOG_SAMPLE_RATES))
@@ -68,6 +68,43 @@ class Interview(BaseModel):
             return questions[self.current_question_index]
         return None
 
+class InterviewSession:
+    """In-memory state of an open interview: ids, question cursor, follow-up count and timestamps
+
+    A slotted record instead of an Interview, so 100k open sessions stay small; the answers
+    live only in the database and are loaded when the interview is analyzed.
+    """
+
+    __slots__ = ("interview_id", "candidate_id", "position", "status", "current_question_index",
+                 "follow_up_count", "started_at", "completed_at")
+
+    def __init__(self, interview_id: int, candidate_id: int, position: Position,
+                 status: InterviewStatus = InterviewStatus.STARTED, current_question_index: int = 0,
+                 follow_up_count: int = 0, started_at: Optional[datetime] = None,
+                 completed_at: Optional[datetime] = None):
+        self.interview_id = interview_id
+        self.candidate_id = candidate_id
+        self.position = position
+        self.status = status
+        self.current_question_index = current_question_index
+        self.follow_up_count = follow_up_count
+        self.started_at = started_at or datetime.now()
+        self.completed_at = completed_at
+
+    @classmethod
+    def from_interview(cls, interview_id: int, interview: Interview) -> "InterviewSession":
+        return cls(interview_id, interview.candidate_id, interview.position, interview.status,
+                   interview.current_question_index, interview.follow_up_count,
+                   interview.started_at, interview.completed_at)
+
+    def advance(self):
+        """Move to the next question once the current answer is stored"""
+        self.current_question_index += 1
+
+    def __repr__(self) -> str:
+        return (f"InterviewSession(interview_id={self.interview_id}, candidate_id={self.candidate_id}, "
+                f"position={self.position.value}, question={self.current_question_index})")
+
 class InterviewAnalysis(BaseModel):
     """Interview analysis result"""
     candidate_id: int
@@ -0,0 +1,98 @@
+import random
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Set, Tuple, Hashable
+
+MERSENNE_PRIME = (1 << 61) - 1
+WORD_RE = re.compile(r"\w+")
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of answers, partitioned by question, for finding near-duplicate texts
+
+    Each answer becomes a MinHash signature of its word shingles. Signatures are split into
+    bands; answers sharing any band land in the same bucket, so a query only compares against
+    likely duplicates instead of the whole corpus. With the defaults (16 bands of 4 rows),
+    texts with Jaccard similarity ~0.5 have even odds of becoming candidates.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[Tuple, List[Hashable]]] = {}
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self._groups: Dict[Hashable, Hashable] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def shingles(self, text: str) -> Set[str]:
+        """Word n-grams of the normalized text; short texts become a single shingle"""
+        words = WORD_RE.findall((text or "").lower())
+        if len(words) < self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        """MinHash signature of the text, None for text without words"""
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in self.shingles(text)]
+        if not hashes:
+            return None
+        return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self._perms)
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[Tuple]:
+        return [(band,) + signature[band * self.rows:(band + 1) * self.rows] for band in range(self.bands)]
+
+    def add(self, question_id: str, key: Hashable, text: str, group: Hashable = None) -> bool:
+        """Index an answer under its question; group (e.g. the interview) is excluded from its own queries"""
+        signature = self.signature(text)
+        if signature is None:
+            return False
+        with self._lock:
+            buckets = self._buckets.setdefault(question_id, {})
+            for band in self._bands(signature):
+                buckets.setdefault(band, []).append(key)
+            self._signatures[key] = signature
+            self._groups[key] = group
+        return True
+
+    def query(self, question_id: str, text: str, k: int = 5, threshold: float = 0.5,
+              exclude_group: Hashable = None, before: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """Nearest indexed answers to the same question as (key, estimated Jaccard similarity), best first
+
+        With before, only keys lower than it count (keys are ascending answer ids), so an answer
+        is compared with what existed when it was given, not with later copies of it.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return []
+        with self._lock:
+            buckets = self._buckets.get(question_id, {})
+            candidates = set()
+            for band in self._bands(signature):
+                candidates.update(buckets.get(band, ()))
+            scored = []
+            for key in candidates:
+                if exclude_group is not None and self._groups[key] == exclude_group:
+                    continue
+                if before is not None and key >= before:
+                    continue
+                other = self._signatures[key]
+                similarity = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+                if similarity >= threshold:
+                    scored.append((key, similarity))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def originality(self, question_id: str, text: str, exclude_group: Hashable = None,
+                    before: Optional[int] = None) -> float:
+        """1 minus the similarity to the closest indexed answer to the same question"""
+        nearest = self.query(question_id, text, k=1, threshold=0.0, exclude_group=exclude_group, before=before)
+        return 1.0 - nearest[0][1] if nearest else 1.0
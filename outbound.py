@@ -0,0 +1,226 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter, deque
+from datetime import timedelta
+from enum import IntEnum
+from typing import Any, Callable, Coroutine, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from telemetry import Histogram, LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Outbound message classes; lower values are sent first"""
+    CANDIDATE = 0
+    NOTIFICATION = 1
+
+class TokenBucket:
+    """Token bucket where every caller reserves a token and is told how long to wait for it
+
+    Reservations may drive the balance negative, so concurrent callers are spaced out in
+    the order they asked without any lock. A paused bucket hands out nothing until the pause ends.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token; returns the seconds until it is actually available"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate, self.paused_until - now)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def idle(self) -> bool:
+        """Full again, so dropping the bucket loses nothing"""
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and self.paused_until <= now
+
+class PrioritizedRateLimiter(BaseRateLimiter):
+    """Rate limiter for ExtBot: per-chat and global token buckets with priority for candidate replies
+
+    A request first waits for its chat's bucket (private and group chats have separate limits),
+    then for a global token. Global tokens are handed out by priority: a candidate reply queued
+    behind a burst of HR notifications goes first. RetryAfter pauses the chat it came for by the
+    given time and the request is retried, up to max_retries times. Only RetryAfters for
+    global_pause_chats different chats within global_pause_window seconds pause all sending.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 group_rate: float = 20 / 60, group_burst: float = 3, max_retries: int = 3,
+                 notification_chats: Iterable[Union[int, str]] = (), global_pause_chats: int = 3,
+                 global_pause_window: float = 10):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.notification_chats = set(notification_chats)
+        self.global_pause_chats = global_pause_chats
+        self.global_pause_window = global_pause_window
+        self._flood_waits: Deque[Tuple[float, Union[int, str]]] = deque()
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self.waiting_for_chat = 0
+        self.stats = Counter()
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        self.send_latency = Histogram(LATENCY_BUCKETS)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+
+    def classify(self, data: Dict[str, Any], rate_limit_args: Optional[Dict[str, Any]]) -> Priority:
+        """Priority from rate_limit_args={"priority": ...}, else by recipient"""
+        if rate_limit_args and "priority" in rate_limit_args:
+            return Priority(rate_limit_args["priority"])
+        if data.get("chat_id") in self.notification_chats:
+            return Priority.NOTIFICATION
+        return Priority.CANDIDATE
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= 10000:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle()}
+            # Negative ids and @usernames are groups and channels, which have the stricter limit
+            group = isinstance(chat_id, str) or chat_id < 0
+            bucket = self._chats[chat_id] = (TokenBucket(self.group_rate, self.group_burst) if group
+                                             else TokenBucket(self.chat_rate, self.chat_burst))
+        return bucket
+
+    async def _wait_for_chat(self, bucket: TokenBucket):
+        wait = bucket.reserve()
+        while wait > 0:
+            self.waiting_for_chat += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting_for_chat -= 1
+            # The chat may have been paused by a RetryAfter in the meantime
+            wait = bucket.paused_until - time.monotonic()
+
+    def _flood_wait(self, chat_id: Union[int, str], retry_after: float):
+        """Pause the chat; pause everything only when several chats hit the limit at once"""
+        self._chat_bucket(chat_id).pause(retry_after)
+        now = time.monotonic()
+        self._flood_waits.append((now, chat_id))
+        while self._flood_waits[0][0] <= now - self.global_pause_window:
+            self._flood_waits.popleft()
+        if len({chat for _, chat in self._flood_waits}) >= self.global_pause_chats:
+            self.stats["global_pauses"] += 1
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+    async def _acquire_global(self, priority: Priority):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.stats[f"queued_{priority.name.lower()}"] += 1
+        if self._pump is None:
+            self._pump = asyncio.create_task(self._release())
+        try:
+            await future
+        finally:
+            self.stats[f"queued_{priority.name.lower()}"] -= 1
+
+    async def _release(self):
+        """Hand out global tokens, one at a time, to the highest-priority waiter"""
+        try:
+            while self._waiters:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                    continue
+                wait = self.global_bucket.reserve()
+                if wait:
+                    await asyncio.sleep(wait)
+                # Whoever has the highest priority now gets the token, not who was first when it was reserved
+                while self._waiters:
+                    _, _, future = heapq.heappop(self._waiters)
+                    if not future.done():
+                        future.set_result(None)
+                        break
+                else:
+                    self.global_bucket.refund()
+        finally:
+            self._pump = None
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        chat_id = data.get("chat_id")
+        # Calls that send nothing to a chat (getMe, setWebhook, answerCallbackQuery...) are not limited
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+
+        priority = self.classify(data, rate_limit_args)
+        queued = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_chat(self._chat_bucket(chat_id))
+            await self._acquire_global(priority)
+            if attempt == 0:
+                self.queue_wait.observe(time.perf_counter() - queued)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else float(e.retry_after)
+                self.stats["retry_after"] += 1
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                logger.warning("Flood limit on %s to %s, pausing the chat for %.1f s", endpoint, chat_id, retry_after)
+                self._flood_wait(chat_id, retry_after)
+                continue
+            self.stats["sent"] += 1
+            self.send_latency.observe(time.perf_counter() - queued)
+            return result
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Queue depth and send latency for monitoring"""
+        return {
+            "queued": {priority.name.lower(): self.stats[f"queued_{priority.name.lower()}"] for priority in Priority},
+            "waiting_for_chat": self.waiting_for_chat,
+            "sent": self.stats["sent"],
+            "retry_after": self.stats["retry_after"],
+            "global_pauses": self.stats["global_pauses"],
+            "failed": self.stats["failed"],
+            "chats_tracked": len(self._chats),
+            "queue_wait": self.queue_wait.as_dict(),
+            "send_latency": self.send_latency.as_dict()
+        }
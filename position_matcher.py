@@ -0,0 +1,105 @@
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from answer_scorer import CATEGORY_TERMS, content_stems
+from models import Position
+from questions import get_professional_questions_for_position
+
+def position_profile(position: Position) -> str:
+    """Profile document of a position, derived from its question bank"""
+    parts = []
+    for question in get_professional_questions_for_position(position):
+        parts.append(question.text)
+        parts.extend(question.follow_up_questions)
+        parts.extend(CATEGORY_TERMS.get(question.category, []))
+    return "\n".join(parts)
+
+class PositionMatcher:
+    """Local resume-to-position matching with hashed TF-IDF vectors
+
+    Stems and stem bigrams are hashed into a fixed-size vector (signed, to cancel collisions
+    on average), so no vocabulary has to be kept. IDF is taken from the indexed resumes and
+    profiles; a match is the cosine of the IDF-weighted vectors.
+    """
+
+    def __init__(self, dim: int = 2048):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._profiles = {position: self.vectorize(position_profile(position)) for position in Position}
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._rows: Dict[int, int] = {}
+        self._keys: List[int] = []
+        self._df = np.zeros(dim, dtype=np.float32)
+        for vector in self._profiles.values():
+            self._df += vector != 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """Hashed term-frequency vector (log-scaled) of stems and stem bigrams"""
+        stems = content_stems(text or "")
+        features = stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return np.sign(vector) * np.log1p(np.abs(vector))
+
+    def _idf(self) -> np.ndarray:
+        documents = len(self._keys) + len(self._profiles)
+        return np.log((1 + documents) / (1 + self._df)) + 1
+
+    def add_resume(self, key: int, text: str):
+        """Index or replace the resume stored under key (e.g. the candidate's user id)"""
+        vector = self.vectorize(text)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                self._df -= self._matrix[row] != 0
+                self._matrix[row] = vector
+            else:
+                row = len(self._keys)
+                if row == len(self._matrix):
+                    # Grow by doubling, so adding resumes one by one stays amortized O(1)
+                    grown = np.zeros((max(16, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+                    grown[:row] = self._matrix
+                    self._matrix = grown
+                self._matrix[row] = vector
+                self._rows[key] = row
+                self._keys.append(key)
+            self._df += vector != 0
+
+    def match(self, text: str, position: Optional[Position] = None) -> Dict[Position, float]:
+        """Match scores (0..1) of a resume text against each position profile, or only the given one"""
+        positions = [position] if position else list(Position)
+        with self._lock:
+            idf = self._idf()
+        resume = self.vectorize(text) * idf
+        norm = np.linalg.norm(resume)
+        scores = {}
+        for candidate_position in positions:
+            profile = self._profiles[candidate_position] * idf
+            denominator = norm * np.linalg.norm(profile)
+            scores[candidate_position] = float(max(0.0, resume @ profile / denominator)) if denominator else 0.0
+        return scores
+
+    def top_k(self, position: Position, k: int = 10) -> List[Tuple[int, float]]:
+        """Best-matching indexed resumes for a position as (key, score), best first"""
+        with self._lock:
+            count = len(self._keys)
+            if not count:
+                return []
+            idf = self._idf()
+            resumes = self._matrix[:count] * idf
+            keys = list(self._keys)
+        profile = self._profiles[position] * idf
+        norms = np.linalg.norm(resumes, axis=1) * np.linalg.norm(profile)
+        scores = np.divide(resumes @ profile, norms, out=np.zeros(count, dtype=np.float32), where=norms > 0)
+        k = min(k, count)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(keys[i], float(max(0.0, scores[i]))) for i in best]
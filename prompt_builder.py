@@ -0,0 +1,143 @@
+import math
+import re
+from typing import List, Dict, Optional
+from pydantic import BaseModel
+
+try:
+    import tiktoken
+except ImportError:  # optional: exact counts when installed, byte-based estimate otherwise
+    tiktoken = None
+
+TRUNCATION_MARKER = "\n[...]\n"
+
+class BuiltPrompt(BaseModel):
+    """Chat messages ready to send, with their local token count"""
+    messages: List[Dict[str, str]]
+    tokens: int
+    content_tokens: int
+    truncated: bool = False
+
+class PromptBuilder:
+    """Builds chat prompts: static instructions first, budgeted variable content last"""
+
+    def __init__(self, model: Optional[str] = None):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens locally; without tiktoken, ~4 UTF-8 bytes per token (safe for Cyrillic)"""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return math.ceil(len(text.encode("utf-8")) / 4)
+
+    def condense(self, text: str) -> str:
+        """Drop repeated lines and collapse whitespace without losing content"""
+        seen = set()
+        lines = []
+        for line in text.splitlines():
+            line = re.sub(r"[ \t]+", " ", line).strip()
+            if not line:
+                if lines and lines[-1] != "":
+                    lines.append("")
+                continue
+            key = line.lower()
+            if key in seen and len(line) > 20:
+                continue
+            seen.add(key)
+            lines.append(line)
+        return "\n".join(lines).strip()
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to max_tokens, keeping its beginning and its end"""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+
+        marker_tokens = self.count_tokens(TRUNCATION_MARKER)
+        keep = max(1, max_tokens - marker_tokens)
+        head_tokens = keep * 2 // 3
+        tail_tokens = keep - head_tokens
+
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text)
+            head = self._encoding.decode(tokens[:head_tokens])
+            tail = self._encoding.decode(tokens[-tail_tokens:]) if tail_tokens else ""
+            return head + TRUNCATION_MARKER + tail
+
+        # Estimate characters per token for this text, then shrink until it fits
+        chars_per_token = len(text) / self.count_tokens(text)
+        while True:
+            head = text[:int(head_tokens * chars_per_token)]
+            tail = text[len(text) - int(tail_tokens * chars_per_token):] if tail_tokens else ""
+            result = head + TRUNCATION_MARKER + tail
+            if self.count_tokens(result) <= max_tokens or chars_per_token < 0.5:
+                return result
+            chars_per_token *= 0.9
+
+    def fit_sections(self, sections: List[str], budget: int) -> List[str]:
+        """Fit sections into a shared budget; short sections stay whole, long ones share the rest"""
+        sizes = [self.count_tokens(section) for section in sections]
+        if sum(sizes) <= budget:
+            return list(sections)
+
+        # Water-filling: hand out equal shares, smallest sections first, passing leftovers on
+        allowance = [0] * len(sections)
+        remaining = budget
+        order = sorted(range(len(sections)), key=lambda i: sizes[i])
+        for position, index in enumerate(order):
+            share = remaining // (len(order) - position)
+            allowance[index] = min(sizes[index], share)
+            remaining -= allowance[index]
+
+        return [
+            section if allowance[i] >= sizes[i] else self.truncate(section, allowance[i])
+            for i, section in enumerate(sections)
+        ]
+
+    def build(self, instructions: str, content: str, budget: int) -> BuiltPrompt:
+        """Static instructions as the system message (cacheable prefix), budgeted content as the user message"""
+        original = content
+        content = self.condense(content)
+        content = self.truncate(content, budget)
+        return self._prompt(instructions, content, truncated=content != self.condense(original))
+
+    def build_sections(self, instructions: str, header: str, sections: List[str], budget: int) -> BuiltPrompt:
+        """Like build, for content made of sections that must all stay represented (e.g. a transcript)"""
+        condensed = [self.condense(section) for section in sections]
+        fitted = self.fit_sections(condensed, max(0, budget - self.count_tokens(header)))
+        content = header + "\n\n" + "\n\n".join(fitted)
+        return self._prompt(instructions, content, truncated=fitted != condensed)
+
+    def extend(self, prompt: BuiltPrompt, reply: str, request: str) -> BuiltPrompt:
+        """Continue a conversation: previous reply as the assistant turn, then a new user request"""
+        messages = prompt.messages + [
+            {"role": "assistant", "content": reply},
+            {"role": "user", "content": request}
+        ]
+        extra = self.count_tokens(reply) + self.count_tokens(request)
+        return BuiltPrompt(
+            messages=messages,
+            tokens=prompt.tokens + extra,
+            content_tokens=prompt.content_tokens + extra,
+            truncated=prompt.truncated
+        )
+
+    def _prompt(self, instructions: str, content: str, truncated: bool) -> BuiltPrompt:
+        messages = [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": content}
+        ]
+        content_tokens = self.count_tokens(content)
+        return BuiltPrompt(
+            messages=messages,
+            tokens=self.count_tokens(instructions) + content_tokens,
+            content_tokens=content_tokens,
+            truncated=truncated
+        )
@@ -30,6 +30,14 @@ def get_professional_questions_for_position(position: Position) -> list[Question
         return QA_QUESTIONS
     return []
 
+def get_all_questions() -> list[Question]:
+    """Get every question once, across all positions"""
+    unique = {}
+    for questions in QUESTION_SETS.values():
+        for question in questions:
+            unique.setdefault(question.id, question)
+    return list(unique.values())
+
 def get_question_by_id(question_id: str) -> Question | None:
     """Get question by ID"""
     for questions in QUESTION_SETS.values():
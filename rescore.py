@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Повторная оценка сохраненных интервью новой версией анализа
+Использование:
+    python rescore.py online --version v2 [--concurrency 8] [--checkpoint rescore.ckpt]
+    python rescore.py batch-export --version v2 --output batch.jsonl
+    python rescore.py batch-import --version v2 results.jsonl
+Для офлайн-проверки: python fake_openai.py и OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+"""
+
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from ai_analyzer import AIAnalyzer
+from database import Database
+from models import Interview, Answer, InterviewAnalysis, Position
+
+CUSTOM_ID_PREFIX = "interview-"
+
+
+def checkpoint_key(version: str, position: Optional[Position] = None) -> Dict[str, Any]:
+    """What a checkpoint belongs to: its watermark is meaningless for another version or filter"""
+    return {"version": version, "position": position.value if position else None}
+
+
+def load_checkpoint(path: Optional[str], version: str, position: Optional[Position] = None) -> int:
+    """Last interview id fully processed by a previous run of the same version and filter, else 0"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if any(data.get(name) != value for name, value in checkpoint_key(version, position).items()):
+        print(f"⚠️ Контрольная точка {path} от другого запуска ({data.get('version')}), начинаем сначала")
+        return 0
+    return int(data.get("last_id", 0))
+
+
+def save_checkpoint(path: Optional[str], last_id: int, version: str, position: Optional[Position] = None):
+    """Persist the watermark atomically, so a crash never leaves a broken checkpoint"""
+    if not path:
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(checkpoint_key(version, position), last_id=last_id), f)
+    os.replace(tmp_path, path)
+
+
+def pending_interviews(db: Database, version: str, after_id: int = 0, position: Optional[Position] = None,
+                       limit: Optional[int] = None) -> Iterator[Tuple[int, Interview, List[Answer]]]:
+    """Completed interviews with their answers that have no analysis of this version yet"""
+    done = db.get_analyzed_interview_ids(version)
+    count = 0
+    for interview_id, interview in db.iter_interviews(after_id=after_id, position=position):
+        if interview_id in done:
+            continue
+        if limit is not None and count >= limit:
+            return
+        answers = db.get_interview_answers(interview_id)
+        if not answers:
+            continue
+        count += 1
+        yield interview_id, interview, answers
+
+
+def with_local_originality(db: Database, interview_id: int, analysis: InterviewAnalysis) -> InterviewAnalysis:
+    """Replace the model's originality guess with the score against the whole answer corpus"""
+    originality = db.get_answers_originality(interview_id)
+    if originality is not None:
+        analysis.originality_score = originality
+    return analysis
+
+
+def rescore_online(db: Database, analyzer: AIAnalyzer, version: str, concurrency: int = 8,
+                   checkpoint: Optional[str] = None, position: Optional[Position] = None,
+                   limit: Optional[int] = None) -> Dict[str, int]:
+    """Re-score through the API with at most `concurrency` interviews in flight"""
+    stats = {"scored": 0, "failed": 0}
+    in_flight = deque()
+
+    def settle(block: bool):
+        # Futures settle in submission (id) order, so the checkpoint never skips an unfinished interview;
+        # it stops before the first failure, and a rerun retries it (scored ones are skipped by version tag)
+        while in_flight and (block or in_flight[0][1].done()):
+            interview_id, future = in_flight.popleft()
+            try:
+                analysis = with_local_originality(db, interview_id, future.result())
+                if db.save_analysis(analysis, interview_id=interview_id, version=version):
+                    stats["scored"] += 1
+                else:
+                    stats["failed"] += 1
+            except Exception as e:
+                print(f"❌ Интервью {interview_id}: {e}")
+                stats["failed"] += 1
+            if not stats["failed"]:
+                save_checkpoint(checkpoint, interview_id, version, position)
+            block = False
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for interview_id, interview, answers in pending_interviews(db, version, load_checkpoint(checkpoint, version, position),
+                                                                   position, limit):
+            if len(in_flight) >= concurrency:
+                settle(block=True)
+            in_flight.append((interview_id, executor.submit(analyzer.analyze_interview, interview, answers, True)))
+            settle(block=False)
+        while in_flight:
+            settle(block=True)
+    return stats
+
+
+def export_batch(db: Database, analyzer: AIAnalyzer, version: str, output: str,
+                 position: Optional[Position] = None, limit: Optional[int] = None) -> int:
+    """Write pending interviews as a provider batch file (one chat completion request per line)"""
+    count = 0
+    with open(output, "w", encoding="utf-8") as f:
+        for interview_id, interview, answers in pending_interviews(db, version, position=position, limit=limit):
+            request = {
+                "custom_id": f"{CUSTOM_ID_PREFIX}{interview_id}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": analyzer.interview_request_body(interview, answers)
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def import_batch(db: Database, analyzer: AIAnalyzer, version: str, results: str) -> Dict[str, int]:
+    """Store analyses from a provider batch results file; safe to run again on the same file"""
+    stats = {"scored": 0, "failed": 0, "skipped": 0}
+    done = db.get_analyzed_interview_ids(version)
+    with open(results, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            interview_id = int(record["custom_id"][len(CUSTOM_ID_PREFIX):])
+            if interview_id in done:
+                stats["skipped"] += 1
+                continue
+
+            response = record.get("response") or {}
+            interview = db.get_interview(interview_id)
+            if record.get("error") or response.get("status_code") != 200 or interview is None:
+                print(f"❌ Интервью {interview_id}: {record.get('error') or 'нет ответа'}")
+                stats["failed"] += 1
+                continue
+
+            reply = response["body"]["choices"][0]["message"]["content"]
+            analysis = with_local_originality(db, interview_id, analyzer.interview_analysis_from_reply(interview, reply))
+            if db.save_analysis(analysis, interview_id=interview_id, version=version):
+                done.add(interview_id)
+                stats["scored"] += 1
+            else:
+                stats["failed"] += 1
+    return stats
+
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Повторная оценка интервью")
+    parser.add_argument("--db", default="hrbot.db", help="путь к базе данных")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    online = subparsers.add_parser("online", help="оценка через API с ограниченным параллелизмом")
+    online.add_argument("--concurrency", type=int, default=8)
+    online.add_argument("--checkpoint", default="rescore.ckpt", help="файл для возобновления прерванного запуска")
+
+    export = subparsers.add_parser("batch-export", help="выгрузить запросы в batch-файл провайдера")
+    export.add_argument("--output", required=True)
+
+    ingest = subparsers.add_parser("batch-import", help="загрузить результаты batch-файла")
+    ingest.add_argument("results")
+
+    for subparser in (online, export, ingest):
+        subparser.add_argument("--version", required=True, help="метка версии анализа")
+    for subparser in (online, export):
+        subparser.add_argument("--position", choices=[p.value for p in Position])
+        subparser.add_argument("--limit", type=int)
+
+    args = parser.parse_args()
+    db = Database(args.db)
+    analyzer = AIAnalyzer()
+    position = Position(args.position) if getattr(args, "position", None) else None
+
+    if args.command == "online":
+        stats = rescore_online(db, analyzer, args.version, args.concurrency, args.checkpoint, position, args.limit)
+        print(f"✅ Оценено: {stats['scored']}, ошибок: {stats['failed']}")
+    elif args.command == "batch-export":
+        count = export_batch(db, analyzer, args.version, args.output, position, args.limit)
+        print(f"📦 Выгружено запросов: {count} -> {args.output}")
+    else:
+        stats = import_batch(db, analyzer, args.version, args.results)
+        print(f"✅ Загружено: {stats['scored']}, ошибок: {stats['failed']}, пропущено: {stats['skipped']}")
+
+
+if __name__ == "__main__":
+    main()
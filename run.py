@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 """
 Скрипт запуска HR-бота
-Использование: python run.py
+Использование: python run.py [--mode polling|webhook|supervisor] [--workers N]
 """
 
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -50,6 +51,7 @@ def check_dependencies():
         import openai
         import pydantic
         import dotenv
+        import numpy
         print("✅ Все зависимости установлены")
         return True
     except ImportError as e:
@@ -59,6 +61,13 @@ def check_dependencies():
 
 def main():
     """Основная функция"""
+    parser = argparse.ArgumentParser(description="Запуск HR-бота")
+    parser.add_argument("--mode", choices=["polling", "webhook", "supervisor"],
+                        help="способ получения обновлений (по умолчанию BOT_MODE из .env)")
+    parser.add_argument("--workers", type=int,
+                        help="число процессов-обработчиков в режиме supervisor (по умолчанию WORKERS из .env)")
+    args = parser.parse_args()
+    
     print("🤖 Запуск HR-бота для компании Маджента")
     print("=" * 50)
     
@@ -70,15 +79,31 @@ def main():
     if not check_dependencies():
         sys.exit(1)
     
-    print("\n🚀 Запуск бота...")
+    if args.mode:
+        os.environ["BOT_MODE"] = args.mode
+    if args.workers:
+        os.environ["WORKERS"] = str(args.workers)
+    
+    print(f"\n🚀 Запуск бота ({os.getenv('BOT_MODE', 'polling')})...")
     print("💡 Для остановки нажмите Ctrl+C")
     print("=" * 50)
     
     try:
         # Импортируем и запускаем бота
-        from bot import HRBot
-        bot = HRBot()
-        bot.run()
+        if os.getenv("BOT_MODE") == "supervisor":
+            # Сам супервизор бота не создает: он только принимает обновления и раздает их процессам
+            from config import Config
+            from cluster import run_supervisor
+            from log_pipeline import setup_logging_from_config
+            Config.validate()
+            setup_logging_from_config()
+            run_supervisor()
+        else:
+            from log_pipeline import setup_logging_from_config
+            from bot import HRBot
+            setup_logging_from_config()
+            bot = HRBot()
+            bot.run()
     except KeyboardInterrupt:
         print("\n👋 Бот остановлен")
     except Exception as e:
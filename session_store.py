@@ -0,0 +1,121 @@
+import asyncio
+import json
+from typing import Any, Dict, Optional, Set
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from database import Database
+from models import Answer, Position
+
+def encode_session(data: Dict[str, Any]) -> str:
+    """Serialize user_data to JSON, keeping positions and answers typed"""
+    def encode(value: Any) -> Any:
+        if isinstance(value, Position):
+            return {"__position__": value.value}
+        if isinstance(value, Answer):
+            return {"__answer__": value.model_dump(mode="json")}
+        if isinstance(value, dict):
+            return {key: encode(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [encode(item) for item in value]
+        return value
+    return json.dumps(encode(data), ensure_ascii=False)
+
+def decode_session(text: str) -> Dict[str, Any]:
+    """Inverse of encode_session"""
+    def decode(value: Dict[str, Any]) -> Any:
+        if "__position__" in value:
+            return Position(value["__position__"])
+        if "__answer__" in value:
+            return Answer.model_validate(value["__answer__"])
+        return value
+    return json.loads(text, object_hook=decode)
+
+class SessionPersistence(BasePersistence):
+    """Keeps each user's user_data in the bot database
+
+    Writes are coalesced twice: the Application hands over changed users once per
+    update_interval, and all users of one round are written in a single transaction.
+    Nothing is loaded at startup; a user's data is read on their next update.
+    """
+
+    def __init__(self, db: Database, update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db = db
+        self._loaded: Set[int] = set()
+        self._dirty: Dict[int, str] = {}
+        self._writer: Optional[asyncio.Task] = None
+        self.writes = 0
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        """Lazily restore a user's data before their first update after a restart"""
+        if user_id in self._loaded:
+            return
+        self._loaded.add(user_id)
+        stored = await asyncio.to_thread(self.db.get_session, user_id)
+        if stored and not user_data:
+            user_data.update(decode_session(stored))
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._loaded.add(user_id)
+        self._dirty[user_id] = encode_session(data)
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_dirty())
+        await self._writer
+
+    async def _write_dirty(self):
+        # Let the other updates of this persistence round join the same transaction
+        await asyncio.sleep(0)
+        batch, self._dirty = self._dirty, {}
+        self._writer = None
+        if batch:
+            await asyncio.to_thread(self.db.save_sessions, batch)
+            self.writes += 1
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._dirty.pop(user_id, None)
+        await asyncio.to_thread(self.db.delete_session, user_id)
+
+    async def flush(self) -> None:
+        if self._dirty:
+            batch, self._dirty = self._dirty, {}
+            await asyncio.to_thread(self.db.save_sessions, batch)
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state: Optional[object]) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
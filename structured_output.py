@@ -0,0 +1,204 @@
+import json
+import re
+from typing import Dict, Any, List, Optional, Tuple, Type
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+def _clamp_score(value: float) -> float:
+    """Scores are 0..1; models sometimes answer on a 0..10 or 0..100 scale"""
+    if value > 10:
+        value = value / 100
+    elif value > 1:
+        value = value / 10
+    return min(1.0, max(0.0, value))
+
+class ResumeAnalysisResult(BaseModel):
+    """Expected LLM output of analyze_resume"""
+    experience_years: str
+    key_skills: List[str]
+    experience_level: str
+    relevant_experience: str
+    education: str
+    summary: str
+
+    @field_validator("experience_years", mode="before")
+    @classmethod
+    def years_as_text(cls, value):
+        return str(value) if isinstance(value, (int, float)) else value
+
+class InterviewAnalysisResult(BaseModel):
+    """Expected LLM output of analyze_interview"""
+    overall_score: float
+    competency_scores: Dict[str, float]
+    communication_skills: str
+    experience_level: str
+    originality_score: float
+    recommendations: List[str]
+    hr_recommendation: str
+    summary: str
+
+    @field_validator("overall_score", "originality_score")
+    @classmethod
+    def score_range(cls, value: float) -> float:
+        return _clamp_score(value)
+
+    @field_validator("competency_scores")
+    @classmethod
+    def competency_range(cls, value: Dict[str, float]) -> Dict[str, float]:
+        return {name: _clamp_score(score) for name, score in value.items()}
+
+    @field_validator("hr_recommendation")
+    @classmethod
+    def known_recommendation(cls, value: str) -> str:
+        value = value.strip().lower()
+        if value not in ("recommended", "needs_clarification", "not_recommended"):
+            raise ValueError(f"unknown hr_recommendation: {value}")
+        return value
+
+class ExperienceShardResult(BaseModel):
+    """Expected LLM output of the experience shard of a fanned-out interview analysis"""
+    competency_scores: Dict[str, float]
+    experience_level: str
+
+    @field_validator("competency_scores")
+    @classmethod
+    def competency_range(cls, value: Dict[str, float]) -> Dict[str, float]:
+        return {name: _clamp_score(score) for name, score in value.items()}
+
+class CommunicationShardResult(BaseModel):
+    """Expected LLM output of the communication shard of a fanned-out interview analysis"""
+    competency_scores: Dict[str, float]
+    communication_skills: str
+    originality_score: float
+
+    @field_validator("originality_score")
+    @classmethod
+    def score_range(cls, value: float) -> float:
+        return _clamp_score(value)
+
+    @field_validator("competency_scores")
+    @classmethod
+    def competency_range(cls, value: Dict[str, float]) -> Dict[str, float]:
+        return {name: _clamp_score(score) for name, score in value.items()}
+
+class SummaryShardResult(BaseModel):
+    """Expected LLM output of the summary shard of a fanned-out interview analysis"""
+    recommendations: List[str]
+    summary: str
+
+class AnswerQualityResult(BaseModel):
+    """Expected LLM output of check_answer_quality"""
+    completeness: float = Field(ge=0, le=1)
+    specificity: float = Field(ge=0, le=1)
+    relevance: float = Field(ge=0, le=1)
+    needs_follow_up: bool
+    reason: str = ""
+
+def _scan_object(text: str) -> Tuple[Optional[str], List[str], bool, int]:
+    """Scan the first {...} block of text
+
+    Returns the block, the closers still open at its end, whether it ends inside a string,
+    and the offset of the last top-level comma (everything before it is complete).
+    """
+    start = text.find("{")
+    if start < 0:
+        return None, [], False, -1
+    stack = []
+    in_string = escaped = False
+    last_comma = -1
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[start:i + 1], [], False, last_comma
+        elif char == "," and len(stack) == 1:
+            last_comma = i - start
+    return text[start:], stack, in_string, last_comma
+
+def _balanced_object(text: str) -> Optional[str]:
+    """First {...} block of text; unterminated blocks (e.g. cut off by max_tokens) are closed"""
+    block, stack, in_string, _ = _scan_object(text)
+    if block is None or not stack:
+        return block
+    if in_string:
+        block += '"'
+    return block.rstrip().rstrip(",") + "".join(reversed(stack))
+
+def _repair(candidate: str) -> str:
+    """Fix the usual LLM JSON mistakes: trailing commas, Python literals, smart quotes"""
+    candidate = candidate.replace("“", '"').replace("”", '"')
+    candidate = TRAILING_COMMA_RE.sub(r"\1", candidate)
+    for python_literal, json_literal in PY_LITERALS.items():
+        candidate = re.sub(rf"(?<=[:\[,\s]){python_literal}(?=\s*[,}}\]])", json_literal, candidate)
+    return candidate
+
+def parse_json_object(text: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Extract a JSON object from an LLM reply; returns (object or None, whether repair was needed)"""
+    if text is None:
+        return None, False
+    try:
+        data = json.loads(text)
+        return (data, False) if isinstance(data, dict) else (None, False)
+    except json.JSONDecodeError:
+        pass
+
+    fenced = FENCE_RE.search(text)
+    body = fenced.group(1) if fenced else text
+    candidate = _balanced_object(body)
+    if candidate is None:
+        return None, True
+    for attempt in (candidate, _repair(candidate)):
+        try:
+            data = json.loads(attempt)
+            if isinstance(data, dict):
+                return data, True
+        except json.JSONDecodeError:
+            continue
+    return None, True
+
+def validate_partial(schema: Type[BaseModel], data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Validate data against schema field by field; returns (valid fields, missing or invalid required fields)"""
+    valid = {}
+    for name in schema.model_fields:
+        if name not in (data or {}):
+            continue
+        try:
+            # Runs the field's type checks and validators without requiring the other fields
+            validated = schema.__pydantic_validator__.validate_assignment(schema.model_construct(), name, data[name])
+            valid[name] = getattr(validated, name)
+        except ValidationError:
+            continue
+    missing = [name for name, field in schema.model_fields.items() if name not in valid and field.is_required()]
+    return valid, missing
+
+def parse_partial_object(text: str) -> Dict[str, Any]:
+    """Top-level fields of a JSON object that are already complete in a streamed prefix"""
+    block, stack, _, last_comma = _scan_object(text or "")
+    if block is None:
+        return {}
+    if not stack:
+        return parse_json_object(block)[0] or {}
+    if last_comma < 0:
+        return {}
+    try:
+        data = json.loads(_repair(block[:last_comma] + "}"))
+    except json.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
@@ -0,0 +1,227 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+# Bucket upper bounds; the last bucket is open-ended
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60, 120)
+TOKEN_BUCKETS = (50, 100, 200, 400, 800, 1600, 3200, 6400, 12800)
+RETRY_BUCKETS = (0, 1, 2, 3, 5)
+
+def _count(value: Any) -> int:
+    """Token counts from a usage object; anything that is not a number counts as 0"""
+    return value if isinstance(value, int) else 0
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        index = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (max for the open bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank and bucket:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "min": self.min or 0.0,
+            "max": self.max or 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {("+inf" if i == len(self.bounds) else f"le_{self.bounds[i]}"): n
+                        for i, n in enumerate(self.buckets)}
+        }
+
+class CallTrace:
+    """What one AIAnalyzer call did, filled in while it runs"""
+
+    def __init__(self, method: str):
+        self.method = method
+        self.model: Optional[str] = None
+        self.started = time.perf_counter()
+        self.latency = 0.0
+        self.requests = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.fallback = False
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add_response(self, model: str, usage: Any, retries: int = 0):
+        """Account one completed LLM request (a re-ask adds a second one)"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        # Requests of a fanned-out call report from several threads
+        with self._lock:
+            self.model = model
+            self.requests += 1
+            self.retries += retries
+            if usage is not None:
+                self.prompt_tokens += _count(getattr(usage, "prompt_tokens", 0))
+                self.completion_tokens += _count(getattr(usage, "completion_tokens", 0))
+                self.cached_tokens += _count(getattr(details, "cached_tokens", 0))
+
+    @property
+    def cache_hit(self) -> bool:
+        """Whether the provider served part of the prompt from its prompt cache"""
+        return self.cached_tokens > 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "model": self.model,
+            "latency": self.latency,
+            "requests": self.requests,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_hit": self.cache_hit,
+            "fallback": self.fallback,
+            "error": self.error
+        }
+
+class CallStats:
+    """Aggregated telemetry for one method and model"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+        self.retry_counts = Histogram(RETRY_BUCKETS)
+
+    def add(self, trace: CallTrace):
+        self.calls += 1
+        self.errors += trace.error is not None
+        self.fallbacks += trace.fallback
+        self.cache_hits += trace.cache_hit
+        self.retries += trace.retries
+        self.latency.observe(trace.latency)
+        self.retry_counts.observe(trace.retries)
+        if trace.requests:
+            self.prompt_tokens.observe(trace.prompt_tokens)
+            self.completion_tokens.observe(trace.completion_tokens)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "fallbacks": self.fallbacks,
+            "cache_hits": self.cache_hits,
+            "retries": self.retries,
+            "latency": self.latency.as_dict(),
+            "prompt_tokens": self.prompt_tokens.as_dict(),
+            "completion_tokens": self.completion_tokens.as_dict(),
+            "retry_counts": self.retry_counts.as_dict()
+        }
+
+class Telemetry:
+    """Per-call LLM telemetry aggregated by method and model, plus a window of recent calls"""
+
+    def __init__(self, recent: int = 500):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: Dict[Tuple[str, str], CallStats] = {}
+        self._recent = deque(maxlen=recent)
+        self.started_at = datetime.now()
+
+    def current(self) -> Optional[CallTrace]:
+        """Trace of the call running in this thread, if any"""
+        return getattr(self._local, "trace", None)
+
+    @contextmanager
+    def trace(self, method: str):
+        """Trace one call; nested traces (a call made by another) are folded into the outer one"""
+        outer = self.current()
+        if outer is not None:
+            yield outer
+            return
+        trace = CallTrace(method)
+        self._local.trace = trace
+        try:
+            yield trace
+        except Exception as e:
+            trace.error = type(e).__name__
+            raise
+        finally:
+            self._local.trace = None
+            trace.latency = time.perf_counter() - trace.started
+            self.record(trace)
+
+    @contextmanager
+    def attach(self, trace: Optional[CallTrace]):
+        """Account work done in this thread to a trace started in another one"""
+        previous = self.current()
+        self._local.trace = trace
+        try:
+            yield trace
+        finally:
+            self._local.trace = previous
+
+    def record(self, trace: CallTrace):
+        with self._lock:
+            key = (trace.method, trace.model or "-")
+            self._stats.setdefault(key, CallStats()).add(trace)
+            self._recent.append(dict(trace.as_dict(), at=datetime.now().isoformat(timespec="seconds")))
+
+    def snapshot(self, recent: bool = False) -> Dict[str, Any]:
+        """Aggregates as a JSON-ready dict, optionally with the recent raw calls"""
+        with self._lock:
+            data = {
+                "since": self.started_at.isoformat(timespec="seconds"),
+                "methods": {f"{method}/{model}": stats.as_dict() for (method, model), stats in sorted(self._stats.items())}
+            }
+            if recent:
+                data["recent"] = list(self._recent)
+        return data
+
+    def dump(self, path: str):
+        """Write the full snapshot, recent calls included, as JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(recent=True), f, ensure_ascii=False, indent=2)
+
+    def format_report(self) -> str:
+        """Short human-readable summary, one line per method and model"""
+        lines: List[str] = []
+        for name, stats in self.snapshot()["methods"].items():
+            latency = stats["latency"]
+            lines.append(
+                f"{name}: {stats['calls']} вызовов, p50 {latency['p50']:.2f}с, p90 {latency['p90']:.2f}с, "
+                f"p99 {latency['p99']:.2f}с, токены {int(stats['prompt_tokens']['sum'])}/{int(stats['completion_tokens']['sum'])}, "
+                f"повторы {stats['retries']}, кэш {stats['cache_hits']}, fallback {stats['fallbacks']}, ошибки {stats['errors']}"
+            )
+        return "\n".join(lines) or "Пока нет вызовов LLM."
@@ -5,18 +5,60 @@
 """
 
 import unittest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 import sys
 import os
+import runpy
 
 # Добавляем текущую директорию в путь для импорта
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from models import Candidate, Interview, Answer, Position, InterviewStatus
-from questions import get_questions_for_position, get_question_by_id
+from models import Candidate, Interview, InterviewSession, Answer, Position, InterviewStatus, InterviewAnalysis
+from questions import get_questions_for_position, get_question_by_id, get_contact_questions_for_position
 from database import Database
-from ai_analyzer import AIAnalyzer
+from ai_analyzer import (
+    AIAnalyzer, ModelRoute, RESUME_INSTRUCTIONS, INTERVIEW_INSTRUCTIONS, ANSWER_QUALITY_INSTRUCTIONS,
+    INTERVIEW_FALLBACK, INTERVIEW_SHARDS, SUMMARY_SHARD_INSTRUCTIONS
+)
 from config import Config
+from answer_scorer import AnswerScorer
+from benchmarks import answer_scorer_agreement, session_memory_benchmark
+from resilience import CircuitBreaker, Hedger
+from prompt_builder import PromptBuilder
+from structured_output import (
+    parse_json_object, parse_partial_object, validate_partial,
+    InterviewAnalysisResult, ResumeAnalysisResult, AnswerQualityResult
+)
+from near_duplicates import NearDuplicateIndex
+from position_matcher import PositionMatcher
+from follow_ups import FollowUpPool
+from telemetry import Histogram
+from batching import MicroBatcher
+from concurrent.futures import ThreadPoolExecutor
+from rescore import rescore_online, export_batch, import_batch
+from webhook import WebhookServer, SECRET_HEADER
+from dispatcher import PerUserUpdateProcessor, update_user_key
+from session_store import SessionPersistence, encode_session, decode_session
+from outbound import PrioritizedRateLimiter
+from digests import HRDigest, DigestEntry, RESULT_CALLBACK_PREFIX
+from log_pipeline import RotatingLogFileHandler, SamplingFilter, parse_sample_rates, setup_logging, stop_logging
+from cluster import RoutingWebhookServer, Supervisor, WorkerLink, raw_update_user_key, worker_for
+from telegram import Update, User
+from telegram.error import RetryAfter
+from telegram.ext import Application, ExtBot, TypeHandler
+from fake_openai import start_fake_server, completion, fake_reply, FakeSettings, LatencyModel
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import httpx
+import openai
 
 class TestHRBot(unittest.TestCase):
     """Тесты для HR-бота"""
@@ -277,6 +319,1862 @@ class TestQuestionContent(unittest.TestCase):
             self.assertIsInstance(question.follow_up_questions, list)
             self.assertLessEqual(len(question.follow_up_questions), 2)  # Максимум 2 уточняющих вопроса
 
+class TestAnswerScorer(unittest.TestCase):
+    """Тесты локальной оценки качества ответов"""
+    
+    def setUp(self):
+        self.scorer = AnswerScorer(low_threshold=0.35, high_threshold=0.55)
+        self.question = get_question_by_id("qa_1")
+    
+    def test_short_answer_needs_follow_up(self):
+        """Короткий ответ требует уточнения без обращения к LLM"""
+        result = self.scorer.score("не знаю", self.question)
+        self.assertTrue(result["needs_follow_up"])
+        self.assertFalse(result["borderline"])
+    
+    def test_detailed_answer_is_accepted(self):
+        """Подробный конкретный ответ не требует уточнения"""
+        answer = ("У меня 3 года опыта в тестировании веб-приложений. Тестировал e-commerce платформы "
+                  "и банковские системы, например интернет-банк. Использовал Jira, Postman и Selenium, "
+                  "нашел более 500 багов.")
+        result = self.scorer.score(answer, self.question)
+        self.assertFalse(result["needs_follow_up"])
+        self.assertGreater(result["relevance"], 0.5)
+    
+    def test_agreement_benchmark(self):
+        """Бенчмарк согласия считает только локальные решения"""
+        records = [
+            {"question_id": "qa_1", "answer": "не знаю", "needs_follow_up": True},
+            {"question_id": "qa_1", "answer": "не знаю", "needs_follow_up": False},
+            {"question_id": "missing", "answer": "текст", "needs_follow_up": True},
+        ]
+        report = answer_scorer_agreement(records, self.scorer)
+        self.assertEqual(report["decided_locally"], 2)
+        self.assertEqual(report["skipped"], 1)
+        self.assertAlmostEqual(report["local_agreement"], 0.5)
+
+class TestModelRouting(unittest.TestCase):
+    """Тесты маршрутизации методов AI-анализатора по моделям"""
+    
+    def make_response(self, content, prompt_tokens=100, completion_tokens=20):
+        response = MagicMock()
+        response.choices[0].message.content = content
+        response.usage.prompt_tokens = prompt_tokens
+        response.usage.completion_tokens = completion_tokens
+        return response
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_methods_use_their_route(self, mock_openai):
+        """Каждый метод вызывает модель своего маршрута"""
+        client = mock_openai.return_value
+        client.chat.completions.create.return_value = self.make_response('{"needs_follow_up": false}')
+        analyzer = AIAnalyzer(routes={
+            "check_answer_quality": ModelRoute(model="fast-model", timeout=3, max_tokens=50)
+        })
+        
+        analyzer.check_answer_quality("ответ", "вопрос")
+        
+        kwargs = client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs["model"], "fast-model")
+        self.assertLessEqual(kwargs["timeout"], 3)
+        self.assertEqual(kwargs["max_tokens"], 50)
+        self.assertEqual(analyzer.routes["analyze_interview"].model, Config.HEAVY_MODEL)
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_route_stats(self, mock_openai):
+        """Учет вызовов, ошибок и токенов по маршрутам"""
+        client = mock_openai.return_value
+        client.chat.completions.create.side_effect = [
+            self.make_response("Сколько лет опыта?", 80, 10),
+            Exception("provider down")
+        ]
+        analyzer = AIAnalyzer()
+        
+        analyzer.generate_follow_up_question("вопрос", "ответ", ["Сколько лет опыта?"])
+        analyzer.generate_follow_up_question("вопрос", "ответ", ["Сколько лет опыта?"])
+        
+        stats = analyzer.get_route_stats()["generate_follow_up_question"]
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["prompt_tokens"], 80)
+        self.assertEqual(stats["completion_tokens"], 10)
+
+class TestResilience(unittest.TestCase):
+    """Тесты повторов и автоматического выключателя LLM-вызовов"""
+    
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: self.now)
+    
+    def timeout_error(self):
+        return openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    
+    def test_breaker_opens_and_recovers(self):
+        """Выключатель размыкается после серии ошибок и пропускает пробный вызов после паузы"""
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        
+        self.now = 11
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # only one trial call in half-open state
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+    
+    @patch('ai_analyzer.time.sleep')
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_retry_then_success(self, mock_openai, mock_sleep):
+        """Повтор после таймаута возвращает результат модели"""
+        response = MagicMock()
+        response.choices[0].message.content = '{"needs_follow_up": true}'
+        mock_openai.return_value.chat.completions.create.side_effect = [self.timeout_error(), response]
+        
+        result = AIAnalyzer().check_answer_quality("ответ", "вопрос")
+        
+        self.assertTrue(result["needs_follow_up"])
+        self.assertEqual(mock_sleep.call_count, 1)
+    
+    @patch('ai_analyzer.time.sleep')
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_open_breaker_uses_fallback(self, mock_openai, mock_sleep):
+        """При разомкнутом выключателе сразу возвращается запасной ответ"""
+        client = mock_openai.return_value
+        client.chat.completions.create.side_effect = self.timeout_error()
+        analyzer = AIAnalyzer()
+        analyzer.breaker = self.breaker
+        
+        for _ in range(2):
+            analyzer.check_answer_quality("ответ", "вопрос")
+        calls = client.chat.completions.create.call_count
+        result = analyzer.check_answer_quality("ответ", "вопрос")
+        
+        self.assertEqual(client.chat.completions.create.call_count, calls)
+        self.assertEqual(result["reason"], "Ошибка анализа")
+        self.assertEqual(analyzer.get_breaker_state()["state"], CircuitBreaker.OPEN)
+
+class TestHedging(unittest.TestCase):
+    """Тесты дублирующих запросов для сокращения хвоста задержек"""
+    
+    def test_hedge_budget(self):
+        """Дублирование не превышает бюджет и ждет накопления статистики"""
+        hedger = Hedger(percentile=95, budget=0.5, min_samples=4)
+        self.assertIsNone(hedger.hedge_delay())
+        for latency in (0.1, 0.2, 0.3, 0.4):
+            hedger.record_latency(latency)
+        self.assertEqual(hedger.hedge_delay(), 0.4)
+        self.assertTrue(hedger.try_hedge())
+        self.assertFalse(hedger.try_hedge())
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_backup_request_wins(self, mock_openai):
+        """Если первый запрос медленный, используется ответ дублирующего"""
+        fast = MagicMock()
+        fast.choices[0].message.content = "Быстрый вопрос?"
+        slow = MagicMock()
+        slow.choices[0].message.content = "Медленный вопрос?"
+        release = threading.Event()
+        calls = []
+        
+        def create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                release.wait(2)
+                return slow
+            return fast
+        
+        mock_openai.return_value.chat.completions.create.side_effect = create
+        analyzer = AIAnalyzer()
+        analyzer.hedging = True
+        hedger = Hedger(budget=1.0, min_samples=1)
+        hedger.record_latency(0.01)
+        analyzer.hedgers["generate_follow_up_question"] = hedger
+        
+        question = analyzer.generate_follow_up_question("вопрос", "ответ", [])
+        release.set()
+        
+        self.assertEqual(question, "Быстрый вопрос?")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(hedger.as_dict()["hedge_wins"], 1)
+        # The backup's latency feeds the hedge delay too
+        self.assertGreaterEqual(hedger.as_dict()["samples"], 2)
+
+class TestPromptBuilder(unittest.TestCase):
+    """Тесты сборки промптов с бюджетом токенов"""
+    
+    def setUp(self):
+        self.builder = PromptBuilder()
+    
+    def test_static_prefix_first(self):
+        """Инструкции идут первыми и не зависят от содержимого"""
+        first = self.builder.build("Инструкции", "Резюме 1", 100)
+        second = self.builder.build("Инструкции", "Резюме 2", 100)
+        self.assertEqual(first.messages[0], second.messages[0])
+        self.assertEqual(first.messages[-1]["content"], "Резюме 1")
+        self.assertFalse(first.truncated)
+    
+    def test_long_content_fits_budget(self):
+        """Слишком длинное резюме обрезается до бюджета с сохранением начала и конца"""
+        resume = "Начало резюме. " + " ".join(f"навык{i}" for i in range(3000)) + " Конец резюме."
+        prompt = self.builder.build("Инструкции", resume, 200)
+        self.assertTrue(prompt.truncated)
+        self.assertLessEqual(prompt.content_tokens, 200)
+        self.assertTrue(prompt.messages[-1]["content"].startswith("Начало резюме."))
+        self.assertTrue(prompt.messages[-1]["content"].endswith("Конец резюме."))
+    
+    def test_sections_share_budget(self):
+        """Короткие ответы сохраняются целиком, длинный ответ обрезается"""
+        sections = ["Вопрос 1: да", "Вопрос 2: " + "очень длинный ответ " * 500, "Вопрос 3: нет"]
+        fitted = self.builder.fit_sections(sections, 300)
+        self.assertEqual(fitted[0], sections[0])
+        self.assertEqual(fitted[2], sections[2])
+        self.assertLessEqual(sum(self.builder.count_tokens(section) for section in fitted), 300)
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_analyzer_sends_system_prefix(self, mock_openai):
+        """AI-анализатор отправляет статичные инструкции системным сообщением"""
+        response = MagicMock()
+        response.choices[0].message.content = '{"experience_level": "middle"}'
+        mock_openai.return_value.chat.completions.create.return_value = response
+        analyzer = AIAnalyzer()
+        
+        analyzer.analyze_resume("Опыт работы 5 лет", Position.QA)
+        
+        messages = mock_openai.return_value.chat.completions.create.call_args.kwargs["messages"]
+        self.assertEqual(messages[0]["role"], "system")
+        self.assertNotIn("Опыт работы 5 лет", messages[0]["content"])
+        self.assertIn("Опыт работы 5 лет", messages[1]["content"])
+        self.assertGreater(analyzer.get_route_stats()["analyze_resume"]["local_prompt_tokens"], 0)
+
+class TestStructuredOutput(unittest.TestCase):
+    """Тесты разбора и проверки структурированных ответов модели"""
+    
+    def make_response(self, content):
+        response = MagicMock()
+        response.choices[0].message.content = content
+        return response
+    
+    def test_parse_repairs_common_mistakes(self):
+        """Код-блоки, поясняющий текст, висячие запятые и обрыв ответа исправляются локально"""
+        self.assertEqual(parse_json_object('```json\n{"a": 1,}\n```'), ({"a": 1}, True))
+        self.assertEqual(parse_json_object('Результат: {"ok": True} — готово')[0], {"ok": True})
+        self.assertEqual(parse_json_object('{"summary": "обрыв')[0], {"summary": "обрыв"})
+        self.assertEqual(parse_json_object('{"a": 1}'), ({"a": 1}, False))
+        self.assertIsNone(parse_json_object("нет json")[0])
+    
+    def test_validate_partial(self):
+        """Корректные поля сохраняются, некорректные считаются отсутствующими"""
+        valid, missing = validate_partial(InterviewAnalysisResult, {
+            "overall_score": 8.5, "hr_recommendation": "maybe", "summary": "Кратко"
+        })
+        self.assertEqual(valid["overall_score"], 0.85)
+        self.assertIn("hr_recommendation", missing)
+        self.assertNotIn("summary", missing)
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_reask_only_missing_fields(self, mock_openai):
+        """Повторный запрос просит только недостающие поля"""
+        create = mock_openai.return_value.chat.completions.create
+        create.side_effect = [
+            self.make_response('```json\n{"completeness": 0.4, "specificity": 0.3, "relevance": 0.9}\n```'),
+            self.make_response('{"needs_follow_up": true}')
+        ]
+        analyzer = AIAnalyzer()
+        
+        result = analyzer.check_answer_quality("ответ", "вопрос")
+        
+        self.assertTrue(result["needs_follow_up"])
+        self.assertEqual(result["completeness"], 0.4)
+        self.assertIn("needs_follow_up", create.call_args.kwargs["messages"][-1]["content"])
+        self.assertEqual(create.call_args.kwargs["response_format"], {"type": "json_object"})
+        self.assertEqual(analyzer.get_route_stats()["check_answer_quality"]["parse_outcomes"]["reasked"], 1)
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_wasted_call_rate(self, mock_openai):
+        """Бесполезный ответ учитывается как потраченный впустую вызов"""
+        mock_openai.return_value.chat.completions.create.return_value = self.make_response("Извините, не могу.")
+        analyzer = AIAnalyzer()
+        
+        result = analyzer.analyze_resume("резюме", Position.SALES)
+        
+        self.assertEqual(result["experience_level"], "unknown")
+        self.assertEqual(analyzer.get_route_stats()["analyze_resume"]["wasted_rate"], 1.0)
+
+class TestStreamingResumeAnalysis(unittest.TestCase):
+    """Тесты потокового анализа резюме"""
+    
+    REPLY = '{"experience_years": "5", "key_skills": ["Jira", "SQL"], "experience_level": "middle", "summary": "QA"}'
+    
+    def test_partial_object_reports_complete_fields(self):
+        """Из префикса ответа извлекаются только завершенные поля"""
+        self.assertEqual(parse_partial_object('{"experience_years": "5", "key_skills": ["Ji'), {"experience_years": "5"})
+        self.assertEqual(parse_partial_object('{"experience_ye'), {})
+        self.assertEqual(parse_partial_object(self.REPLY)["summary"], "QA")
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_stream_updates_fields(self, mock_openai):
+        """Поля передаются по мере поступления токенов"""
+        chunks = []
+        for i in range(0, len(self.REPLY), 7):
+            chunk = MagicMock()
+            chunk.usage = None
+            chunk.choices[0].delta.content = self.REPLY[i:i + 7]
+            chunks.append(chunk)
+        mock_openai.return_value.chat.completions.create.return_value = iter(chunks)
+        updates = []
+        
+        result = AIAnalyzer().analyze_resume_stream("резюме", Position.QA, lambda fields: updates.append(list(fields)))
+        
+        self.assertEqual(updates[0], ["experience_years"])
+        self.assertEqual(updates[-1], ["experience_years", "key_skills", "experience_level", "summary"])
+        self.assertEqual(result["key_skills"], ["Jira", "SQL"])
+        self.assertTrue(mock_openai.return_value.chat.completions.create.call_args_list[0].kwargs["stream"])
+    
+    def chunks(self):
+        chunks = []
+        for i in range(0, len(self.REPLY), 7):
+            chunk = MagicMock()
+            chunk.usage = None
+            chunk.choices[0].delta.content = self.REPLY[i:i + 7]
+            chunks.append(chunk)
+        return chunks
+    
+    @patch('ai_analyzer.time.sleep')
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_stream_retries_and_drops_json_mode(self, mock_openai, mock_sleep):
+        """Поток повторяется после таймаута и переходит на обычный режим, если JSON-режим не поддерживается"""
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        no_json = openai.BadRequestError("response_format is not supported", response=httpx.Response(400, request=request), body=None)
+        create = mock_openai.return_value.chat.completions.create
+        create.side_effect = [openai.APITimeoutError(request=request), no_json, iter(self.chunks())]
+        analyzer = AIAnalyzer()
+        
+        result = analyzer.analyze_resume_stream("резюме", Position.QA, lambda fields: None)
+        
+        self.assertEqual(result["experience_level"], "middle")
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertIn("response_format", create.call_args_list[1].kwargs)
+        self.assertNotIn("response_format", create.call_args_list[2].kwargs)
+        self.assertTrue(create.call_args_list[2].kwargs["stream"])
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_stream_deadline_covers_whole_stream(self, mock_openai):
+        """Медленный поток прерывается по общему дедлайну, а не по таймауту чтения"""
+        def slow_stream():
+            for chunk in self.chunks():
+                time.sleep(0.02)
+                yield chunk
+        mock_openai.return_value.chat.completions.create.side_effect = lambda **kwargs: slow_stream()
+        analyzer = AIAnalyzer(routes={"analyze_resume": ModelRoute(model="fast", timeout=0.05, max_tokens=100)})
+        
+        result = analyzer.analyze_resume_stream("резюме", Position.QA, lambda fields: None)
+        
+        self.assertEqual(result["summary"], "Ошибка анализа резюме")
+        self.assertEqual(analyzer.get_breaker_state()["consecutive_failures"], 1)
+
+class TestRescoring(unittest.TestCase):
+    """Тесты повторной оценки интервью"""
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp_dir.name, "rescore.db"))
+        self.interview_ids = []
+        for user_id in (1, 2, 3):
+            interview = Interview(candidate_id=user_id, position=Position.QA, status=InterviewStatus.COMPLETED)
+            interview_id = self.db.save_interview(interview)
+            self.db.save_answer(interview_id, Answer(question_id="qa_1", answer_text="Тестировал API и UI"))
+            self.interview_ids.append(interview_id)
+        self.db.save_interview(Interview(candidate_id=4, position=Position.QA))
+        
+        self.server, base_url = start_fake_server()
+        with patch.object(Config, "OPENAI_API_KEY", "test"), patch.object(Config, "OPENAI_BASE_URL", base_url):
+            self.analyzer = AIAnalyzer()
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+    
+    def test_online_rescoring_is_resumable(self):
+        """Оцениваются только завершенные интервью, повторный запуск ничего не дублирует"""
+        checkpoint = os.path.join(self.tmp_dir.name, "rescore.ckpt")
+        
+        stats = rescore_online(self.db, self.analyzer, "v2", concurrency=2, checkpoint=checkpoint)
+        
+        self.assertEqual(stats, {"scored": 3, "failed": 0})
+        self.assertEqual(self.db.get_analyzed_interview_ids("v2"), set(self.interview_ids))
+        with open(checkpoint, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["last_id"], self.interview_ids[-1])
+        self.assertEqual(rescore_online(self.db, self.analyzer, "v2", checkpoint=checkpoint)["scored"], 0)
+        self.assertEqual(rescore_online(self.db, self.analyzer, "v3", limit=1)["scored"], 1)
+        # A finished v2 checkpoint must not make a v3 run skip everything
+        self.assertEqual(rescore_online(self.db, self.analyzer, "v3", checkpoint=checkpoint)["scored"], 2)
+    
+    def test_batch_file_round_trip(self):
+        """Batch-файл выгружается и результаты загружаются с меткой версии"""
+        requests_path = os.path.join(self.tmp_dir.name, "batch.jsonl")
+        results_path = os.path.join(self.tmp_dir.name, "results.jsonl")
+        
+        self.assertEqual(export_batch(self.db, self.analyzer, "v2", requests_path), 3)
+        replies = {}
+        with open(requests_path, encoding="utf-8") as src, open(results_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                request = json.loads(line)
+                body = completion(request["body"])
+                replies[request["custom_id"]] = json.loads(body["choices"][0]["message"]["content"])
+                result = {"custom_id": request["custom_id"], "error": None,
+                          "response": {"status_code": 200, "body": body}}
+                dst.write(json.dumps(result, ensure_ascii=False) + "\n")
+        
+        self.assertEqual(import_batch(self.db, self.analyzer, "v2", results_path)["scored"], 3)
+        self.assertEqual(import_batch(self.db, self.analyzer, "v2", results_path)["skipped"], 3)
+        expected = replies[f"interview-{self.interview_ids[0]}"]["hr_recommendation"]
+        self.assertEqual(self.db.get_candidate_analysis(1).hr_recommendation, expected)
+
+class TestNearDuplicates(unittest.TestCase):
+    """Тесты индекса почти-дубликатов ответов"""
+    
+    COPIED = "Тест-кейс содержит предусловия, шаги воспроизведения, ожидаемый результат и фактический результат проверки"
+    
+    def test_index_finds_near_duplicates_per_question(self):
+        """Слегка измененная копия находится, другой вопрос и другой текст - нет"""
+        index = NearDuplicateIndex()
+        index.add("qa_3", 1, self.COPIED)
+        index.add("qa_3", 2, "Я пишу чек-листы в Confluence и веду баги в Jira с приоритетами")
+        index.add("qa_4", 3, self.COPIED)
+        
+        nearest = index.query("qa_3", self.COPIED.replace("проверки", "теста"))
+        
+        self.assertEqual([key for key, _ in nearest], [1])
+        self.assertGreater(nearest[0][1], 0.6)
+        self.assertEqual(index.originality("qa_3", "Автоматизирую регресс на pytest и Selenium"), 1.0)
+        self.assertEqual(index.query("qa_3", self.COPIED)[0][1], 1.0)
+    
+    def test_database_updates_index_on_save(self):
+        """Новые ответы сразу попадают в индекс, свои ответы не считаются дубликатами"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = Database(os.path.join(tmp_dir, "duplicates.db"))
+            first = db.save_interview(Interview(candidate_id=1, position=Position.QA))
+            db.save_answer(first, Answer(question_id="qa_3", answer_text=self.COPIED))
+            self.assertEqual(db.get_answers_originality(first), 1.0)
+            
+            second = db.save_interview(Interview(candidate_id=2, position=Position.QA))
+            db.save_answer(second, Answer(question_id="qa_3", answer_text=self.COPIED))
+            
+            self.assertEqual(db.get_answers_originality(second), 0.0)
+            self.assertEqual(len(db.find_similar_answers("qa_3", self.COPIED, exclude_interview_id=second)), 1)
+            self.assertEqual(len(Database(db.db_path).get_duplicate_index()), 2)
+            # The original author keeps their score once others copy them
+            self.assertEqual(db.get_answers_originality(first), 1.0)
+
+class TestPositionMatcher(unittest.TestCase):
+    """Тесты локального сопоставления резюме с позицией"""
+    
+    QA_RESUME = "Тестировщик, 3 года. Функциональное и регрессионное тестирование, тест-кейсы в TestRail, баги в Jira, API в Postman, SQL"
+    SALES_RESUME = "Менеджер по продажам B2B. Работа с клиентами, холодные звонки, воронка продаж в CRM, выполнение плана, работа с возражениями"
+    
+    def test_resume_matches_its_position(self):
+        """Резюме тестировщика ближе к QA, резюме продавца - к продажам"""
+        matcher = PositionMatcher()
+        
+        qa_scores = matcher.match(self.QA_RESUME)
+        sales_scores = matcher.match(self.SALES_RESUME)
+        
+        self.assertGreater(qa_scores[Position.QA], qa_scores[Position.SALES])
+        self.assertGreater(sales_scores[Position.SALES], sales_scores[Position.QA])
+        self.assertEqual(list(matcher.match(self.QA_RESUME, Position.QA)), [Position.QA])
+    
+    def test_top_resumes_from_database(self):
+        """Сохраненные резюме ранжируются по позиции, повторное сохранение не дублирует"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = Database(os.path.join(tmp_dir, "matcher.db"))
+            db.save_candidate(Candidate(user_id=1, first_name="Анна", last_name="QA", resume_text=self.QA_RESUME))
+            self.assertEqual(len(db.get_position_matcher()), 1)
+            db.save_candidate(Candidate(user_id=2, first_name="Иван", last_name="Sales", resume_text=self.SALES_RESUME))
+            db.save_candidate(Candidate(user_id=2, first_name="Иван", last_name="Sales", resume_text=self.SALES_RESUME))
+            
+            top_qa = db.get_top_resumes(Position.QA, k=2)
+            
+            self.assertEqual(len(db.get_position_matcher()), 2)
+            self.assertEqual([candidate.user_id for candidate, _ in top_qa], [1, 2])
+            self.assertEqual(db.get_top_resumes(Position.SALES, k=1)[0][0].user_id, 2)
+    
+    def test_unchanged_resume_is_not_reindexed(self):
+        """Повторное сохранение кандидата с тем же резюме не заставляет заново векторизовать его"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = Database(os.path.join(tmp_dir, "matcher.db"))
+            db.save_candidate(Candidate(user_id=1, first_name="Анна", resume_text=self.QA_RESUME))
+            matcher = db.get_position_matcher()
+            matcher.add_resume = MagicMock(wraps=matcher.add_resume)
+
+            db.save_candidate(Candidate(user_id=1, first_name="Анна", phone="+79991234567", resume_text=self.QA_RESUME))
+            db.get_position_matcher()
+            matcher.add_resume.assert_not_called()
+            db.save_candidate(Candidate(user_id=1, first_name="Анна", resume_text=self.SALES_RESUME))
+            db.get_position_matcher()
+
+        matcher.add_resume.assert_called_once_with(1, self.SALES_RESUME)
+
+    def test_indexes_see_other_workers_writes(self):
+        """Резюме и ответы, сохраненные другим процессом над той же базой, попадают в индексы"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "shared.db")
+            worker_a, worker_b = Database(path), Database(path)
+            self.assertEqual(len(worker_a.get_position_matcher()), 0)
+            self.assertEqual(len(worker_a.get_duplicate_index()), 0)
+            
+            worker_b.save_candidate(Candidate(user_id=2, first_name="Иван", resume_text=self.SALES_RESUME))
+            first = worker_b.save_interview(Interview(candidate_id=2, position=Position.QA))
+            worker_b.save_answer(first, Answer(question_id="qa_3", answer_text=TestNearDuplicates.COPIED))
+            second = worker_a.save_interview(Interview(candidate_id=1, position=Position.QA))
+            worker_a.save_answer(second, Answer(question_id="qa_3", answer_text=TestNearDuplicates.COPIED))
+            
+            self.assertEqual(worker_a.get_top_resumes(Position.SALES, k=1)[0][0].user_id, 2)
+            self.assertEqual(worker_a.get_answers_originality(second), 0.0)
+            self.assertEqual(len(worker_a.get_duplicate_index()), 2)
+
+class TestFollowUps(unittest.IsolatedAsyncioTestCase):
+    """Тесты готового пула и спекулятивной генерации уточняющих вопросов"""
+    
+    def setUp(self):
+        from bot import HRBot
+        with patch('bot.Database'), patch('bot.AIAnalyzer'), patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+            self.bot = HRBot()
+        self.question = get_question_by_id("qa_1")
+    
+    def test_pool_asks_about_what_the_answer_misses(self):
+        """Из пула выбирается вопрос о том, чего нет в ответе"""
+        pool = FollowUpPool([self.question])
+        
+        follow_up = pool.select(self.question, "У меня 5 лет опыта в тестировании")
+        
+        self.assertEqual(follow_up, "Какие типы проектов вам больше всего нравятся?")
+        self.assertIsNone(pool.select(self.question, "", exclude=self.question.follow_up_questions))
+    
+    def test_pool_round_trip(self):
+        """Выведенные офлайн вопросы сохраняются и загружаются вместе с банком вопросов"""
+        pool = FollowUpPool([self.question])
+        pool.add("qa_1", "Какой проект был самым сложным?")
+        pool.add("qa_1", "какой проект был самым сложным?")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "pool.json")
+            pool.save(path)
+            
+            loaded = FollowUpPool.load(path, [self.question])
+        
+        self.assertEqual(loaded.get("qa_1"), self.question.follow_up_questions + ["Какой проект был самым сложным?"])
+    
+    async def test_ready_llm_follow_up_wins(self):
+        """Готовый ответ LLM используется сразу"""
+        speculative = asyncio.get_running_loop().create_future()
+        speculative.set_result("Какой баг вы нашли последним?")
+        
+        result = await self.bot.choose_follow_up(self.question, "Тестирую веб", speculative)
+        
+        self.assertEqual(result, ("Какой баг вы нашли последним?", "llm"))
+    
+    async def test_pool_serves_while_llm_is_pending(self):
+        """Пока LLM думает, вопрос берется из пула; поздний ответ для чужого ответа в пул не попадает"""
+        speculative = asyncio.get_running_loop().create_future()
+        
+        follow_up, source = await self.bot.choose_follow_up(self.question, "Тестирую веб", speculative)
+        speculative.set_result("Какой баг вы нашли последним?")
+        await asyncio.sleep(0)
+        
+        self.assertEqual(source, "pool")
+        self.assertIn(follow_up, self.question.follow_up_questions)
+        self.assertNotIn("Какой баг вы нашли последним?", self.bot.follow_up_pool.get("qa_1"))
+        self.assertEqual(self.bot.follow_up_pool.as_dict()["pool"], 1)
+    
+    async def test_no_speculative_call_without_grace_period(self):
+        """Без времени ожидания LLM-вопрос не запрашивается: его результат не был бы использован"""
+        self.bot.ai_analyzer.generate_follow_up_question.return_value = "Какой баг вы нашли последним?"
+        self.bot.answer_scorer = MagicMock()
+        self.bot.answer_scorer.score.return_value = {"needs_follow_up": True, "borderline": False}
+        session = InterviewSession(1, 42, Position.QA, current_question_index=get_questions_for_position(Position.QA).index(self.question))
+        self.bot.active_interviews[42] = session
+        update = MagicMock()
+        update.effective_user.id = 42
+        update.message.reply_text = AsyncMock()
+        context = MagicMock()
+        context.user_data = {}
+        
+        for grace, calls in ((0, 0), (0.5, 1)):
+            with patch.object(Config, "FOLLOW_UP_LLM_GRACE_SECONDS", grace):
+                await self.bot.handle_answer(update, context, "Тестирую веб")
+            self.assertEqual(self.bot.ai_analyzer.generate_follow_up_question.call_count, calls)
+
+    async def test_answer_is_scored_only_when_it_decides_the_follow_up(self):
+        """Ответ оценивается только тогда, когда от оценки зависит, будет ли уточняющий вопрос"""
+        self.bot.answer_scorer = MagicMock()
+        self.bot.answer_scorer.score.return_value = {"needs_follow_up": False, "borderline": True}
+        self.bot.ai_analyzer.check_answer_quality.return_value = {"needs_follow_up": False}
+        questions = get_questions_for_position(Position.QA)
+        update = MagicMock()
+        update.effective_user.id = 42
+        update.message.reply_text = AsyncMock()
+        context = MagicMock()
+        context.user_data = {}
+        
+        with patch.object(Config, "MAX_FOLLOW_UP_QUESTIONS", 2), patch.object(Config, "SPECULATIVE_FOLLOW_UPS", False), \
+                patch.object(self.bot, "ask_next_question", AsyncMock()):
+            for follow_ups, scored in ((0, 0), (2, 0), (1, 1)):
+                self.bot.active_interviews[42] = InterviewSession(1, 42, Position.QA, follow_up_count=follow_ups,
+                                                                  current_question_index=questions.index(self.question))
+                await self.bot.handle_answer(update, context, "Тестирую веб")
+                self.assertEqual(self.bot.answer_scorer.score.call_count, scored)
+                self.assertEqual(self.bot.ai_analyzer.check_answer_quality.call_count, scored)
+
+class TestFakeOpenAI(unittest.TestCase):
+    """Тесты локального OpenAI-совместимого сервера"""
+    
+    def start(self, **settings) -> AIAnalyzer:
+        self.server, base_url = start_fake_server(settings=FakeSettings(seed=1, **settings))
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        with patch.object(Config, "OPENAI_API_KEY", "test"), patch.object(Config, "OPENAI_BASE_URL", base_url):
+            return AIAnalyzer()
+    
+    def test_replies_match_schemas(self):
+        """Ответы на каждый промпт проходят валидацию схем"""
+        for instructions, schema in ((RESUME_INSTRUCTIONS, ResumeAnalysisResult),
+                                     (INTERVIEW_INSTRUCTIONS, InterviewAnalysisResult),
+                                     (ANSWER_QUALITY_INSTRUCTIONS, AnswerQualityResult)):
+            messages = [{"role": "system", "content": instructions}, {"role": "user", "content": "текст"}]
+            schema.model_validate_json(fake_reply(messages))
+    
+    def test_analyzer_talks_to_fake_server(self):
+        """Анализатор работает через base URL, включая потоковый режим"""
+        analyzer = self.start(latency="uniform:1-5")
+        
+        quality = analyzer.check_answer_quality("Пишу тест-кейсы", "Как вы тестируете?")
+        fields = []
+        resume = analyzer.analyze_resume_stream("QA, 3 года", Position.QA, lambda partial: fields.append(len(partial)))
+        
+        self.assertIn("completeness", quality)
+        self.assertEqual(resume["key_skills"], ["Коммуникация", "CRM", "Jira"])
+        self.assertGreater(len(fields), 1)
+        self.assertEqual(analyzer.get_route_stats()["check_answer_quality"]["parse_outcomes"]["ok"], 1)
+        self.assertEqual(dict(self.server.settings.stats), {"completed": 1, "streamed": 1})
+    
+    def test_injected_rate_limits(self):
+        """Доля 429 настраивается, анализатор получает RateLimitError"""
+        analyzer = self.start(rate_limit_rate=1.0)
+        
+        with self.assertRaises(openai.RateLimitError):
+            analyzer.client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "x"}])
+        self.assertEqual(self.server.settings.stats["rate_limited"], 1)
+    
+    def test_latency_models(self):
+        """Распределения задержки воспроизводимы при фиксированном зерне"""
+        self.assertEqual(LatencyModel("fixed:250").sample(random.Random(1)), 0.25)
+        uniform = LatencyModel("uniform:100-200").sample(random.Random(1))
+        self.assertTrue(0.1 <= uniform <= 0.2)
+        self.assertEqual(LatencyModel("lognormal:300,0.5").sample(random.Random(3)),
+                         LatencyModel("lognormal:300,0.5").sample(random.Random(3)))
+        with self.assertRaises(ValueError):
+            LatencyModel("pareto:1")
+
+class TestTelemetry(unittest.TestCase):
+    """Тесты телеметрии LLM-вызовов"""
+    
+    def make_response(self, content, cached_tokens=0):
+        response = MagicMock()
+        response.choices[0].message.content = content
+        response.usage.prompt_tokens = 300
+        response.usage.completion_tokens = 40
+        response.usage.prompt_tokens_details.cached_tokens = cached_tokens
+        return response
+    
+    def test_histogram_quantiles(self):
+        """Квантили берутся по границам корзин"""
+        histogram = Histogram((1, 2, 5))
+        for value in (0.5, 0.7, 1.5, 4, 9):
+            histogram.observe(value)
+        
+        stats = histogram.as_dict()
+        
+        self.assertEqual(stats["count"], 5)
+        self.assertEqual(stats["p50"], 2)
+        self.assertEqual(stats["p99"], 9)
+        self.assertEqual(stats["buckets"], {"le_1": 2, "le_2": 1, "le_5": 1, "+inf": 1})
+    
+    @patch('ai_analyzer.time.sleep')
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_calls_are_recorded(self, mock_openai, mock_sleep):
+        """Записываются модель, токены, повторы, попадания в кэш и запасные ответы"""
+        timeout = openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        mock_openai.return_value.chat.completions.create.side_effect = [
+            timeout, self.make_response('{"completeness": 0.5, "specificity": 0.5, "relevance": 0.5, "needs_follow_up": false}', 256),
+            self.make_response("не JSON")
+        ]
+        analyzer = AIAnalyzer()
+        
+        analyzer.check_answer_quality("ответ", "вопрос")
+        analyzer.analyze_resume("резюме", Position.QA)
+        
+        telemetry = analyzer.get_telemetry()["methods"]
+        quality = telemetry[f"check_answer_quality/{Config.FAST_MODEL}"]
+        self.assertEqual((quality["calls"], quality["retries"], quality["cache_hits"], quality["fallbacks"]), (1, 1, 1, 0))
+        self.assertEqual(quality["prompt_tokens"]["sum"], 300)
+        self.assertEqual(telemetry[f"analyze_resume/{Config.FAST_MODEL}"]["fallbacks"], 1)
+        self.assertIn("check_answer_quality", analyzer.telemetry.format_report())
+    
+    @patch('ai_analyzer.time.sleep')
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_provider_errors_are_counted(self, mock_openai, mock_sleep):
+        """Ошибка провайдера учитывается, даже если пользователь получил запасной ответ"""
+        mock_openai.return_value.chat.completions.create.side_effect = openai.APIConnectionError(
+            request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        analyzer = AIAnalyzer()
+        
+        question = analyzer.generate_follow_up_question("Вопрос", "Ответ", ["Пример?"])
+        
+        stats = analyzer.get_telemetry()["methods"][f"generate_follow_up_question/{Config.FAST_MODEL}"]
+        self.assertEqual(question, "Пример?")
+        self.assertEqual((stats["errors"], stats["fallbacks"]), (1, 1))
+        self.assertIn("ошибки 1", analyzer.telemetry.format_report())
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_dump_contains_recent_calls(self, mock_openai):
+        """Выгрузка JSON содержит агрегаты и последние вызовы"""
+        mock_openai.return_value.chat.completions.create.return_value = self.make_response("Какой пример?")
+        analyzer = AIAnalyzer()
+        analyzer.generate_follow_up_question("Вопрос", "Ответ", [])
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "telemetry.json")
+            analyzer.telemetry.dump(path)
+            with open(path, encoding="utf-8") as f:
+                dump = json.load(f)
+        
+        self.assertEqual(dump["recent"][0]["method"], "generate_follow_up_question")
+        self.assertEqual(dump["recent"][0]["completion_tokens"], 40)
+
+class TestMicroBatching(unittest.TestCase):
+    """Тесты объединения проверок качества ответов в пакеты"""
+    
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+    
+    def test_batcher_scatters_results(self):
+        """Одновременные элементы уходят одним пакетом, каждый получает свой результат"""
+        batches = []
+        batcher = MicroBatcher(lambda items: batches.append(items) or [item * 2 for item in items],
+                               self.executor, max_batch=10, max_wait=0.2)
+        
+        futures = [batcher.submit(i) for i in range(5)]
+        
+        self.assertEqual([future.result(timeout=2) for future in futures], [0, 2, 4, 6, 8])
+        self.assertEqual(batches, [[0, 1, 2, 3, 4]])
+        self.assertEqual(batcher.as_dict()["avg_batch_size"], 5)
+    
+    def test_batcher_respects_max_batch_and_errors(self):
+        """Пакет ограничен по размеру, ошибка пакета передается всем ожидающим"""
+        def process(items):
+            raise RuntimeError("boom")
+        batcher = MicroBatcher(process, self.executor, max_batch=2, max_wait=0.2)
+        
+        futures = [batcher.submit(i) for i in range(3)]
+        
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=2)
+        self.assertEqual(batcher.as_dict()["batches"], 2)
+    
+    def test_concurrent_checks_share_requests(self):
+        """Проверки качества от разных кандидатов идут одним запросом к модели"""
+        server, base_url = start_fake_server(settings=FakeSettings(latency="fixed:20"))
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with patch.object(Config, "OPENAI_API_KEY", "test"), patch.object(Config, "OPENAI_BASE_URL", base_url), \
+                patch.object(Config, "LLM_BATCH_QUALITY_CHECKS", True), patch.object(Config, "LLM_BATCH_MAX_WAIT_MS", 200):
+            analyzer = AIAnalyzer()
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                results = list(pool.map(lambda i: analyzer.check_answer_quality(f"Ответ {i}", "Вопрос"), range(6)))
+        
+        self.assertTrue(all("needs_follow_up" in result for result in results))
+        self.assertLess(server.settings.stats["completed"], 6)
+        self.assertEqual(analyzer.get_batching_stats()["items"], 6)
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_missing_batch_item_falls_back_to_single_check(self, mock_openai):
+        """Ответ без результата в пакете проверяется отдельным запросом"""
+        def create(**kwargs):
+            response = MagicMock()
+            if "каждого ответа" in kwargs["messages"][0]["content"]:
+                response.choices[0].message.content = json.dumps({"results": [
+                    {"id": 1, "completeness": 0.9, "specificity": 0.9, "relevance": 0.9, "needs_follow_up": False}
+                ]})
+            else:
+                response.choices[0].message.content = '{"completeness": 0.1, "specificity": 0.1, "relevance": 0.1, "needs_follow_up": true}'
+            return response
+        mock_openai.return_value.chat.completions.create.side_effect = create
+        analyzer = AIAnalyzer()
+        
+        results = analyzer._check_answer_quality_batch([("первый", "вопрос"), ("второй", "вопрос")])
+        
+        self.assertFalse(results[0]["needs_follow_up"])
+        self.assertEqual(results[0]["reason"], "")
+        self.assertIsNone(results[1])
+        self.assertEqual(analyzer.get_route_stats()["check_answer_quality_batch"]["parse_outcomes"]["partial"], 1)
+
+class TestInterviewFanOut(unittest.TestCase):
+    """Тесты параллельного анализа интервью по группам компетенций"""
+    
+    def start(self, **settings) -> AIAnalyzer:
+        self.server, base_url = start_fake_server(settings=FakeSettings(seed=1, **settings))
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        with patch.object(Config, "OPENAI_API_KEY", "test"), patch.object(Config, "OPENAI_BASE_URL", base_url), \
+                patch.object(Config, "LLM_INTERVIEW_FAN_OUT", True):
+            return AIAnalyzer()
+    
+    def test_fan_out_merges_shards(self):
+        """Каждая группа компетенций идет своим запросом, результат собирается в один анализ"""
+        analyzer = self.start()
+        interview = Interview(candidate_id=5, position=Position.QA)
+        
+        analysis = analyzer.analyze_interview(interview, [Answer(question_id="qa_1", answer_text="Тестирую три года")])
+        
+        self.assertEqual(self.server.settings.stats["completed"], len(INTERVIEW_SHARDS))
+        self.assertEqual(analysis.competency_scores,
+                         {"experience": 0.7, "technical_skills": 0.7, "communication": 0.8, "problem_solving": 0.7})
+        self.assertEqual(analysis.overall_score, round(sum(analysis.competency_scores.values()) / 4, 2))
+        self.assertEqual(analysis.hr_recommendation, "recommended")
+        self.assertEqual(analysis.summary, "Кандидат уверенно отвечает на вопросы")
+        calls = analyzer.get_telemetry()["methods"][f"analyze_interview/{Config.HEAVY_MODEL}"]
+        self.assertEqual(calls["calls"], 1)
+        self.assertEqual(calls["fallbacks"], 0)
+        self.assertEqual(analyzer.get_route_stats()["analyze_interview_shard"]["parse_outcomes"]["ok"], 3)
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_merge_rule_is_deterministic(self, mock_openai):
+        """Общий балл - среднее компетенций, рекомендация - по порогам"""
+        analyzer = AIAnalyzer()
+        parts = {
+            "experience": {"competency_scores": {"experience": 0.4, "technical_skills": 0.5}, "experience_level": "junior"},
+            "communication": {"competency_scores": {"communication": 0.7}, "communication_skills": "ясно",
+                              "originality_score": 0.9},
+            "summary": {"recommendations": [], "summary": "итог"}
+        }
+        
+        result = analyzer.merge_interview_shards(parts)
+        
+        self.assertEqual(result["competency_scores"]["problem_solving"], 0.5)
+        self.assertEqual(result["overall_score"], 0.53)
+        self.assertEqual(result["hr_recommendation"], "needs_clarification")
+        InterviewAnalysisResult.model_validate(result)
+    
+    @patch('ai_analyzer.openai.OpenAI')
+    def test_failed_shard_uses_its_fallback(self, mock_openai):
+        """Ошибка одной группы не портит остальные, а с raise_errors пробрасывается"""
+        def create(**kwargs):
+            instructions = kwargs["messages"][0]["content"]
+            if instructions == SUMMARY_SHARD_INSTRUCTIONS:
+                raise ValueError("bad request")
+            response = MagicMock()
+            response.choices[0].message.content = fake_reply(kwargs["messages"])
+            return response
+        mock_openai.return_value.chat.completions.create.side_effect = create
+        analyzer = AIAnalyzer()
+        analyzer.fan_out = True
+        interview = Interview(candidate_id=5, position=Position.QA)
+        answers = [Answer(question_id="qa_1", answer_text="Тестирую")]
+        
+        analysis = analyzer.analyze_interview(interview, answers)
+        
+        self.assertEqual(analysis.summary, INTERVIEW_FALLBACK["summary"])
+        self.assertEqual(analysis.experience_level, "middle")
+        with self.assertRaises(ValueError):
+            analyzer.analyze_interview(interview, answers, raise_errors=True)
+    
+    def test_bot_saves_analysis_for_interview(self):
+        """Бот передает в анализ само интервью и сохраняет результат с его id"""
+        from bot import HRBot
+        with patch('bot.Database'), patch('bot.AIAnalyzer'), patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+            bot = HRBot()
+        interview = Interview(candidate_id=5, position=Position.QA)
+        answers = [Answer(question_id="qa_1", answer_text="Тестирую")]
+        analysis = InterviewAnalysis(candidate_id=5, position=Position.QA, **INTERVIEW_FALLBACK)
+        bot.ai_analyzer.analyze_interview.return_value = analysis
+        bot.db.get_interview_answers.return_value = answers
+        bot.db.get_answers_originality.return_value = 0.95
+        bot.db.get_candidate.return_value = None
+        bot.active_interviews[5] = InterviewSession.from_interview(7, interview)
+        update = MagicMock()
+        update.message.reply_text = AsyncMock()
+        
+        asyncio.run(bot.complete_interview(update, MagicMock(), 5, interview))
+        
+        bot.ai_analyzer.analyze_interview.assert_called_once_with(interview, answers)
+        bot.db.save_analysis.assert_called_once_with(analysis, 7)
+        self.assertEqual(analysis.originality_score, 0.95)
+        self.assertIn("5.0/10", update.message.reply_text.call_args.args[0])
+
+def telegram_update(update_id: int, text: str = "/start", user_id: int = 5) -> dict:
+    """JSON входящего обновления Telegram с текстовым сообщением"""
+    user = {"id": user_id, "is_bot": False, "first_name": "Иван"}
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else []
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "chat": {"id": user_id, "type": "private"},
+        "from": user, "text": text, "entities": entities
+    }}
+
+class TestWebhook(unittest.IsolatedAsyncioTestCase):
+    """Тесты приема обновлений через встроенный webhook-сервер"""
+    
+    SECRET = "s3cret-token"
+    
+    async def start(self, application: Application):
+        async def get_me(bot, *args, **kwargs):
+            bot._bot_user = User(1, "HR", True, username="hr_bot")
+            return bot._bot_user
+        get_me = patch.object(ExtBot, "get_me", get_me)
+        get_me.start()
+        self.addCleanup(get_me.stop)
+        await application.initialize()
+        await application.start()
+        self.server = WebhookServer(application, self.SECRET, "127.0.0.1", 0)
+        port = await self.server.start()
+        self.client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}")
+        
+        async def stop():
+            await self.client.aclose()
+            await self.server.stop()
+            await application.stop()
+            await application.shutdown()
+        self.addAsyncCleanup(stop)
+    
+    def post(self, payload, secret=SECRET, path="/telegram"):
+        headers = {SECRET_HEADER: secret} if secret else {}
+        return self.client.post(path, json=payload, headers=headers)
+    
+    async def test_updates_reach_handlers(self):
+        """Обновления доходят до обработчиков; измеряется задержка от запроса до обработчика"""
+        application = Application.builder().token("123:TEST").updater(None).build()
+        sent_at, latencies = {}, []
+        done = asyncio.Event()
+        
+        async def handler(update, context):
+            latencies.append(time.perf_counter() - sent_at[update.update_id])
+            if len(latencies) == 20:
+                done.set()
+        application.add_handler(TypeHandler(Update, handler))
+        await self.start(application)
+        
+        async def send(update_id):
+            sent_at[update_id] = time.perf_counter()
+            return await self.post(telegram_update(update_id))
+        responses = await asyncio.gather(*(send(i) for i in range(1, 21)))
+        await asyncio.wait_for(done.wait(), 5)
+        
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(self.server.stats[200], 20)
+        self.assertLess(sorted(latencies)[-1], 1.0)
+    
+    async def test_requests_are_checked(self):
+        """Без секрета, с чужим путем или битым JSON обновление не принимается"""
+        application = Application.builder().token("123:TEST").updater(None).build()
+        handler = AsyncMock()
+        application.add_handler(TypeHandler(Update, handler))
+        await self.start(application)
+        
+        self.assertEqual((await self.post(telegram_update(1), secret=None)).status_code, 403)
+        self.assertEqual((await self.post(telegram_update(1), secret="wrong")).status_code, 403)
+        self.assertEqual((await self.post(telegram_update(1), path="/other")).status_code, 404)
+        self.assertEqual((await self.client.get("/telegram")).status_code, 405)
+        self.assertEqual((await self.client.post("/telegram", content=b"{", headers={SECRET_HEADER: self.SECRET})).status_code, 400)
+        self.assertEqual((await self.client.get("/healthz")).status_code, 200)
+        await asyncio.sleep(0.05)
+        handler.assert_not_called()
+    
+    async def test_bot_handlers_over_webhook(self):
+        """Команда /start, пришедшая через webhook, попадает в обработчик HR-бота"""
+        from bot import HRBot
+        with patch('bot.Database'), patch('bot.AIAnalyzer'), patch.object(Config, "FOLLOW_UP_POOL_PATH", ""), \
+                patch.object(Config, "TELEGRAM_BOT_TOKEN", "123:TEST"):
+            bot = HRBot()
+            bot.db.get_session.return_value = None
+            started = asyncio.Event()
+            bot.start = AsyncMock(side_effect=lambda update, context: started.set())
+            application = bot.build_application()
+        await self.start(application)
+        
+        response = await self.post(telegram_update(1, "/start", user_id=42))
+        await asyncio.wait_for(started.wait(), 5)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(bot.start.call_args.args[0].effective_user.id, 42)
+
+    async def test_stalled_connections_are_closed(self):
+        """Зависшие и простаивающие соединения закрываются по таймауту, лишние сразу получают 503"""
+        server = WebhookServer(None, self.SECRET, "127.0.0.1", 0, request_timeout=0.1, idle_timeout=0.2, max_connections=2)
+        port = await server.start()
+        self.addAsyncCleanup(server.stop)
+        stalled_reader, stalled = await asyncio.open_connection("127.0.0.1", port)
+        stalled.write(b"POST /telegram HTTP/1.1\r\nContent-Length: 10\r\n")
+        idle_reader, idle = await asyncio.open_connection("127.0.0.1", port)
+        await asyncio.sleep(0.05)
+
+        extra_reader, extra = await asyncio.open_connection("127.0.0.1", port)
+        self.assertIn(b"503", await asyncio.wait_for(extra_reader.read(), 1))
+
+        self.assertEqual(await asyncio.wait_for(stalled_reader.read(), 1), b"")
+        self.assertEqual(await asyncio.wait_for(idle_reader.read(), 1), b"")
+        for writer in (stalled, idle, extra):
+            writer.close()
+        self.assertEqual(server.connections, 0)
+        self.assertEqual(server.stats["timed_out_connections"], 2)
+        self.assertEqual(server.stats["rejected_connections"], 1)
+
+class TestUpdateDispatcher(unittest.IsolatedAsyncioTestCase):
+    """Тесты параллельной обработки обновлений с порядком внутри пользователя"""
+    
+    async def run_updates(self, processor, users, per_user=1, delay=0.02):
+        """Обрабатывает обновления по кругу пользователей; возвращает журнал (user, seq, событие)"""
+        log, running, peak = [], 0, 0
+        
+        async def handler(update):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            log.append((update.effective_user.id, update.update_id, "start"))
+            await asyncio.sleep(delay)
+            log.append((update.effective_user.id, update.update_id, "end"))
+            running -= 1
+        
+        updates = [Update.de_json(telegram_update(seq * 100 + user, "текст", user), None)
+                   for seq in range(per_user) for user in users]
+        await asyncio.gather(*(processor.process_update(update, handler(update)) for update in updates))
+        return log, peak
+    
+    async def test_users_in_parallel_each_in_order(self):
+        """Разные пользователи идут параллельно, обновления одного - по порядку и без наложения"""
+        processor = PerUserUpdateProcessor(8)
+        started = time.perf_counter()
+        
+        log, peak = await self.run_updates(processor, users=[1, 2, 3], per_user=5)
+        
+        self.assertLess(time.perf_counter() - started, 15 * 0.02)
+        self.assertEqual(peak, 3)
+        for user in (1, 2, 3):
+            events = [(update_id, event) for user_id, update_id, event in log if user_id == user]
+            expected = [(seq * 100 + user, event) for seq in range(5) for event in ("start", "end")]
+            self.assertEqual(events, expected)
+        stats = processor.as_dict()
+        self.assertEqual((stats["processed"], stats["max_user_depth"], stats["updates_pending"]), (15, 5, 0))
+    
+    async def test_global_limit(self):
+        """Одновременно обрабатывается не больше заданного числа обновлений"""
+        processor = PerUserUpdateProcessor(2)
+        
+        _, peak = await self.run_updates(processor, users=range(1, 11), delay=0.005)
+        
+        self.assertEqual(peak, 2)
+        self.assertEqual(processor.as_dict()["wait_time"]["count"], 10)
+    
+    async def test_busy_user_does_not_hold_slots(self):
+        """Очередь одного пользователя не занимает слоты, пока ждет своей очереди"""
+        processor = PerUserUpdateProcessor(1)
+        handled = []
+        updates = [Update.de_json(telegram_update(seq * 100 + 1, "текст", 1), None) for seq in range(4)]
+        updates.append(Update.de_json(telegram_update(2, "текст", 2), None))
+        
+        async def handler(update):
+            await asyncio.sleep(0.005)
+            handled.append(update.update_id)
+        await asyncio.gather(*(processor.process_update(update, handler(update)) for update in updates))
+        
+        self.assertEqual(handled, [1, 2, 101, 201, 301])
+
+class TestScheduledPauses(unittest.IsolatedAsyncioTestCase):
+    """Тесты отложенных сообщений вместо пауз в обработчиках"""
+    
+    def setUp(self):
+        from bot import HRBot
+        with patch('bot.Database'), patch('bot.AIAnalyzer'), patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+            self.bot = HRBot()
+        self.update = MagicMock()
+        self.update.message.reply_text = AsyncMock()
+        self.interview = Interview(candidate_id=5, position=Position.QA)
+        self.interview.current_question_index = len(get_contact_questions_for_position(Position.QA))
+    
+    async def test_handler_returns_before_delayed_question(self):
+        """Переход к профессиональным вопросам не ждет паузу, вопрос приходит по таймеру"""
+        context = MagicMock(job_queue=None, user_data={})
+        context.application.create_task = lambda coroutine, name=None: asyncio.create_task(coroutine)
+        questions = get_questions_for_position(Position.QA)
+        
+        with patch.object(Config, "MESSAGE_PAUSE_SECONDS", 0.05):
+            started = time.perf_counter()
+            await self.bot.ask_next_question(self.update, context, self.interview, questions)
+            elapsed = time.perf_counter() - started
+            
+            self.assertLess(elapsed, 0.05)
+            self.assertEqual(self.update.message.reply_text.await_count, 1)
+            self.assertTrue(context.user_data['waiting_for_answer'])
+            await asyncio.sleep(0.1)
+        
+        self.assertEqual(self.update.message.reply_text.await_count, 2)
+        self.assertIn(questions[self.interview.current_question_index].text,
+                      self.update.message.reply_text.call_args.args[0])
+    
+    async def test_text_during_pause_is_not_an_answer(self):
+        """Сообщение до появления отложенного вопроса не засчитывается ответом на него"""
+        context = MagicMock(user_data={})
+        questions = get_questions_for_position(Position.QA)
+        await self.bot.ask_next_question(self.update, context, self.interview, questions)
+        self.bot.handle_answer = AsyncMock()
+        self.update.message.text = "Ответ раньше вопроса"
+        
+        await self.bot.handle_message(self.update, context)
+        context.user_data['question_visible_at'] = time.time() - 1
+        await self.bot.handle_message(self.update, context)
+        
+        self.assertEqual(self.bot.handle_answer.await_count, 1)
+        self.assertIn("в пути", self.update.message.reply_text.call_args_list[1].args[0])
+    
+    async def test_fallback_starts_interview_inside_handler(self):
+        """Запасной путь после анализа резюме создает интервью сразу, по таймеру уходит только вопрос"""
+        context = MagicMock(user_data={})
+        self.bot.db.save_interview.return_value = 7
+        update = MagicMock(spec=Update)
+        update.effective_user.id = 5
+        update.message.reply_text = AsyncMock(side_effect=[Exception("Bad Request"), None, None])
+        self.update = update
+        
+        await self.bot.show_resume_analysis(update, context, {}, Position.QA)
+        
+        self.assertEqual(self.bot.active_interviews[5].interview_id, 7)
+        self.assertTrue(context.user_data['waiting_for_answer'])
+        self.assertEqual(self.update.message.reply_text.await_count, 2)
+        callback, delay = context.job_queue.run_once.call_args.args
+        await callback(MagicMock())
+        self.assertEqual(self.update.message.reply_text.await_count, 3)
+        self.bot.db.save_interview.assert_called_once()
+    
+    async def test_job_queue_is_used_when_available(self):
+        """С job queue отложенная отправка ставится в нее"""
+        context = MagicMock(user_data={})
+        questions = get_questions_for_position(Position.QA)
+        
+        await self.bot.ask_next_question(self.update, context, self.interview, questions)
+        callback, delay = context.job_queue.run_once.call_args.args
+        await callback(MagicMock())
+        
+        self.assertEqual(delay, Config.MESSAGE_PAUSE_SECONDS)
+        self.assertEqual(self.update.message.reply_text.await_count, 2)
+
+class TestDurableSessions(unittest.IsolatedAsyncioTestCase):
+    """Тесты сохранения сессий и продолжения собеседования после перезапуска"""
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, "sessions.db")
+        self.questions = get_questions_for_position(Position.QA)
+    
+    def start_bot(self):
+        """Новый процесс бота поверх той же базы"""
+        from bot import HRBot
+        with patch('bot.Database', lambda: Database(self.db_path)), patch('bot.AIAnalyzer'), \
+                patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+            bot = HRBot()
+        return bot, SessionPersistence(bot.db)
+    
+    def message(self, text: str, user_id: int = 5):
+        update = MagicMock()
+        update.effective_user.id = user_id
+        update.message.text = text
+        update.message.reply_text = AsyncMock()
+        return update
+    
+    async def test_interview_resumes_after_crash(self):
+        """После падения собеседование продолжается с того вопроса, на котором остановилось"""
+        bot, persistence = self.start_bot()
+        bot.db.save_candidate(Candidate(user_id=5, first_name="Иван"))
+        context = MagicMock(job_queue=None, user_data={})
+        query = MagicMock(edit_message_text=AsyncMock())
+        query.from_user.id = 5
+        await bot.start_interview(query, context, Position.QA)
+        await bot.handle_message(self.message("Иван Петров, хочу на позицию QA"), context)
+        await bot.handle_message(self.message("+79991234567"), context)
+        await persistence.update_user_data(5, context.user_data)
+        del bot, persistence  # crash: nothing else is flushed or closed
+        
+        bot, persistence = self.start_bot()
+        restored = {}
+        await persistence.refresh_user_data(5, restored)
+        self.assertEqual(restored["current_question_id"], "contact_email")
+        self.assertEqual(bot.active_interviews, {})
+        
+        update = self.message("ivan@example.com")
+        await bot.handle_message(update, MagicMock(job_queue=None, user_data=restored))
+        
+        interview = bot.active_interviews[5]
+        interview_id = interview.interview_id
+        self.assertEqual(interview.current_question_index, 3)
+        self.assertEqual(bot.db.get_candidate(5).email, "ivan@example.com")
+        self.assertIn(self.questions[3].text, update.message.reply_text.call_args.args[0])
+        self.assertEqual([answer.question_id for answer in bot.db.get_interview_answers(interview_id)],
+                         ["contact_intro", "contact_phone", "contact_email"])
+    
+    async def test_interview_resumes_without_session_state(self):
+        """Если состояние сессии потеряно, вопрос восстанавливается по интервью в базе"""
+        bot, _ = self.start_bot()
+        bot.db.save_candidate(Candidate(user_id=5, first_name="Иван"))
+        interview = Interview(candidate_id=5, position=Position.QA, current_question_index=1)
+        bot.db.save_interview(interview)
+        context = MagicMock(job_queue=None, user_data={})
+        
+        await bot.handle_message(self.message("+79991234567"), context)
+        
+        self.assertEqual(bot.db.get_candidate(5).phone, "+79991234567")
+        self.assertEqual(context.user_data["current_question_id"], "contact_email")
+    
+    async def test_stale_follow_up_state_asks_current_question(self):
+        """Если сохраненное состояние отстало от базы, ответ не записывается к чужому вопросу"""
+        bot, _ = self.start_bot()
+        index = next(i for i, question in enumerate(self.questions) if question.id == "qa_1")
+        interview_id = bot.db.save_interview(Interview(candidate_id=5, position=Position.QA,
+                                                       current_question_index=index + 1))
+        context = MagicMock(job_queue=None, user_data={"waiting_for_follow_up": True, "current_question_id": "qa_1",
+                                                       "current_answer_text": "Тестирую веб"})
+        update = self.message("Постманом")
+        
+        await bot.handle_message(update, context)
+        
+        self.assertEqual(bot.db.get_interview_answers(interview_id), [])
+        self.assertIn(self.questions[index + 1].text, update.message.reply_text.call_args.args[0])
+        self.assertEqual(context.user_data["current_question_id"], self.questions[index + 1].id)
+        self.assertNotIn("waiting_for_follow_up", context.user_data)
+    
+    async def test_users_without_interview_are_checked_once(self):
+        """Пользователь без собеседования проверяется в базе один раз, до нового /start"""
+        bot, _ = self.start_bot()
+        bot.db.get_active_interview = MagicMock(wraps=bot.db.get_active_interview)
+        context = MagicMock(job_queue=None, user_data={})
+        
+        for _ in range(3):
+            await bot.handle_message(self.message("привет"), context)
+        query = MagicMock(edit_message_text=AsyncMock())
+        query.from_user.id = 5
+        await bot.start_interview(query, context, Position.QA)
+        
+        self.assertEqual(bot.db.get_active_interview.call_count, 1)
+        self.assertNotIn(5, bot.users_without_interview)
+        self.assertIsNotNone(await bot.get_interview_session(5))
+    
+    async def test_session_encoding_and_coalesced_writes(self):
+        """Позиция и незавершенный ответ переживают сериализацию; изменения пишутся одной транзакцией"""
+        bot, persistence = self.start_bot()
+        data = {"selected_position": Position.QA, "waiting_for_follow_up": True,
+                "current_answer": Answer(question_id="qa_1", answer_text="Тестирую", follow_up_answers=["API"])}
+        
+        self.assertEqual(decode_session(encode_session(data)), data)
+        await asyncio.gather(*(persistence.update_user_data(user_id, data) for user_id in range(1, 11)))
+        
+        self.assertEqual(persistence.writes, 1)
+        restored = {}
+        await SessionPersistence(bot.db).refresh_user_data(7, restored)
+        self.assertEqual(restored, data)
+
+class TestTimeoutSweeper(unittest.IsolatedAsyncioTestCase):
+    """Тесты проверки таймаутов собеседований"""
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, "sweep.db")
+        from bot import HRBot
+        with patch('bot.Database', lambda: Database(self.db_path)), patch('bot.AIAnalyzer'), \
+                patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+            self.bot = HRBot()
+        self.bot.application = MagicMock()
+    
+    def open_interview(self, user_id: int, idle_minutes: float) -> int:
+        """Открытое собеседование, последний ответ на которое был idle_minutes назад"""
+        interview = Interview(candidate_id=user_id, position=Position.QA, status=InterviewStatus.IN_PROGRESS)
+        interview_id = self.bot.db.save_interview(interview)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE interviews SET last_activity_at = ? WHERE id = ?",
+                         ((datetime.now() - timedelta(minutes=idle_minutes)).isoformat(), interview_id))
+        self.bot.active_interviews[user_id] = InterviewSession.from_interview(interview_id, interview)
+        return interview_id
+    
+    async def test_stale_interviews_time_out_and_are_evicted(self):
+        """Просроченные собеседования помечаются TIMEOUT и удаляются из памяти, активные остаются"""
+        stale_id = self.open_interview(1, Config.INTERVIEW_TIMEOUT_MINUTES + 5)
+        fresh_id = self.open_interview(2, 1)
+        
+        self.assertEqual(await self.bot.sweep_timeouts(), 1)
+        
+        self.assertNotIn(1, self.bot.active_interviews)
+        self.assertEqual(self.bot.active_interviews[2].interview_id, fresh_id)
+        self.bot.application.drop_user_data.assert_called_once_with(1)
+        self.assertIsNone(self.bot.db.get_active_interview(1))
+        with sqlite3.connect(self.db_path) as conn:
+            status, completed_at = conn.execute(
+                "SELECT status, completed_at FROM interviews WHERE id = ?", (stale_id,)).fetchone()
+        self.assertEqual(status, InterviewStatus.TIMEOUT.value)
+        self.assertIsNotNone(completed_at)
+        
+        # The next run finds nothing new
+        self.assertEqual(await self.bot.sweep_timeouts(), 0)
+        self.assertEqual(self.bot.sweep_stats["runs"], 2)
+        self.assertEqual(self.bot.sweep_stats["evicted"], 1)
+        self.assertEqual(self.bot.sweep_stats["last_evicted"], 0)
+    
+    async def test_running_handler_cannot_reopen_timed_out_interview(self):
+        """Обработчик, работавший во время проверки, не возвращает просроченное собеседование в работу"""
+        interview_id = self.open_interview(1, Config.INTERVIEW_TIMEOUT_MINUTES + 5)
+        session = self.bot.active_interviews[1]
+        
+        await self.bot.sweep_timeouts()
+        session.advance()
+        
+        self.assertFalse(self.bot.db.update_interview(session, interview_id))
+        self.assertIsNone(self.bot.db.get_active_interview(1))
+        self.assertEqual(self.bot.db.get_interview(interview_id).status, InterviewStatus.TIMEOUT)
+        # Completing still goes through
+        session.status = InterviewStatus.COMPLETED
+        self.assertTrue(self.bot.db.update_interview(session, interview_id))
+    
+    def test_interview_finished_during_sweep_is_not_timed_out(self):
+        """Собеседование, завершенное или продолженное между поиском и обновлением, не помечается просроченным"""
+        completed_id = self.open_interview(1, Config.INTERVIEW_TIMEOUT_MINUTES + 5)
+        answered_id = self.open_interview(2, Config.INTERVIEW_TIMEOUT_MINUTES + 5)
+        db_path = self.db_path
+        connect = sqlite3.connect
+
+        class RacingConnection(sqlite3.Connection):
+            """Сразу после поиска просроченных собеседований обработчики успевают их изменить"""
+            def execute(self, sql, *args):
+                cursor = super().execute(sql, *args)
+                if sql.lstrip().startswith("SELECT id, candidate_id"):
+                    rows = cursor.fetchall()
+                    with connect(db_path) as other:
+                        other.execute("UPDATE interviews SET status = 'completed' WHERE id = ?", (completed_id,))
+                        other.execute("UPDATE interviews SET last_activity_at = ? WHERE id = ?",
+                                      (datetime.now().isoformat(), answered_id))
+                    return SimpleNamespace(fetchall=lambda: rows)
+                return cursor
+
+        with patch("database.sqlite3.connect", lambda path: connect(path, factory=RacingConnection)):
+            swept = self.bot.db.timeout_stale_interviews(datetime.now() - timedelta(minutes=Config.INTERVIEW_TIMEOUT_MINUTES))
+
+        self.assertEqual(swept, [])
+        self.assertEqual(self.bot.db.get_interview(completed_id).status, InterviewStatus.COMPLETED)
+        self.assertEqual(self.bot.db.get_interview(answered_id).status, InterviewStatus.IN_PROGRESS)
+
+    async def test_newer_interview_of_same_user_is_kept(self):
+        """Новое собеседование пользователя не выгружается из-за его старого просроченного"""
+        self.open_interview(1, Config.INTERVIEW_TIMEOUT_MINUTES + 5)
+        newer_id = self.open_interview(1, 0)
+        
+        self.assertEqual(await self.bot.sweep_timeouts(), 1)
+        self.assertEqual(self.bot.active_interviews[1].interview_id, newer_id)
+        self.bot.application.drop_user_data.assert_not_called()
+    
+    def test_sweep_query_uses_index(self):
+        """Поиск просроченных собеседований идет по индексу, а не полным просмотром таблицы"""
+        with sqlite3.connect(self.db_path) as conn:
+            plan = " ".join(row[-1] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id, candidate_id FROM interviews "
+                "WHERE status IN ('started', 'in_progress') AND last_activity_at < ?", (datetime.now().isoformat(),)))
+        self.assertIn("idx_interviews_status_activity", plan)
+    
+    async def test_sweeper_is_scheduled_on_job_queue(self):
+        """При наличии JobQueue проверка ставится повторяющейся задачей"""
+        application = MagicMock()
+        await self.bot.start_timeout_sweeper(application)
+        application.job_queue.run_repeating.assert_called_once()
+        self.assertEqual(application.job_queue.run_repeating.call_args.args[1], Config.TIMEOUT_SWEEP_INTERVAL_SECONDS)
+
+class TestSessionRecords(unittest.IsolatedAsyncioTestCase):
+    """Тесты компактных записей открытых собеседований"""
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, "records.db")
+        from bot import HRBot
+        with patch('bot.Database', lambda: Database(self.db_path)), patch('bot.AIAnalyzer'), \
+                patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+            self.bot = HRBot()
+    
+    def message(self, text: str, user_id: int = 5):
+        update = MagicMock()
+        update.effective_user.id = user_id
+        update.message.text = text
+        update.message.reply_text = AsyncMock()
+        return update
+    
+    def test_record_is_slotted(self):
+        """Запись хранит только идентификаторы, курсор и счетчики, без словаря атрибутов и ответов"""
+        interview = Interview(candidate_id=5, position=Position.QA, current_question_index=3, follow_up_count=1)
+        session = InterviewSession.from_interview(9, interview)
+        
+        self.assertFalse(hasattr(session, "__dict__"))
+        self.assertFalse(hasattr(session, "answers"))
+        self.assertEqual((session.interview_id, session.candidate_id, session.position), (9, 5, Position.QA))
+        self.assertEqual((session.current_question_index, session.follow_up_count), (3, 1))
+        self.assertEqual(session.started_at, interview.started_at)
+        session.advance()
+        self.assertEqual(session.current_question_index, 4)
+    
+    async def test_answers_are_stored_only_in_database(self):
+        """Ответ с уточнением попадает в базу, а в user_data до уточнения лежит только его текст"""
+        interview_id = self.bot.db.save_interview(Interview(candidate_id=5, position=Position.QA))
+        questions = get_questions_for_position(Position.QA)
+        first = next(i for i, question in enumerate(questions) if question.category not in ("contact", "introduction"))
+        session = self.bot.active_interviews[5] = InterviewSession(interview_id, 5, Position.QA, current_question_index=first)
+        context = MagicMock(job_queue=None, user_data={"waiting_for_answer": True,
+                                                       "current_question_id": questions[first].id})
+        
+        with patch.object(Config, "SPECULATIVE_FOLLOW_UPS", False):
+            await self.bot.handle_message(self.message("Тестирую веб-приложения вручную"), context)
+        self.assertEqual(context.user_data["current_answer_text"], "Тестирую веб-приложения вручную")
+        self.assertNotIn("current_answer", context.user_data)
+        
+        await self.bot.handle_message(self.message("Использую Postman для API"), context)
+        
+        self.assertNotIn("current_answer_text", context.user_data)
+        self.assertEqual((session.current_question_index, session.follow_up_count), (first + 1, 1))
+        [answer] = self.bot.db.get_interview_answers(interview_id)
+        self.assertEqual(answer.question_id, questions[first].id)
+        self.assertEqual(answer.answer_text, "Тестирую веб-приложения вручную")
+        self.assertEqual(answer.follow_up_answers, ["Использую Postman для API"])
+    
+    def test_memory_benchmark_reports_savings(self):
+        """Бенчмарк памяти показывает, что компактная запись меньше полного интервью"""
+        report = session_memory_benchmark([200], answers=4)
+        
+        sizes = report["sizes"][200]
+        self.assertLess(sizes["after_bytes_per_session"], sizes["before_bytes_per_session"])
+        self.assertGreater(sizes["ratio"], 2)
+
+class TestOutboundRateLimiter(unittest.IsolatedAsyncioTestCase):
+    """Тесты ограничения исходящих сообщений"""
+    
+    def recorder(self, sent: list, failures: int = 0, retry_after: float = 0.05):
+        """Отправка, которая запоминает порядок и первые failures раз отвечает RetryAfter"""
+        async def callback(endpoint, data):
+            if failures > len([item for item in sent if item is None]):
+                sent.append(None)
+                raise RetryAfter(timedelta(seconds=retry_after))
+            sent.append(data["text"])
+            return True
+        return callback
+    
+    async def request(self, limiter: PrioritizedRateLimiter, callback, chat_id, text: str):
+        data = {"chat_id": chat_id, "text": text}
+        return await limiter.process_request(callback, ("sendMessage", data), {}, "sendMessage", data, None)
+    
+    async def test_candidate_replies_go_before_notifications(self):
+        """Ответ кандидату обгоняет очередь уведомлений HR"""
+        limiter = PrioritizedRateLimiter(global_rate=20, group_rate=1000, group_burst=1000,
+                                         notification_chats={"@hr"})
+        sent = []
+        callback = self.recorder(sent)
+        notifications = [asyncio.create_task(self.request(limiter, callback, "@hr", f"hr{i}")) for i in range(30)]
+        await asyncio.sleep(0.01)
+        self.assertEqual(limiter.as_dict()["queued"]["notification"], 10)
+        
+        await self.request(limiter, callback, 5, "candidate")
+        await asyncio.gather(*notifications)
+        
+        self.assertEqual(sent.index("candidate"), 20)
+        self.assertEqual(limiter.as_dict()["sent"], 31)
+    
+    async def test_chat_limit_does_not_block_other_chats(self):
+        """Лимит одного чата задерживает только его сообщения"""
+        limiter = PrioritizedRateLimiter(global_rate=1000, chat_rate=10, chat_burst=1)
+        sent = []
+        callback = self.recorder(sent)
+        started = time.perf_counter()
+        
+        await asyncio.gather(*(self.request(limiter, callback, 1, f"a{i}") for i in range(3)),
+                             self.request(limiter, callback, 2, "b"))
+        
+        self.assertGreaterEqual(time.perf_counter() - started, 0.18)
+        self.assertEqual(sent[:2], ["a0", "b"])
+        self.assertEqual(sent[2:], ["a1", "a2"])
+    
+    async def test_retry_after_pauses_and_retries(self):
+        """После RetryAfter отправка ждет указанное время и повторяется"""
+        limiter = PrioritizedRateLimiter(max_retries=2)
+        sent = []
+        started = time.perf_counter()
+        
+        self.assertTrue(await self.request(limiter, self.recorder(sent, failures=1), 5, "hello"))
+        
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+        self.assertEqual(sent, [None, "hello"])
+        self.assertEqual(limiter.as_dict()["retry_after"], 1)
+        with self.assertRaises(RetryAfter):
+            await self.request(limiter, self.recorder([], failures=5, retry_after=0.01), 5, "again")
+        self.assertEqual(limiter.as_dict()["failed"], 1)
+    
+    async def test_retry_after_pauses_only_its_chat(self):
+        """RetryAfter для чата HR не задерживает ответы кандидатам; общая пауза — только если лимит у нескольких чатов"""
+        limiter = PrioritizedRateLimiter(group_rate=1000, group_burst=1000, notification_chats={"@hr"},
+                                         global_pause_chats=2)
+        sent, hr_sent = [], []
+        started = time.perf_counter()
+        hr = asyncio.create_task(self.request(limiter, self.recorder(hr_sent, failures=1, retry_after=0.3), "@hr", "hr"))
+        await asyncio.sleep(0.01)
+
+        for chat_id in (5, 6):
+            await self.request(limiter, self.recorder(sent), chat_id, f"candidate{chat_id}")
+
+        self.assertEqual(sent, ["candidate5", "candidate6"])
+        self.assertLess(time.perf_counter() - started, 0.2)
+        self.assertFalse(hr.done())
+        await hr
+        self.assertEqual(hr_sent, [None, "hr"])
+        self.assertGreaterEqual(time.perf_counter() - started, 0.3)
+        self.assertEqual(limiter.as_dict()["global_pauses"], 0)
+
+        flood = asyncio.create_task(self.request(limiter, self.recorder([], failures=1, retry_after=0.2), 7, "flood"))
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await self.request(limiter, self.recorder(sent), 8, "after")
+        await flood
+        self.assertGreaterEqual(time.perf_counter() - started, 0.15)
+        self.assertEqual(limiter.as_dict()["global_pauses"], 1)
+
+    async def test_requests_without_chat_are_not_limited(self):
+        """Запросы без чата (getMe, setWebhook) идут сразу"""
+        limiter = PrioritizedRateLimiter(global_rate=1)
+        callback = AsyncMock(return_value={"id": 1})
+        
+        results = await asyncio.gather(*(limiter.process_request(callback, ("getMe", {}), {}, "getMe", {}, None)
+                                         for _ in range(5)))
+        
+        self.assertEqual(results, [{"id": 1}] * 5)
+        self.assertEqual(limiter.as_dict()["sent"], 0)
+
+class TestHRDigest(unittest.IsolatedAsyncioTestCase):
+    """Тесты сводок результатов для HR"""
+    
+    def entry(self, interview_id: int) -> DigestEntry:
+        return DigestEntry(interview_id, f"Кандидат {interview_id} — QA — 7.0/10", f"Полный результат {interview_id}")
+    
+    async def test_low_volume_is_sent_one_by_one(self):
+        """Пока результатов мало, каждый уходит отдельным сообщением сразу"""
+        send = AsyncMock()
+        digest = HRDigest(send, max_delay=60, burst=3)
+        
+        for interview_id in range(3):
+            await digest.submit(self.entry(interview_id))
+        
+        self.assertEqual([call.args for call in send.call_args_list],
+                         [(f"Полный результат {i}", None) for i in range(3)])
+        self.assertEqual(digest.as_dict()["single"], 3)
+    
+    async def test_high_volume_is_collected_into_digest(self):
+        """При большом потоке результаты собираются в одну сводку с кнопками не позже max_delay"""
+        send = AsyncMock()
+        digest = HRDigest(send, max_delay=0.05, burst=2)
+        
+        for interview_id in range(5):
+            await digest.submit(self.entry(interview_id))
+        self.assertEqual(send.await_count, 2)
+        self.assertEqual(digest.as_dict()["pending"], 3)
+        
+        await asyncio.sleep(0.1)
+        
+        self.assertEqual(send.await_count, 3)
+        text, markup = send.call_args.args
+        self.assertIn("Результаты собеседований: 3", text)
+        self.assertIn("3. Кандидат 4 — QA — 7.0/10", text)
+        self.assertEqual([row[0].callback_data for row in markup.inline_keyboard],
+                         [f"{RESULT_CALLBACK_PREFIX}{i}" for i in (2, 3, 4)])
+        self.assertEqual(digest.as_dict(), {"single": 2, "digests": 1, "digested": 3, "failed_sends": 0, "pending": 0})
+    
+    async def test_full_digest_is_sent_without_waiting(self):
+        """Набравшаяся сводка отправляется сразу, а отложенная отправка отменяется"""
+        send = AsyncMock()
+        digest = HRDigest(send, max_delay=60, burst=0, max_items=4)
+        
+        for interview_id in range(4):
+            await digest.submit(self.entry(interview_id))
+        
+        send.assert_awaited_once()
+        self.assertEqual(len(send.call_args.args[1].inline_keyboard), 4)
+        await digest.flush()
+        send.assert_awaited_once()
+    
+    async def test_failed_digest_is_kept_and_retried(self):
+        """Если сводка не отправилась, результаты не теряются и уходят следующей попыткой"""
+        send = AsyncMock(side_effect=[Exception("Bad Request: can't parse entities"), None])
+        digest = HRDigest(send, max_delay=0.05, burst=0)
+        
+        for interview_id in range(3):
+            await digest.submit(self.entry(interview_id))
+        await asyncio.sleep(0.08)
+        self.assertEqual(digest.as_dict()["pending"], 3)
+        await asyncio.sleep(0.08)
+        
+        self.assertEqual(send.await_count, 2)
+        self.assertIn("Результаты собеседований: 3", send.call_args.args[0])
+        self.assertEqual(digest.as_dict()["failed_sends"], 1)
+        self.assertEqual(digest.as_dict()["pending"], 0)
+    
+    async def test_failed_full_digest_is_retried_without_new_results(self):
+        """Сводка, не отправившаяся при наборе max_items, уходит позже без новых результатов"""
+        send = AsyncMock(side_effect=[Exception("Timed out"), None])
+        digest = HRDigest(send, max_delay=0.05, burst=0, max_items=3)
+        
+        for interview_id in range(3):
+            await digest.submit(self.entry(interview_id))
+        self.assertEqual(digest.as_dict()["pending"], 3)
+        await asyncio.sleep(0.1)
+        
+        self.assertEqual(send.await_count, 2)
+        self.assertIn("Результаты собеседований: 3", send.call_args.args[0])
+        self.assertEqual(digest.as_dict()["pending"], 0)
+    
+    def test_hr_texts_are_valid_markdown(self):
+        """Рекомендация выводится по-русски, а подчеркивания в данных кандидата экранируются"""
+        from bot import HRBot
+        with patch('bot.Database'), patch('bot.AIAnalyzer'), patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+            bot = HRBot()
+        candidate = Candidate(user_id=5, first_name="Ivan_", last_name="Petrov", email="ivan_petrov@example.com")
+        analysis = InterviewAnalysis(candidate_id=5, position=Position.QA, **INTERVIEW_FALLBACK)
+        
+        text = bot.format_hr_result(candidate, Interview(candidate_id=5, position=Position.QA), analysis)
+        summary = bot.format_hr_summary(candidate, Interview(candidate_id=5, position=Position.QA), analysis)
+        
+        for message in (text, summary):
+            self.assertNotIn("needs_clarification", message)
+            self.assertIn("требует рассмотрения", message)
+            self.assertIn("Ivan\\_", message)
+        self.assertIn("ivan\\_petrov@example.com", text)
+    
+    async def test_digest_button_shows_full_result(self):
+        """Кнопка сводки показывает полный результат собеседования из базы"""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        from bot import HRBot
+        with patch('bot.Database', lambda: Database(os.path.join(tmp_dir.name, "digest.db"))), \
+                patch('bot.AIAnalyzer'), patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+            bot = HRBot()
+        bot.db.save_candidate(Candidate(user_id=5, first_name="Иван", last_name="Петров"))
+        interview_id = bot.db.save_interview(Interview(candidate_id=5, position=Position.QA))
+        bot.db.save_analysis(InterviewAnalysis(candidate_id=5, position=Position.QA, **INTERVIEW_FALLBACK), interview_id)
+        update = MagicMock()
+        update.callback_query.data = f"{RESULT_CALLBACK_PREFIX}{interview_id}"
+        update.callback_query.answer = AsyncMock()
+        update.callback_query.from_user.id = 1
+        update.callback_query.message.reply_text = AsyncMock()
+        
+        with patch.object(Config, "ADMIN_USER_IDS", {1}):
+            await bot.handle_callback(update, MagicMock())
+        
+        text = update.callback_query.message.reply_text.call_args.args[0]
+        self.assertIn("Иван Петров", text)
+        self.assertIn("QA", text)
+
+class TestCluster(unittest.IsolatedAsyncioTestCase):
+    """Тесты распределения обновлений между процессами-обработчиками"""
+    
+    SECRET = "s3cret-token"
+    
+    async def start_worker(self, port: int = 0):
+        """Webhook-сервер обработчика без бота: принятые обновления копятся в очереди"""
+        application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        server = WebhookServer(application, self.SECRET, "127.0.0.1", port)
+        await server.start()
+        self.addAsyncCleanup(server.stop)
+        return server, application.update_queue
+    
+    async def start_links(self, ports):
+        links = [WorkerLink("127.0.0.1", port, "/telegram", self.SECRET) for port in ports]
+        for link in links:
+            link.start()
+            self.addAsyncCleanup(link.stop)
+        return links
+    
+    def test_routing_key_matches_dispatcher(self):
+        """Ключ маршрутизации по JSON совпадает с ключом диспетчера обновлений"""
+        callback = {"update_id": 2, "callback_query": {"id": "1", "chat_instance": "1", "data": "start_interview",
+                                                       "from": {"id": 77, "is_bot": False, "first_name": "Иван"}}}
+        for data in (telegram_update(1, user_id=42), callback):
+            self.assertEqual(raw_update_user_key(data), update_user_key(Update.de_json(data, None)))
+        self.assertIsNone(raw_update_user_key({"update_id": 3}))
+        self.assertEqual([worker_for(key, 4) for key in (8, 9, -10, None)], [0, 1, 2, 0])
+    
+    async def test_updates_are_partitioned_by_user_in_order(self):
+        """Каждый пользователь попадает к своему обработчику, его обновления идут по порядку"""
+        workers = [await self.start_worker() for _ in range(3)]
+        links = await self.start_links([server.port for server, _ in workers])
+        ingress = RoutingWebhookServer(links, self.SECRET, "127.0.0.1", 0)
+        port = await ingress.start()
+        self.addAsyncCleanup(ingress.stop)
+        
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            for update_id in range(60):
+                response = await client.post("/telegram", json=telegram_update(update_id, "ответ", user_id=update_id % 6 + 1),
+                                             headers={SECRET_HEADER: self.SECRET})
+                self.assertEqual(response.status_code, 200)
+        for _ in range(100):
+            if sum(queue.qsize() for _, queue in workers) == 60:
+                break
+            await asyncio.sleep(0.02)
+        
+        for index, (_, queue) in enumerate(workers):
+            received = [queue.get_nowait() for _ in range(queue.qsize())]
+            self.assertEqual({update.effective_user.id % 3 for update in received}, {index})
+            for user_id in {update.effective_user.id for update in received}:
+                ids = [update.update_id for update in received if update.effective_user.id == user_id]
+                self.assertEqual(ids, sorted(ids))
+                self.assertEqual(len(ids), 10)
+    
+    async def test_link_waits_for_restarting_worker(self):
+        """Пока обработчик перезапускается, обновления ждут и доставляются после старта"""
+        server, _ = await self.start_worker()
+        port = server.port
+        await server.stop()
+        [link] = await self.start_links([port])
+        link.queue.put_nowait(json.dumps(telegram_update(1)).encode())
+        await asyncio.sleep(0.1)
+        
+        _, queue = await self.start_worker(port)
+        update = await asyncio.wait_for(queue.get(), 5)
+        # The worker acknowledges the update right after queueing it
+        for _ in range(100):
+            if link.forwarded:
+                break
+            await asyncio.sleep(0.01)
+        
+        self.assertEqual(update.update_id, 1)
+        self.assertEqual(link.forwarded, 1)
+    
+    def test_worker_environment_and_sweep_partition(self):
+        """Обработчик получает свой порт и долю лимита, а таймауты проверяет только у своих кандидатов"""
+        supervisor = Supervisor(4, 9100, command=["true"])
+        env = supervisor.worker_env(2)
+        self.assertEqual((env["BOT_MODE"], env["WORKER_INDEX"], env["WORKER_COUNT"], env["WEBHOOK_PORT"]),
+                         ("worker", "2", "4", "9102"))
+        self.assertEqual(float(env["OUTBOUND_GLOBAL_PER_SECOND"]), Config.OUTBOUND_GLOBAL_PER_SECOND / 4)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = Database(os.path.join(tmp_dir, "cluster.db"))
+            for candidate_id in range(1, 9):
+                db.save_interview(Interview(candidate_id=candidate_id, position=Position.QA))
+            swept = db.timeout_stale_interviews(datetime.now() + timedelta(minutes=1), worker=2, workers=4)
+        self.assertEqual(sorted(candidate_id for _, candidate_id in swept), [2, 6])
+    
+    async def test_hr_results_are_sent_by_worker_zero(self):
+        """Результаты для HR из всех обработчиков отправляет только процесс 0"""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        db_path = os.path.join(tmp_dir.name, "cluster.db")
+        from bot import HRBot
+        bots = []
+        for index in range(2):
+            with patch('bot.Database', lambda: Database(db_path)), patch('bot.AIAnalyzer'), \
+                    patch.object(Config, "FOLLOW_UP_POOL_PATH", ""):
+                bot = HRBot()
+            bot.send_to_hr = AsyncMock()
+            bot.hr_digest.send = bot.send_to_hr
+            bots.append(bot)
+        candidate = Candidate(user_id=5, first_name="Иван", last_name="Петров")
+        interview = Interview(candidate_id=5, position=Position.QA)
+        analysis = InterviewAnalysis(candidate_id=5, position=Position.QA, **INTERVIEW_FALLBACK)
+        bots[1].active_interviews[5] = InterviewSession.from_interview(7, interview)
+        
+        with patch.object(Config, "WORKER_COUNT", 2), patch.object(Config, "WORKER_INDEX", 1):
+            await bots[1].send_interview_results_to_hr(candidate, interview, analysis)
+        self.assertEqual(bots[0].db.count_hr_results(), 1)
+        with patch.object(Config, "WORKER_COUNT", 2), patch.object(Config, "WORKER_INDEX", 0):
+            self.assertEqual(await bots[0].drain_hr_outbox(), 1)
+        
+        bots[1].send_to_hr.assert_not_called()
+        self.assertIn("Иван Петров", bots[0].send_to_hr.call_args.args[0])
+        self.assertEqual(bots[0].db.count_hr_results(), 0)
+
+class TestLogPipeline(unittest.TestCase):
+    """Тесты фонового журналирования"""
+    
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        root = logging.getLogger()
+        saved = root.handlers[:], root.level
+        
+        def restore():
+            stop_logging()
+            root.handlers, root.level = saved
+        self.addCleanup(restore)
+    
+    def record(self, msg: str, level: int = logging.INFO, name: str = "bot") -> logging.LogRecord:
+        return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+    
+    def test_lines_are_written_by_listener_thread(self):
+        """Строка попадает в файл из фонового потока, аргументы подставляются в момент вызова"""
+        path = os.path.join(self.tmp_dir.name, "bot.log")
+        setup_logging("INFO", path, console=False)
+        quality = {"score": 0.7}
+        
+        logging.getLogger("bot").info("Answer quality for %s: %s", "qa_1", quality)
+        quality["score"] = 0.1
+        logging.getLogger("bot").debug("not written at INFO")
+        stop_logging()
+        
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn("bot - INFO", lines[0])
+        self.assertTrue(lines[0].endswith("Answer quality for qa_1: {'score': 0.7}"))
+    
+    def test_sampling_keeps_every_nth_info_line_per_template(self):
+        """Из частых INFO-строк остается каждая N-я, редкие строки и предупреждения не теряются"""
+        sampler = SamplingFilter(parse_sample_rates("bot=10, ai_analyzer=1"))
+        
+        kept = [sampler.filter(self.record("User %s provided answer")) for _ in range(25)]
+        
+        self.assertEqual([i for i, keep in enumerate(kept) if keep], [0, 10, 20])
+        self.assertTrue(sampler.filter(self.record("Resume saved for user %s")))
+        self.assertTrue(all(sampler.filter(self.record("User %s provided answer", logging.WARNING)) for _ in range(5)))
+        self.assertTrue(all(sampler.filter(self.record("x", name="webhook")) for _ in range(5)))
+        self.assertEqual(sampler.dropped, 22)
+    
+    def test_worker_script_logs_as_bot(self):
+        """Журнал bot.py называется bot под любым именем модуля, как у обработчика, запущенного скриптом"""
+        namespace = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py"),
+                                   run_name="worker_script")
+        
+        sampler = SamplingFilter(parse_sample_rates("bot=2"))
+        kept = [sampler.filter(self.record("User %s provided answer", name=namespace["logger"].name)) for _ in range(2)]
+        
+        self.assertEqual(namespace["logger"].name, "bot")
+        self.assertEqual(kept, [True, False])
+    
+    def test_file_rotates_by_size_and_time(self):
+        """Файл ротируется при превышении размера и по истечении интервала"""
+        path = os.path.join(self.tmp_dir.name, "rotating.log")
+        handler = RotatingLogFileHandler(path, max_bytes=200, backup_count=2, interval=3600)
+        self.addCleanup(handler.close)
+        
+        for i in range(10):
+            handler.emit(self.record(f"line {i} " + "x" * 40))
+        self.assertTrue(os.path.exists(path + ".1"))
+        self.assertLessEqual(os.path.getsize(path), 200)
+        self.assertFalse(os.path.exists(path + ".3"))
+        
+        handler.rollover_at = time.time() - 1
+        backup = open(path + ".1", encoding="utf-8").read()
+        handler.emit(self.record("after interval"))
+        self.assertEqual(open(path, encoding="utf-8").read(), "after interval\n")
+        self.assertNotEqual(open(path + ".1", encoding="utf-8").read(), backup)
+        self.assertGreater(handler.rollover_at, time.time())
+
 def run_tests():
     """Запуск всех тестов"""
     print("🧪 Запуск тестов HR-бота...")
@@ -288,6 +2186,31 @@ def run_tests():
     # Добавляем тесты
     suite.addTests(loader.loadTestsFromTestCase(TestHRBot))
     suite.addTests(loader.loadTestsFromTestCase(TestQuestionContent))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnswerScorer))
+    suite.addTests(loader.loadTestsFromTestCase(TestModelRouting))
+    suite.addTests(loader.loadTestsFromTestCase(TestResilience))
+    suite.addTests(loader.loadTestsFromTestCase(TestHedging))
+    suite.addTests(loader.loadTestsFromTestCase(TestPromptBuilder))
+    suite.addTests(loader.loadTestsFromTestCase(TestStructuredOutput))
+    suite.addTests(loader.loadTestsFromTestCase(TestStreamingResumeAnalysis))
+    suite.addTests(loader.loadTestsFromTestCase(TestRescoring))
+    suite.addTests(loader.loadTestsFromTestCase(TestNearDuplicates))
+    suite.addTests(loader.loadTestsFromTestCase(TestPositionMatcher))
+    suite.addTests(loader.loadTestsFromTestCase(TestFollowUps))
+    suite.addTests(loader.loadTestsFromTestCase(TestFakeOpenAI))
+    suite.addTests(loader.loadTestsFromTestCase(TestTelemetry))
+    suite.addTests(loader.loadTestsFromTestCase(TestMicroBatching))
+    suite.addTests(loader.loadTestsFromTestCase(TestInterviewFanOut))
+    suite.addTests(loader.loadTestsFromTestCase(TestWebhook))
+    suite.addTests(loader.loadTestsFromTestCase(TestUpdateDispatcher))
+    suite.addTests(loader.loadTestsFromTestCase(TestScheduledPauses))
+    suite.addTests(loader.loadTestsFromTestCase(TestDurableSessions))
+    suite.addTests(loader.loadTestsFromTestCase(TestTimeoutSweeper))
+    suite.addTests(loader.loadTestsFromTestCase(TestSessionRecords))
+    suite.addTests(loader.loadTestsFromTestCase(TestOutboundRateLimiter))
+    suite.addTests(loader.loadTestsFromTestCase(TestHRDigest))
+    suite.addTests(loader.loadTestsFromTestCase(TestCluster))
+    suite.addTests(loader.loadTestsFromTestCase(TestLogPipeline))
     
     # Запускаем тесты
     runner = unittest.TextTestRunner(verbosity=2)
@@ -0,0 +1,187 @@
+import asyncio
+import hmac
+import json
+import logging
+from collections import Counter
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import Application
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+HEALTH_PATH = "/healthz"
+MAX_HEADERS = 100
+
+class WebhookServer:
+    """Minimal HTTP/1.1 server that feeds Telegram webhook updates into an Application
+
+    Updates are only parsed and queued here, so Telegram gets its 200 right away; the
+    Application's update processor runs the handlers. GET /healthz answers for load balancers.
+
+    Standard library only: aiohttp is not a dependency and PTB's run_webhook needs the tornado
+    extra. Each request must arrive within request_timeout, idle keep-alive connections are
+    closed after idle_timeout, and connections beyond max_connections get a 503.
+    """
+
+    def __init__(self, application: Optional[Application], secret_token: str, host: str = "0.0.0.0",
+                 port: int = 8443, path: str = "/telegram", max_body: int = 1 << 20,
+                 request_timeout: float = 10, idle_timeout: float = 75, max_connections: int = 100):
+        self.application = application
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_body = max_body
+        self.request_timeout = request_timeout
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.connections = 0
+        self.stats = Counter()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """Start listening; returns the bound port (useful with port 0)"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Webhook server listening on %s:%d%s", self.host, self.port, self.path)
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection, keeping it alive between them"""
+        if self.connections >= self.max_connections:
+            self.stats["rejected_connections"] += 1
+            try:
+                await asyncio.wait_for(self._respond(writer, HTTPStatus.SERVICE_UNAVAILABLE, keep_alive=False),
+                                       self.request_timeout)
+            except (TimeoutError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+            return
+
+        self.connections += 1
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = await asyncio.wait_for(self._read_headers(reader), self.request_timeout)
+
+                length = int(headers.get("content-length") or 0)
+                if length > self.max_body:
+                    await asyncio.wait_for(self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, keep_alive=False),
+                                           self.request_timeout)
+                    break
+                body = await asyncio.wait_for(reader.readexactly(length), self.request_timeout) if length else b""
+                status = await self._dispatch(method, target.split("?", 1)[0], headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await asyncio.wait_for(self._respond(writer, status, keep_alive), self.request_timeout)
+                if not keep_alive:
+                    break
+        except TimeoutError:
+            self.stats["timed_out_connections"] += 1
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_headers(self, reader: asyncio.StreamReader) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            if len(headers) >= MAX_HEADERS:
+                raise ValueError("too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> HTTPStatus:
+        """Check and queue one request; returns the status to answer with"""
+        if path == HEALTH_PATH and method == "GET":
+            return HTTPStatus.OK
+        if path != self.path:
+            status = HTTPStatus.NOT_FOUND
+        elif method != "POST":
+            status = HTTPStatus.METHOD_NOT_ALLOWED
+        elif not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()):
+            status = HTTPStatus.FORBIDDEN
+        else:
+            try:
+                await self.deliver(body)
+            except ValueError as e:
+                logger.warning("Rejected malformed webhook update: %s", e)
+                status = HTTPStatus.BAD_REQUEST
+            else:
+                status = HTTPStatus.OK
+        self.stats[status.value] += 1
+        return status
+    
+    async def deliver(self, body: bytes):
+        """Queue an accepted update; raises ValueError for a body that is not an update"""
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            raise ValueError(e) from e
+        await self.application.update_queue.put(update)
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: HTTPStatus, keep_alive: bool = True):
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+
+def webhook_limits() -> Dict[str, Any]:
+    """Timeouts and the connection cap of the embedded server from Config"""
+    return {"request_timeout": Config.WEBHOOK_REQUEST_TIMEOUT_SECONDS, "idle_timeout": Config.WEBHOOK_IDLE_TIMEOUT_SECONDS,
+            "max_connections": Config.WEBHOOK_MAX_CONNECTIONS}
+
+def webhook_settings() -> Tuple[str, str, str, int, str]:
+    """Public URL, secret token, listen host, port and path from Config"""
+    return (Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH, Config.WEBHOOK_SECRET_TOKEN,
+            Config.WEBHOOK_LISTEN, Config.WEBHOOK_PORT, Config.WEBHOOK_PATH)
+
+async def serve_webhook(application: Application, register: bool = True):
+    """Serve updates until cancelled; register=False for a worker behind the supervisor, which owns the webhook"""
+    url, secret_token, host, port, path = webhook_settings()
+    server = WebhookServer(application, secret_token, host, port, path, **webhook_limits())
+    async with application:
+        # The same lifecycle hooks run_polling calls
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        if register:
+            await application.bot.set_webhook(url=url, secret_token=secret_token, allowed_updates=Update.ALL_TYPES)
+        await server.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+
+def run_application(application: Application, mode: Optional[str] = None):
+    """Run an Application with long polling, behind the embedded webhook server, or as a supervisor's worker"""
+    mode = mode or Config.BOT_MODE
+    if mode == "webhook":
+        asyncio.run(serve_webhook(application))
+    elif mode == "worker":
+        asyncio.run(serve_webhook(application, register=False))
+    else:
+        application.run_polling()